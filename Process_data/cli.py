@@ -0,0 +1,481 @@
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import traceback
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from Process_data.utils.cache import encode_metadata
+from Process_data.utils.profiling import logger
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+
+Command line entry point (process-data) to convert long date ranges in shards,
+for example every month of RBSP-A REPT into Parquet and .npy files:
+
+    process-data rept 2012-09-01 2019-10-14 --root /data/rbsp --output /data/rept_a --probe a --workers 4
+
+The range is split into shards (--shard, a month by default) that are loaded
+with the `load_CDFfiles_*` functions and written to <output>/<shard>/. The
+shards are claimed through lock files in <output>/shards/, and a shard is
+only marked as done once its output is complete, so the same command can be
+run again after a crash to process the remaining shards, or run at the same
+time on several nodes sharing <output>.
+"""
+
+
+INSTRUMENTS = ('rept', 'mageis', 'emfisis', 'omni')
+
+# Variables read by default, with their column names
+DEFAULT_VARIABLES = {
+    'rept': {'Epoch': 'epoch', 'Position': 'pos', 'L': 'L', 'MLT': 'MLT'},
+    'mageis': {'Epoch': 'epoch', 'Position': 'pos', 'L': 'L', 'MLT': 'MLT'},
+    'emfisis': {'Epoch': 'epoch', 'Mag': 'Mag', 'coordinates': 'coord'},
+    'omni': {'Epoch': 'epoch', 'flow_speed': 'V', 'proton_density': 'n', 'Pressure': 'P', 'BZ_GSM': 'Bz',
+             'AE_INDEX': 'AE', 'SYM_H': 'SYM_H'}}
+
+# Arguments of the job that must be the same for every process working on it
+JOB_KEYS = ('instrument', 'start', 'end', 'shard', 'root', 'probe', 'level', 'variables', 'rename', 'res', 'type',
+            'valid_range', 'interp', 'max_gap', 'compact', 'resample', 'energies', 'alphas')
+
+JOB_FILE = 'job.json'
+
+
+############ Shards of the date range ##########################################
+
+def make_shards(start_date, end_date, shard='MS'):
+
+    '''
+    Split [start_date, end_date] (whole days, both inclusive) into shards that
+    start at the boundaries of the `shard` frequency (e.g. 'MS' for calendar
+    months, '7D' for weeks, 'YS' for years).
+
+    Returns:
+        - list: (start, end) dates of every shard, both inclusive.
+    '''
+
+    start = pd.Timestamp(start_date).normalize()
+    end = pd.Timestamp(end_date).normalize()
+    if end < start:
+        raise ValueError(f'The end date {end.date()} is before the start date {start.date()}')
+
+    boundaries = [start] + [b for b in pd.date_range(start, end, freq=shard) if b > start]
+
+    return [(b, (boundaries[i + 1] if i + 1 < len(boundaries) else end + pd.Timedelta(days=1)) - pd.Timedelta(days=1))
+            for i, b in enumerate(boundaries)]
+
+
+def shard_label(job, start, end):
+    source = job['instrument'] if job['instrument'] == 'omni' else f"{job['instrument']}_{job['probe']}"
+    return f'{source}_{start:%Y%m%d}_{end:%Y%m%d}'
+
+
+############ Job list on a shared filesystem ###################################
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ShardQueue:
+
+    '''
+    The shards of a job and their state, kept as files in <output>/shards/ so
+    that processes on several nodes can share them: <label>.lock while a
+    process works on the shard, <label>.done once its output is written and
+    <label>.failed (with the error) if it failed. Creating the lock file is
+    atomic (O_EXCL), so every shard is processed by a single process.
+
+    A lock is stale, and the shard is claimed again, if the process holding
+    it was on this host and is not running anymore, or if it is older than
+    `lock_timeout` seconds (for processes on other nodes).
+
+    Args:
+        - output_dir (str): The output directory of the job.
+        - job (dict): The arguments of the job (see JOB_KEYS).
+        - lock_timeout (float, optional): Default is None (locks of other
+          hosts never expire).
+
+    Raises:
+        - ValueError: If `output_dir` holds another job.
+    '''
+
+    def __init__(self, output_dir, job, lock_timeout=None):
+        self.output_dir = output_dir
+        self.shards_dir = os.path.join(output_dir, 'shards')
+        self.lock_timeout = lock_timeout
+        os.makedirs(self.shards_dir, exist_ok=True)
+
+        job = {key: job[key] for key in JOB_KEYS}
+        job_path = os.path.join(output_dir, JOB_FILE)
+        if os.path.exists(job_path):
+            with open(job_path) as fp:
+                existing = json.load(fp)
+            if existing != json.loads(json.dumps(job)):
+                changed = sorted(key for key in JOB_KEYS if existing.get(key) != json.loads(json.dumps(job)).get(key))
+                raise ValueError(f'{output_dir} holds another job (different {", ".join(changed)}), '
+                                 f'use another output directory')
+        else:
+            fd, tmp_path = tempfile.mkstemp(prefix='.job-', dir=output_dir)
+            with os.fdopen(fd, 'w') as fp:
+                json.dump(job, fp, indent=1)
+            os.replace(tmp_path, job_path)
+
+        self.job = job
+        self.shards = {shard_label(job, start, end): (start, end)
+                       for start, end in make_shards(job['start'], job['end'], job['shard'])}
+
+    def _path(self, label, state):
+        return os.path.join(self.shards_dir, f'{label}.{state}')
+
+    def state(self, label):
+        for state in ('done', 'lock', 'failed'):
+            if os.path.exists(self._path(label, state)):
+                return state
+        return 'pending'
+
+    def status(self):
+
+        '''
+        Return the number of shards in every state.
+        '''
+
+        states = [self.state(label) for label in self.shards]
+        return {state: states.count(state) for state in ('done', 'lock', 'failed', 'pending')}
+
+    @staticmethod
+    def _owner(lock_path):
+        try:
+            with open(lock_path) as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            # Being written, or removed meanwhile
+            return None
+
+    def _stale_owner(self, lock_path):
+        # The owner of the lock if it is stale, otherwise None
+        owner = self._owner(lock_path)
+        if owner is None:
+            return None
+        if owner.get('host') == socket.gethostname() and not _pid_alive(owner.get('pid', 0)):
+            return owner
+        if self.lock_timeout is not None and time.time() - owner.get('time', 0) > self.lock_timeout:
+            return owner
+        return None
+
+    def _lock(self, label):
+        lock_path = self._path(label, 'lock')
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            owner = self._stale_owner(lock_path)
+            if owner is None:
+                return False
+            # Only one process manages to move the stale lock away
+            stale_path = f'{lock_path}.stale-{socket.gethostname()}-{os.getpid()}'
+            try:
+                os.rename(lock_path, stale_path)
+            except OSError:
+                return False
+            if self._owner(stale_path) != owner:
+                # Another process took the stale lock over first and the
+                # lock moved is its own: put it back, unless the shard was
+                # locked again meanwhile
+                try:
+                    os.link(stale_path, lock_path)
+                except FileExistsError:
+                    pass
+                os.remove(stale_path)
+                return False
+            os.remove(stale_path)
+            logger.info(f'Claiming {label} again, from a process that stopped')
+            return self._lock(label)
+
+        with os.fdopen(fd, 'w') as fp:
+            json.dump({'host': socket.gethostname(), 'pid': os.getpid(), 'time': time.time()}, fp)
+        if os.path.exists(self._path(label, 'done')):
+            # Finished by another process since it was checked
+            os.remove(lock_path)
+            return False
+        return True
+
+    def claim(self, retry_failed=True):
+
+        '''
+        Lock the first shard that is neither done nor locked.
+
+        Returns:
+            - tuple or None: (label, start, end), or None if there is none left.
+        '''
+
+        for label, (start, end) in self.shards.items():
+            state = self.state(label)
+            if state == 'done' or (state == 'failed' and not retry_failed):
+                continue
+            if self._lock(label):
+                return label, start, end
+
+        return None
+
+    def finish(self, label, info):
+
+        '''
+        Mark a locked shard as done, with `info` (e.g. rows and seconds).
+        '''
+
+        with open(self._path(label, 'done'), 'w') as fp:
+            json.dump(info, fp)
+        for state in ('failed', 'lock'):
+            if os.path.exists(self._path(label, state)):
+                os.remove(self._path(label, state))
+
+    def fail(self, label, error):
+
+        '''
+        Mark a locked shard as failed, with the error, and release it.
+        '''
+
+        with open(self._path(label, 'failed'), 'w') as fp:
+            fp.write(error)
+        os.remove(self._path(label, 'lock'))
+
+
+############ Processing of a shard #############################################
+
+def run_shard(job, start, end):
+
+    '''
+    Load a shard with the `load_CDFfiles_*` function of the instrument. A
+    shard without any local file (e.g. a gap of the mission) gives empty
+    outputs, so it is done with 0 rows instead of failing on every run.
+
+    Returns:
+        - dict: The outputs to write, by name (DataFrames, arrays and
+          metadata).
+    '''
+
+    variables = job['variables']
+    rename = job['rename']
+    probes = ['a', 'b'] if job['probe'] == 'both' else [job['probe']]
+
+    if job['instrument'] in ('rept', 'mageis'):
+        from Process_data.rbsp.process_ect import load_CDFfiles_ECT
+        results = load_CDFfiles_ECT(start, end, job['root'], variables, rename, job['probe'], job['instrument'], job['level'],
+                                    valid_range=job['valid_range'], interp=job['interp'], max_gap=job['max_gap'],
+                                    compact=job['compact'], energies=job['energies'], alphas=job['alphas'])
+        outputs = {}
+        for p, (ect_info, fedu, ect_metadata, fedu_metadata) in zip(probes, results):
+            outputs.update({f'ect_{p}': ect_info, f'fedu_{p}': fedu, f'metadata_{p}': [ect_metadata, fedu_metadata]})
+        return outputs
+
+    if job['instrument'] == 'emfisis':
+        from Process_data.rbsp.process_emfisis import load_CDFfiles_EMFISIS
+        results = load_CDFfiles_EMFISIS(start, end, job['root'], variables, rename, job['probe'], job['level'],
+                                        Interpol=job['interp'], max_gap=job['max_gap'], compact=job['compact'],
+                                        resample=job['resample'])
+        outputs = {}
+        for p, (emfisis_info, emfisis_metadata) in zip(probes, results):
+            outputs.update({f'emfisis_{p}': emfisis_info, f'metadata_{p}': emfisis_metadata})
+        return outputs
+
+    from Process_data.omni.process_omni import load_CDFfiles_OMNI
+    df_omni, omni_metadata = load_CDFfiles_OMNI(start, end, job['root'], variables, rename, job['res'], job['type'],
+                                                valid_range=job['valid_range'], interp=job['interp'],
+                                                max_gap=job['max_gap'], compact=job['compact'])
+    return {'omni': df_omni, 'metadata': omni_metadata}
+
+
+def write_shard(shard_dir, outputs):
+
+    '''
+    Write the outputs of a shard into `shard_dir`, replacing it: DataFrames as
+    Parquet (or pickles if no Parquet engine is installed), arrays as .npy and
+    the rest as JSON. The directory only appears once it is complete.
+
+    Returns:
+        - int: The total number of rows of the DataFrames.
+    '''
+
+    parent = os.path.dirname(shard_dir)
+    tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=parent)
+    rows = 0
+    try:
+        for name, value in outputs.items():
+            path = os.path.join(tmp_dir, name)
+            if isinstance(value, pd.DataFrame):
+                rows += len(value)
+                try:
+                    value.to_parquet(path + '.parquet')
+                except ImportError:
+                    value.to_pickle(path + '.pkl')
+            elif isinstance(value, np.ndarray):
+                np.save(path + '.npy', value)
+            else:
+                with open(path + '.json', 'w') as fp:
+                    json.dump(encode_metadata(value), fp)
+
+        if os.path.exists(shard_dir):
+            shutil.rmtree(shard_dir)
+        os.replace(tmp_dir, shard_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    return rows
+
+
+def work(output_dir, lock_timeout=None, retry_failed=True):
+
+    '''
+    Process shards of the job in `output_dir` until none is left. This is run
+    by every worker process.
+
+    Returns:
+        - tuple: (number of shards done, number of shards failed).
+    '''
+
+    with open(os.path.join(output_dir, JOB_FILE)) as fp:
+        job = json.load(fp)
+    queue = ShardQueue(output_dir, job, lock_timeout)
+
+    done = failed = 0
+    while True:
+        claimed = queue.claim(retry_failed)
+        if claimed is None:
+            return done, failed
+
+        label, start, end = claimed
+        started = time.perf_counter()
+        try:
+            outputs = run_shard(job, start, end)
+            rows = write_shard(os.path.join(output_dir, label), outputs)
+        except Exception:
+            queue.fail(label, traceback.format_exc())
+            logger.error(f'Shard {label} failed:\n{traceback.format_exc()}')
+            failed += 1
+            # Retried by the next run, not by this one
+            retry_failed = False
+            continue
+
+        seconds = time.perf_counter() - started
+        queue.finish(label, {'rows': rows, 'seconds': seconds, 'host': socket.gethostname()})
+        logger.info(f'Shard {label} done: {rows} rows in {seconds:.1f} s')
+        done += 1
+
+
+############ Command line ######################################################
+
+def _parse_rename(values):
+    rename = {}
+    for value in values or []:
+        var, sep, column = value.partition('=')
+        if not sep:
+            raise argparse.ArgumentTypeError(f"--rename takes VARIABLE=COLUMN, not '{value}'")
+        rename[var] = column
+    return rename
+
+
+def _parse_channels(values):
+    # One value is a channel, two values a (min, max) range
+    if values is None:
+        return None
+    return values[0] if len(values) == 1 else (values[0], values[1])
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='process-data',
+                                     description='Convert RBSP ECT, RBSP EMFISIS and OMNI CDF files of a date range '
+                                                 'into Parquet and .npy files, in resumable shards')
+    parser.add_argument('instrument', choices=INSTRUMENTS)
+    parser.add_argument('start', help='First day (YYYY-MM-DD)')
+    parser.add_argument('end', help='Last day (YYYY-MM-DD, included)')
+    parser.add_argument('--root', required=True, help='Local root directory of the CDF files')
+    parser.add_argument('--output', required=True, help='Output directory, shared by every process of the job')
+    parser.add_argument('--probe', choices=['a', 'b', 'both'], default='a', help='RBSP probe. Default is a.')
+    parser.add_argument('--level', default='3', help='RBSP data level. Default is 3.')
+    parser.add_argument('--variables', nargs='+', help='CDF variables to read. Default depends on the instrument.')
+    parser.add_argument('--rename', nargs='+', metavar='VARIABLE=COLUMN',
+                        help='Column names of the variables. Default is the variable name (epoch for Epoch).')
+    parser.add_argument('--res', default='1min', help='OMNI resolution (1min, 5min or 1h). Default is 1min.')
+    parser.add_argument('--type', default='hro2', help='OMNI file type (hro or hro2). Default is hro2.')
+    parser.add_argument('--shard', default='MS',
+                        help='Length of the shards, as a pandas frequency (MS: months, 7D: weeks, YS: years). '
+                             'Default is MS.')
+    parser.add_argument('--workers', type=int, default=1, help='Local worker processes. Default is 1.')
+    parser.add_argument('--no-valid-range', dest='valid_range', action='store_false',
+                        help='Keep the values outside VALIDMIN/VALIDMAX')
+    parser.add_argument('--interp', action='store_true', help='Interpolate the gaps in time')
+    parser.add_argument('--max-gap', help='Longest gap filled by --interp (e.g. 5min)')
+    parser.add_argument('--compact', action='store_true', help='Store float32 and narrow integers')
+    parser.add_argument('--resample', help='EMFISIS: resample into bins of this length (e.g. 1min)')
+    parser.add_argument('--energies', nargs='+', type=float, metavar='MEV',
+                        help='ECT: energy channel, or MIN MAX range, of FEDU to keep')
+    parser.add_argument('--alphas', nargs='+', type=float, metavar='DEG',
+                        help='ECT: pitch angle, or MIN MAX range, of FEDU to keep')
+    parser.add_argument('--lock-timeout', type=float,
+                        help='Seconds after which the shards locked by processes of other hosts are claimed again')
+    parser.add_argument('--no-retry', dest='retry_failed', action='store_false',
+                        help='Do not retry the shards that failed in a previous run')
+    parser.add_argument('--status', action='store_true', help='Print the state of the shards and exit')
+    parser.add_argument('--quiet', action='store_true', help='Only report errors')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.quiet:
+        logger.setLevel('ERROR')
+
+    default = DEFAULT_VARIABLES[args.instrument]
+    variables = args.variables or list(default)
+    rename = {var: default.get(var, 'epoch' if var == 'Epoch' else var) for var in variables}
+    rename.update(_parse_rename(args.rename))
+
+    job = dict(vars(args), start=str(pd.Timestamp(args.start).date()), end=str(pd.Timestamp(args.end).date()),
+               root=os.path.abspath(args.root), variables=variables, rename=rename,
+               energies=_parse_channels(args.energies), alphas=_parse_channels(args.alphas))
+
+    os.makedirs(args.output, exist_ok=True)
+    try:
+        queue = ShardQueue(args.output, job, args.lock_timeout)
+    except ValueError as error:
+        print(f'process-data: {error}', file=sys.stderr)
+        return 2
+
+    if args.status:
+        print(json.dumps(queue.status()))
+        return 0
+
+    status = queue.status()
+    logger.info(f"{len(queue.shards)} shards, {status['done']} already done")
+
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(work, args.output, args.lock_timeout, args.retry_failed) for _ in range(args.workers)]
+            results = [future.result() for future in futures]
+    else:
+        results = [work(args.output, args.lock_timeout, args.retry_failed)]
+
+    status = queue.status()
+    logger.info(f"{sum(done for done, _ in results)} shards processed, {status['done']} of {len(queue.shards)} done, "
+                f"{status['failed']} failed")
+
+    return 0 if status['done'] == len(queue.shards) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,2 +1,2 @@
-from Process_data.omni.process_omni import read_CDFfile_OMNI, load_CDFfiles_OMNI
+from Process_data.omni.process_omni import read_CDFfile_OMNI, load_CDFfiles_OMNI, iter_CDFfiles_OMNI, update_store_OMNI
 
@@ -2,7 +2,18 @@ from Download_data.omni import download_omni as dd_omni
 import pandas as pd
 import cdflib
 import datetime
-import numpy as np
+import functools
+import os
+from Process_data.utils.parallel import prefetch_ordered
+from Process_data.utils.accumulate import ColumnAccumulator
+from Process_data.utils.epoch import decode_epoch
+from Process_data.utils.cleaning import clean_frame
+from Process_data.utils.interpolate import interpolate_frame, interpolate_accumulator
+from Process_data.utils.compact import compact_frame
+from Process_data.utils.metadata import METADATA_CACHE, MetadataTracker
+from Process_data.utils.profiling import logger, timed, track_load
+from Process_data.utils.store import PartitionedStore
+from Process_data.utils.window import resolve_time_range, clip_time_range, find_record_range, read_records
 
 
 """
@@ -61,7 +72,7 @@ def filter_metadata_OMNI(original_metadata):
     return filtered_metadata
 
 
-def read_CDFfile_OMNI(cdf_path, relevant_var, rename_mapping):
+def read_CDFfile_OMNI(cdf_path, relevant_var, rename_mapping, time_range=None, metadata_cache=None):
 
     '''
     Load and parse an OMNI CDF file to extract selected variables and their
@@ -72,6 +83,14 @@ def read_CDFfile_OMNI(cdf_path, relevant_var, rename_mapping):
         - relevant_var (list): A list of variable names (str) to extract from the
           CDF file (e.g., 'KP', 'Epoch'). These should match the variable names in
           the CDF file.
+        - rename_mapping (dict): Mapping from CDF variable names to column names.
+        - time_range (tuple, optional): A (start, end) window, end exclusive. If
+          given, only the records inside it are decoded. Default is None (all
+          the records).
+        - metadata_cache (Process_data.utils.metadata.MetadataCache, optional):
+          Cache of the metadata of every dataset version, so the attributes
+          are parsed once per version instead of once per file. Default is
+          None (the module level METADATA_CACHE).
 
     Returns:
         - list: A list containing the following elements:
@@ -85,7 +104,13 @@ def read_CDFfile_OMNI(cdf_path, relevant_var, rename_mapping):
           the CDF file.
     '''
 
-    cdf = cdflib.CDF(cdf_path)
+    if metadata_cache is None:
+        metadata_cache = METADATA_CACHE
+
+    with timed('open', cdf_path) as stage:
+        cdf = cdflib.CDF(cdf_path)
+        rec_range = find_record_range(cdf, time_range)
+        stage.add(nbytes=os.path.getsize(cdf_path))
     dict_cdf = {}
     dict_cdf_metadata = {}
 
@@ -96,72 +121,295 @@ def read_CDFfile_OMNI(cdf_path, relevant_var, rename_mapping):
 #    print('cdf variables', variables)
 
     #Esto se puede hacer altiro como dataframe
-    for var in relevant_var:
-        var_metadata = cdf.varattsget(var)
-        filtered_metadata = filter_metadata_OMNI(var_metadata)
+    with timed('read', cdf_path) as stage:
+        for var in relevant_var:
+            filtered_metadata = metadata_cache.get(cdf_path, ('OMNI', var),
+                                                        lambda: filter_metadata_OMNI(cdf.varattsget(var))).copy()
 
-        renamed_key = rename_mapping.get(var)
-        dict_cdf_metadata[renamed_key] = filtered_metadata
-        dict_cdf[renamed_key] = cdf[var]
+            renamed_key = rename_mapping.get(var)
+            dict_cdf_metadata[renamed_key] = filtered_metadata
+            dict_cdf[renamed_key] = read_records(cdf, var, rec_range)
+            stage.add(nbytes=dict_cdf[renamed_key].nbytes)
 
-    df_cdf = pd.DataFrame(dict_cdf)
+        df_cdf = pd.DataFrame(dict_cdf)
+        stage.add(len(df_cdf))
 
     if 'Epoch' in relevant_var:
 #        print('epoch')
-        df_cdf['epoch'] = pd.to_datetime(cdflib.cdfepoch.encode(df_cdf['epoch'].values))
+        with timed('epoch', cdf_path) as stage:
+            df_cdf['epoch'] = decode_epoch(df_cdf['epoch'].values)
+            stage.add(len(df_cdf))
 
     return [df_cdf, dict_cdf_metadata]
 
 
-def clean_CDFfile_OMNI(df, dict_metadata, interp=False):
+def clean_CDFfile_OMNI(df, dict_metadata, interp=False, valid_range=True, max_gap=None):
 
     '''
-    Clean OMNI data by replacing fill values for missing data (as specified in
-    the metadata) with NaN values. It can also linearly interpolate the NaN values
-    in the DataFrame 'df' if specified.
+    Clean OMNI data by replacing fill values for missing data and, if
+    `valid_range` is True, values outside the valid range (as specified in the
+    metadata) with NaN values. All the numeric columns are masked in a single
+    vectorized pass (see `Process_data.utils.cleaning.clean_frame`). It can also
+    linearly interpolate in time the NaN values of the science columns if
+    specified (see `Process_data.utils.interpolate.interpolate_frame`).
 
     Args:
         - df (pandas.DataFrame): The input DataFrame containing scalar OMNI data.
         - dict_metadata (dict): A dictionary containing metadata for the variables in `df`,
           including fill values and valid ranges.
-        - interp (bool, optional): If True, applies linear interpolation to the
-          NaN values in the DataFrame `df`. Default is False.
+        - interp (bool, optional): If True, applies linear interpolation in time
+          to the NaN values of the science columns. Default is False.
+        - valid_range (bool, optional): If True, values below `min_valid` or
+          above `max_valid` are also replaced by NaN. Default is True.
+        - max_gap (optional): Longest gap between valid samples filled by the
+          interpolation (e.g. '10min'). Default is None (no limit).
 
     Returns:
         - df_clean (pandas.DataFrame): The cleaned DataFrame, with fill values replaced by NaN and
           optionally interpolated if `interp=True`.
     '''
 
-    df_clean = pd.DataFrame()
-
-    for var in df.columns:
-        fill_value = dict_metadata[var]['fill_value']
-        min_valid = dict_metadata[var]['min_valid']
-        max_valid = dict_metadata[var]['max_valid']
+    df_clean = clean_frame(df, dict_metadata, valid_range)
 
-        df_clean[var] = df[var].replace(fill_value, np.nan)
-#        df_clean.loc[df_clean[var] > max_valid, var] = np.nan
-#        df_clean.loc[df_clean[var] < min_valid, var] = np.nan
     if interp:
-        print('Interpolating bad OMNI data')
-        df = df.interpolate(axis=0)
+        logger.info('Interpolating bad OMNI data')
+        df_clean = interpolate_frame(df_clean, dict_metadata, max_gap=max_gap)
 
     return df_clean
 
 
-def load_CDFfiles_OMNI(start_date, end_date, local_root_dir, relevant_var, rename_mapping, res, type):
+def process_CDFfile_OMNI(cdf_path, relevant_var, rename_mapping, cache=None, time_range=None, valid_range=True):
+
+    '''
+    Read and clean a single OMNI CDF file. This is the unit of work done for
+    every file by `load_CDFfiles_OMNI`.
+
+    Args:
+        - cdf_path (str): The path to the CDF file to be loaded.
+        - relevant_var (list): A list of variable names (str) to extract from the
+          CDF file (e.g., 'KP', 'Epoch').
+        - rename_mapping (dict): Mapping from CDF variable names to column names.
+        - cache (Process_data.utils.cache.DayCache, optional): Cache of cleaned
+          files. If given, the result is read from it when available and
+          stored in it otherwise. Default is None.
+        - time_range (tuple, optional): A (start, end) window, end exclusive, to
+          restrict the records read. Default is None (all the records).
+        - valid_range (bool, optional): If True, values outside the valid range
+          of their variable are replaced by NaN. Default is True.
+
+    Returns:
+        - tuple: A tuple containing:
+            1. df_clean (pandas.DataFrame): The cleaned scalar parameters.
+            2. dict_omni_metadata (dict): Metadata for the scalar parameters.
+    '''
+
+    fetched = _fetch_CDFfile_OMNI(cdf_path, relevant_var, rename_mapping, cache, time_range, valid_range)
+
+    return _finish_CDFfile_OMNI(fetched, cache, valid_range)
+
+
+def _fetch_CDFfile_OMNI(cdf_path, relevant_var, rename_mapping, cache=None, time_range=None, valid_range=True):
+
+    '''
+    I/O part of `process_CDFfile_OMNI`: look the file up in the cache and read
+    it if it is not there. Returns (cache_key, raw, result), where `raw` is
+    the output of `read_CDFfile_OMNI` and `result` the cached result (only one
+    of them is not None).
+    '''
+
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(cdf_path, relevant_var, rename_mapping, instrument='OMNI', time_range=time_range,
+                                   valid_range=valid_range)
+        with timed('cache', cdf_path) as stage:
+            cached = cache.load(cache_key)
+            stage.add(0 if cached is None else len(cached[0]))
+        if cached is not None:
+            df_clean, dict_omni_metadata, _ = cached
+            return cache_key, None, (df_clean, dict_omni_metadata)
+
+    return cache_key, read_CDFfile_OMNI(cdf_path, relevant_var, rename_mapping, time_range), None
+
+
+def _finish_CDFfile_OMNI(fetched, cache=None, valid_range=True):
+
+    '''
+    CPU part of `process_CDFfile_OMNI`: clean what `_fetch_CDFfile_OMNI` read
+    and store it in the cache.
+    '''
+
+    cache_key, raw, result = fetched
+    if result is not None:
+        return result
+
+    df, dict_omni_metadata = raw
+    with timed('clean') as stage:
+        df_clean = clean_CDFfile_OMNI(df, dict_omni_metadata, valid_range=valid_range)
+        stage.add(len(df_clean))
+
+    if cache is not None:
+        with timed('cache'):
+            cache.store(cache_key, df_clean, dict_omni_metadata)
+
+    return df_clean, dict_omni_metadata
+
+
+def _fetch_file_OMNI(item, **kwargs):
+    cdf_path, time_range = item
+    return _fetch_CDFfile_OMNI(cdf_path, time_range=time_range, **kwargs)
+
+
+def get_local_filepaths_OMNI(time_range, local_root_dir, res, type):
+
+    '''
+    Return the local paths of the OMNI files covering `time_range` (one per
+    month, or per six months at 1h resolution), whether they exist or not.
+
+    Args:
+        - time_range (tuple): The (start, end) window, end exclusive (see
+          `Process_data.utils.window.resolve_time_range`).
+        - local_root_dir (str): Path to the local directory containing the CDF files.
+        - res (str): The time resolution of the data file ('1h', '5min' or '1min')
+        - type (str): The type of OMNI data file to process (hro or hro2).
+
+    Returns:
+        - tuple: A tuple containing:
+            1. date_array (pandas.DatetimeIndex): The first date covered by each file.
+            2. paths (list): The local path of each file.
+            3. file_ranges (list): The part of `time_range` to read from each
+               file (None when the whole file is inside the window).
+    '''
+
+    start, end = time_range
+
+    # First day of the file containing `start`
+    if res != "1h":
+#        print(res, ' resolution')
+        file_length = pd.DateOffset(months=1)
+        first_file = start.normalize().replace(day=1)
+    else:
+#        print('1h resolution')
+        file_length = pd.DateOffset(months=6)
+        first_file = start.normalize().replace(day=1, month=1 if start.month < 7 else 7)
+
+    date_array = pd.date_range(start=first_file, end=end - pd.Timedelta(1, 'ns'), freq=file_length)
+
+    paths = []
+    file_ranges = []
+    with timed('lookup') as stage:
+        for date in date_array:
+            filename = dd_omni.get_filename_OMNI(date, res, type)
+            local_dir = dd_omni.get_local_dir_OMNI(date, local_root_dir, res, type)
+            paths.append(local_dir + filename)
+            file_ranges.append(clip_time_range(time_range, date, date + file_length))
+        stage.add(len(paths))
+
+    return date_array, paths, file_ranges
+
+
+def iter_CDFfiles_OMNI(start_date, end_date, local_root_dir, relevant_var, rename_mapping, res, type, cache=None, valid_range=True,
+                       prefetch=None):
+
+    '''
+    Iterate over the OMNI CDF files of a specified date range, yielding the
+    cleaned data of one file (one month, or six months at 1h resolution) at a
+    time. Only the records between `start_date` and `end_date` are decoded.
+
+    Args:
+        - start_date (datetime.date or datetime.datetime): The start of the range
+          to process (inclusive).
+        - end_date (datetime.date or datetime.datetime): The end of the range to
+          process (inclusive). A date without time includes the whole day.
+        - local_root_dir (str): Path to the local directory containing the CDF files.
+        - relevant_var (list): List of variable names to extract from the CDF files.
+        - rename_mapping (dict): Mapping from CDF variable names to column names.
+        - res (str): The time resolution of the data file ('1h', '5min' or '1min')
+        - type (str): The type of OMNI data file to process (hro or hro2).
+        - cache (Process_data.utils.cache.DayCache, optional): Cache of cleaned
+          files. Default is None.
+        - valid_range (bool, optional): If True, values outside the valid range
+          of their variable are replaced by NaN. Default is True.
+        - prefetch (int, optional): See `load_CDFfiles_OMNI`. Default is None.
+
+    Returns:
+        - generator: For each file, a tuple containing:
+            1. date (pandas.Timestamp): The first date covered by the file.
+            2. df_clean (pandas.DataFrame): The cleaned scalar parameters.
+            3. dict_omni_metadata (dict): Metadata for the scalar parameters.
+          Nothing is yielded if there is no local file in the whole range.
+    '''
+
+    time_range = resolve_time_range(start_date, end_date)
+    date_array, paths, file_ranges = get_local_filepaths_OMNI(time_range, local_root_dir, res, type)
+    if not any(os.path.exists(path) for path in paths):
+        # Nothing to load in the range (e.g. before the files were downloaded)
+        logger.info('No file in local')
+        return
+
+    fetch_file = functools.partial(_fetch_file_OMNI, relevant_var=relevant_var, rename_mapping=rename_mapping,
+                                   cache=cache, valid_range=valid_range)
+    if prefetch:
+        # Read the next files in background threads while this one is cleaned
+        fetched_files = prefetch_ordered(fetch_file, zip(paths, file_ranges), prefetch)
+    else:
+        fetched_files = map(fetch_file, zip(paths, file_ranges))
+
+    for date, fetched in zip(date_array, fetched_files):
+        df_clean, dict_omni_metadata = _finish_CDFfile_OMNI(fetched, cache, valid_range)
+
+        yield date, df_clean, dict_omni_metadata
+
+
+def load_CDFfiles_OMNI(start_date, end_date, local_root_dir, relevant_var, rename_mapping, res, type, cache=None, valid_range=True,
+                       prefetch=None, interp=False, max_gap=None, compact=False, profile=None):
 
     '''
     Load and process OMNI CDF files for a specified date range, extracting selected variables
     and associated metadata. The cleaned and processed data is returned for further analysis.
+    The files are processed one at a time by `iter_CDFfiles_OMNI`.
 
     Args:
-        - start_date (datetime.date): The start date of the range to process.
-        - end_date (datetime.date): The end date of the range to process.
+        - start_date (datetime.date or datetime.datetime): The start of the range
+          to process (inclusive).
+        - end_date (datetime.date or datetime.datetime): The end of the range to
+          process (inclusive). A date without time includes the whole day. Only
+          the records inside the range are decoded and returned.
         - local_root_dir (str): Path to the local directory containing the CDF files.
         - relevant_var (list): List of variable names to extract from the CDF files.
         - res (str): The time resolution of the data file ('1h', '5min' or '1min')
         - typ (str): The type of OMNI data file to process (hro or hro2).
+        - cache (Process_data.utils.cache.DayCache, optional): Cache of cleaned
+          files. Files already in the cache are not decoded again.
+          Default is None.
+        - valid_range (bool, optional): If True, values below VALIDMIN or above
+          VALIDMAX are replaced by NaN, like the fill values. Default is True.
+        - prefetch (int, optional): Number of files read ahead by background
+          threads while the current file is cleaned and accumulated in the
+          calling thread, so reading and cleaning overlap. At most `prefetch`
+          files are held in memory besides the current one. Default is None
+          (no prefetching).
+        - interp (bool, optional): If True, the NaN values of the science
+          columns (not the support data) are linearly interpolated in time,
+          once the whole range is loaded, so gaps across the boundaries
+          between files are filled too. It requires 'Epoch' in
+          `relevant_var`. Default is False.
+        - max_gap (optional): Longest gap between valid samples filled by the
+          interpolation (e.g. '10min'); longer gaps are left as NaN. Default
+          is None (no limit).
+        - compact (bool, optional): If True, every file is stored in less
+          memory before it is accumulated: float32 for the floating point
+          variables and the smallest integer type allowed by the valid range
+          of the integer ones (see `Process_data.utils.compact`). Default is
+          False.
+        - profile (optional): Profiling of the stages of the load (file
+          lookup, open, reads, epoch decoding, cleaning, accumulation, ...):
+          True logs a summary table at the end, a callable is called with the
+          timing of every stage and a `Process_data.utils.profiling.LoadProfile`
+          is filled with them. The timings are always logged at DEBUG level
+          to the 'Process_data.profile' logger. Default is None.
+
+    If there is no local file in the range, the DataFrame and the metadata are
+    empty.
 
     Returns:
         - tuple: A tuple containing:
@@ -171,33 +419,99 @@ def load_CDFfiles_OMNI(start_date, end_date, local_root_dir, relevant_var, renam
                for the scalar parameters.
     '''
 
-    print(f'\nPROCESSING OMNI {res.upper()} {type.upper()} DATA')
+    with track_load(f'OMNI {res.upper()} {type.upper()}', profile):
+        logger.info(f'\nPROCESSING OMNI {res.upper()} {type.upper()} DATA')
+
+        omni_acc = ColumnAccumulator()
+        omni_tracker = MetadataTracker(f'OMNI {res} {type}')
+        # Returned as it is if there is no file in the range
+        dict_omni_metadata = {}
+        for date, df_clean, dict_omni_metadata in iter_CDFfiles_OMNI(start_date, end_date, local_root_dir, relevant_var, rename_mapping,
+                                                                     res, type, cache, valid_range, prefetch):
+            omni_tracker.update(date, dict_omni_metadata)
+            if compact:
+                with timed('compact'):
+                    df_clean = compact_frame(df_clean, dict_omni_metadata)
+            with timed('accumulate') as stage:
+                omni_acc.append(df_clean)
+                stage.add(len(df_clean), int(df_clean.memory_usage(index=False).sum()))
+
+        if interp:
+            logger.info('Interpolating bad OMNI data')
+            with timed('interpolate') as stage:
+                interpolate_accumulator(omni_acc, dict_omni_metadata, max_gap=max_gap)
+                stage.add(omni_acc.size)
+
+        with timed('finalize') as stage:
+            df_omni = omni_acc.to_frame()
+            stage.add(len(df_omni))
+
+        logger.info('----')
+        logger.info("DONE")
+        logger.info('----')
 
-    if res != "1h":
-#        print(res, ' resolution')
-        date_array = pd.date_range(start=start_date, end=end_date, freq='MS')
-    else:
-#        print('1h resolution')
-        date_array = pd.date_range(start=start_date, end=end_date, freq='6MS')
+    return df_omni, dict_omni_metadata
 
-    flag = True
-    for date in date_array:
-        filename = dd_omni.get_filename_OMNI(date, res, type)
-        local_dir = dd_omni.get_local_dir_OMNI(date, local_root_dir, res, type)
-        path = local_dir + filename
-        df, dict_omni_metadata = read_CDFfile_OMNI(path, relevant_var, rename_mapping)
-        df_clean = clean_CDFfile_OMNI(df, dict_omni_metadata)
 
-        if flag:
-            df_omni = df_clean.copy()
-            flag=False
-        else:
-            df_omni = pd.concat([df_omni, df_clean])
+############ Incremental store for daily runs ##################################
 
-    df_omni = df_omni.reset_index(drop=True)
+def update_store_OMNI(store_dir, start_date, end_date, local_root_dir, relevant_var, rename_mapping, res, type, valid_range=True,
+                      prefetch=None):
 
-    print('----')
-    print("DONE")
-    print('----')
+    '''
+    Add the OMNI files of a date range to an incremental store (see
+    `Process_data.utils.store.PartitionedStore`), one Parquet partition per
+    file (month, or six months at 1h resolution). Only the files without a
+    partition, or that changed since they were stored (e.g. the file of the
+    current month, updated with new days), are read and cleaned, so a daily
+    run does not depend on the length of the store. The whole files are
+    stored, and missing files are skipped.
 
-    return df_omni, dict_omni_metadata
+    The store is read with `Process_data.utils.store.open_store`, e.g.
+    open_store(store_dir, '2014-01-01', '2014-03-31').to_frame().
+
+    Args:
+        - store_dir (str): Directory of the store.
+        - start_date, end_date, local_root_dir, relevant_var, rename_mapping,
+          res, type, valid_range, prefetch: See `load_CDFfiles_OMNI`. 'Epoch'
+          must be in `relevant_var`. The options that change the stored data
+          must be the same in every update of a store.
+
+    Returns:
+        - list: The partitions written (first date of each file).
+
+    Raises:
+        - ValueError: If 'Epoch' is not in `relevant_var`, or the store was
+          created with other options.
+    '''
+
+    if 'Epoch' not in relevant_var:
+        raise ValueError("The store needs the epochs, add 'Epoch' to relevant_var")
+
+    options = {'res': res, 'type': type, 'relevant_var': list(relevant_var), 'rename_mapping': rename_mapping,
+               'valid_range': valid_range}
+    store = PartitionedStore(store_dir, options)
+
+    time_range = resolve_time_range(start_date, end_date)
+    date_array, paths, _ = get_local_filepaths_OMNI(time_range, local_root_dir, res, type)
+    files = [(date, path) for date, path in zip(date_array, paths) if os.path.exists(path)]
+    new = [(date, path) for date, path in files if not store.is_current(date.strftime('%Y-%m-%d'), path)]
+    logger.info(f'OMNI {res.upper()} {type.upper()} store: {len(new)} new or changed files of {len(files)}')
+
+    fetch_file = functools.partial(_fetch_file_OMNI, relevant_var=relevant_var, rename_mapping=rename_mapping,
+                                   valid_range=valid_range)
+    items = [(path, None) for _, path in new]
+    fetched_files = prefetch_ordered(fetch_file, items, prefetch) if prefetch else map(fetch_file, items)
+
+    written = []
+    try:
+        for (date, path), fetched in zip(new, fetched_files):
+            df_clean, dict_omni_metadata = _finish_CDFfile_OMNI(fetched, valid_range=valid_range)
+            label = date.strftime('%Y-%m-%d')
+            store.write(label, path, df_clean, dict_omni_metadata)
+            written.append(label)
+    finally:
+        # The files written so far are kept if the run is interrupted
+        store.save()
+
+    return written
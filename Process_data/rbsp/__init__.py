@@ -1,2 +1,4 @@
-from Process_data.rbsp.process_ect import read_CDFfile_ECT, load_CDFfiles_ECT
-from Process_data.rbsp.process_emfisis import read_CDFfile_EMFISIS, load_CDFfiles_EMFISIS
+from Process_data.rbsp.process_ect import read_CDFfile_ECT, load_CDFfiles_ECT, iter_CDFfiles_ECT, update_store_ECT
+from Process_data.rbsp.process_emfisis import read_CDFfile_EMFISIS, load_CDFfiles_EMFISIS, iter_CDFfiles_EMFISIS
+from Process_data.rbsp.fedu import resolve_channels, select_FEDU, compute_products_FEDU
+from Process_data.rbsp.dataset import ECTDataset, open_dataset_ECT
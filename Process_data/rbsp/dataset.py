@@ -0,0 +1,368 @@
+import functools
+import cdflib
+import numpy as np
+import pandas as pd
+from Process_data.rbsp.fedu import resolve_channels
+from Process_data.rbsp.process_ect import get_local_filepaths_ECT, get_file_ranges_ECT, process_CDFfile_ECT, build_read_plan_ECT
+from Process_data.utils.parallel import map_ordered
+from Process_data.utils.accumulate import ArrayAccumulator, ColumnAccumulator
+from Process_data.utils.metadata import METADATA_CACHE
+from Process_data.utils.window import resolve_time_range
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+# Dimensions of FEDU in an ECTDataset
+DIMS_FEDU = ('epoch', 'alpha', 'energy')
+
+# Reductions of `ECTDataset.reduce`
+REDUCTIONS = ('mean', 'sum', 'count', 'min', 'max')
+
+
+############ Work done on every chunk (module level, for worker processes) #####
+
+def _partial_reduce(fedu, axes):
+    # Partial results over `axes` that can be combined between chunks
+    valid = ~np.isnan(fedu)
+    return {'sum': np.where(valid, fedu, 0).sum(axis=axes, dtype=np.float64),
+            'count': valid.sum(axis=axes),
+            'min': np.fmin.reduce(fedu, axis=axes) if fedu.size else np.full(np.delete(fedu.shape, axes), np.nan),
+            'max': np.fmax.reduce(fedu, axis=axes) if fedu.size else np.full(np.delete(fedu.shape, axes), np.nan)}
+
+
+def _compute_chunk_ECT(item, axes=None, **kwargs):
+    # One day of the dataset: read and clean the file, and optionally reduce
+    # FEDU over `axes` so only the partial results are sent back
+    cdf_path, time_range = item
+    ect_df_clean, fedu_data_clean, ect_metadata, fedu_metadata = process_CDFfile_ECT(cdf_path, time_range=time_range,
+                                                                                     **kwargs)
+    if axes is not None:
+        return _partial_reduce(fedu_data_clean, axes)
+
+    return ect_df_clean, fedu_data_clean, ect_metadata, fedu_metadata
+
+
+def _read_coords_ECT(cdf_path):
+    # Energy and pitch angle channels of a file, from the shared metadata cache
+    # (the file is only opened if they are not cached yet)
+    coords = {'energy': METADATA_CACHE.get(cdf_path, 'FEDU_Energy', lambda: cdflib.CDF(cdf_path)['FEDU_Energy']),
+              'alpha': METADATA_CACHE.get(cdf_path, 'FEDU_Alpha', lambda: cdflib.CDF(cdf_path)['FEDU_Alpha'])}
+    return {name: np.asarray(values)[0] if np.ndim(values) > 1 else np.asarray(values)
+            for name, values in coords.items()}
+
+
+############ Lazy dataset ######################################################
+
+class ECTDataset:
+
+    '''
+    Lazy view of the RBSP ECT data of one probe, built by `open_dataset_ECT`,
+    with every daily file as a chunk. FEDU has the dimensions (epoch, alpha,
+    energy), with the pitch angles and energies of the channels as
+    coordinates (`coords`).
+
+    Selections (`sel`, or slicing by time) return a new dataset without
+    reading anything: the time window is passed to the reader of each day,
+    which decodes only the records inside it, and the channels are dropped as
+    soon as each day is decoded. Channel selections are kept as given and
+    resolved against the channels of the first file when they are first
+    needed (`coords`, or computing the data). The files are only opened when
+    the data is computed, by `to_frame`, `compute`, `to_xarray`, the
+    reductions (`reduce`, `mean`, ...) or `map_chunks`, one chunk at a time and in
+    parallel if `workers` or `executor` are given (see
+    `Process_data.utils.parallel.map_ordered`). Reductions over the epochs
+    only send the partial results of every chunk back.
+
+    Args:
+        - chunks (list): (date, cdf_path) of every day, in time order.
+        - read_options (dict): Arguments of `process_CDFfile_ECT` (key,
+          relevant_var, rename_mapping, valid_range, cache).
+        - time_range (tuple): (start, end) window, end exclusive.
+        - energies, alphas (list, optional): Values of the selected channels.
+          Default is None (all).
+        - selections (tuple, optional): (dimension, selector) of the channel
+          selections not resolved yet, in order (see `sel`). Default is ().
+        - workers (int, optional): Number of worker processes. Default is None.
+        - executor (concurrent.futures.Executor, optional): Default is None.
+    '''
+
+    def __init__(self, chunks, read_options, time_range, energies=None, alphas=None, selections=(),
+                 workers=None, executor=None):
+        self.chunks = chunks
+        self.read_options = read_options
+        self.time_range = time_range
+        self.energies = energies
+        self.alphas = alphas
+        self.selections = tuple(selections)
+        self.workers = workers
+        self.executor = executor
+        self._coords = None
+
+    def _replace(self, **changes):
+        arguments = dict(chunks=self.chunks, read_options=self.read_options, time_range=self.time_range,
+                         energies=self.energies, alphas=self.alphas, selections=self.selections,
+                         workers=self.workers, executor=self.executor)
+        arguments.update(changes)
+        return ECTDataset(**arguments)
+
+    def __repr__(self):
+        start, end = self.time_range
+        pending = f', pending selections={list(self.selections)}' if self.selections else ''
+        return (f'<ECTDataset: {len(self.chunks)} daily chunks from {start} to {end}, '
+                f'energies={self.energies}, alphas={self.alphas}{pending}>')
+
+    @property
+    def dims(self):
+        return DIMS_FEDU
+
+    @property
+    def coords(self):
+
+        '''
+        The selected channels: {'alpha': pitch angles, 'energy': energies}.
+        The first access opens the first file to read them, and resolves the
+        pending channel selections.
+
+        Raises:
+            - ValueError: If the dataset has no files, or a selection matches
+              no channel.
+        '''
+
+        if self._coords is None:
+            if not self.chunks:
+                raise ValueError('The dataset has no files')
+            coords = _read_coords_ECT(self.chunks[0][1])
+            for name, values in (('energy', self.energies), ('alpha', self.alphas)):
+                if values is not None:
+                    coords[name] = coords[name][resolve_channels(coords[name], list(values), name)]
+            for name, selector in self.selections:
+                coords[name] = coords[name][resolve_channels(coords[name], selector, name)]
+            self._coords = coords
+
+        return self._coords
+
+    def _channels(self):
+        # Values of the selected (energies, alphas), resolving the pending
+        # selections. Without files there is nothing to resolve them against
+        if not self.selections or not self.chunks:
+            return self.energies, self.alphas
+        selected = {name for name, _ in self.selections}
+        return (list(self.coords['energy']) if 'energy' in selected else self.energies,
+                list(self.coords['alpha']) if 'alpha' in selected else self.alphas)
+
+    def sel(self, time=None, energy=None, alpha=None):
+
+        '''
+        Select a time window and channels, lazily.
+
+        Args:
+            - time (slice, optional): slice(start, end), with the meaning of
+              `start_date` and `end_date` of the loaders (an end without time
+              of day includes that day). Default is None.
+            - energy, alpha (optional): The channels to keep, among the
+              selected ones, as in `load_CDFfiles_ECT`: a value or list of
+              values (closest channels) or a (min, max) tuple. Default is None.
+
+        Returns:
+            - ECTDataset: The selection.
+        '''
+
+        changes = {}
+        if time is not None:
+            start, end = self.time_range
+            if time.start is not None:
+                start = max(start, pd.Timestamp(time.start))
+            if time.stop is not None:
+                end = min(end, resolve_time_range(time.stop, time.stop)[1])
+            changes['time_range'] = (start, end)
+            changes['chunks'] = [(date, path) for date, path in self.chunks
+                                 if date < end and date + pd.Timedelta(days=1) > start]
+
+        # The channels are resolved against the current ones when needed
+        selections = [(name, selector) for name, selector in (('energy', energy), ('alpha', alpha))
+                      if selector is not None]
+        if selections:
+            changes['selections'] = self.selections + tuple(selections)
+
+        return self._replace(**changes)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step is not None:
+            raise TypeError('Slice an ECTDataset by time, e.g. dataset["2014-01-01":"2014-01-31"]')
+        return self.sel(time=key)
+
+    def _items(self):
+        dates = [date for date, _ in self.chunks]
+        return list(zip([path for _, path in self.chunks], get_file_ranges_ECT(dates, self.time_range)))
+
+    def _map(self, **kwargs):
+        energies, alphas = self._channels()
+        compute_chunk = functools.partial(_compute_chunk_ECT, energies=energies, alphas=alphas,
+                                          **self.read_options, **kwargs)
+        return map_ordered(compute_chunk, self._items(), self.workers, self.executor)
+
+    def map_chunks(self, func):
+
+        '''
+        Apply `func(ect_df_clean, fedu, ect_metadata, fedu_metadata)` to every
+        day of the selection and yield the results in time order. Only the
+        reading of the days runs in the workers, `func` runs in the calling
+        process.
+        '''
+
+        for chunk in self._map():
+            yield func(*chunk)
+
+    def compute(self):
+
+        '''
+        Load the selection into memory.
+
+        Returns:
+            - tuple: (ect_info, fedu, ect_metadata, fedu_metadata), as
+              `load_CDFfiles_ECT` for one probe.
+        '''
+
+        ect_acc = ColumnAccumulator()
+        fedu_acc = ArrayAccumulator()
+        ect_metadata = fedu_metadata = None
+        for ect_df_clean, fedu_data_clean, ect_metadata, fedu_metadata in self._map():
+            ect_acc.append(ect_df_clean)
+            fedu_acc.append(fedu_data_clean)
+
+        return ect_acc.to_frame(), fedu_acc.result(), ect_metadata, fedu_metadata
+
+    def to_frame(self):
+
+        '''
+        Return the scalar parameters of the selection as a DataFrame.
+        '''
+
+        return self.compute()[0]
+
+    def to_xarray(self):
+
+        '''
+        Load the selection into an xarray.Dataset with FEDU on (epoch, alpha,
+        energy) and the scalar parameters on epoch.
+
+        Raises:
+            - ImportError: If xarray is not installed.
+        '''
+
+        try:
+            import xarray as xr
+        except ImportError:
+            raise ImportError('ECTDataset.to_xarray needs xarray (pip install xarray)') from None
+
+        ect_info, fedu, ect_metadata, fedu_metadata = self.compute()
+        epochs = ect_info['epoch'].to_numpy() if 'epoch' in ect_info else np.arange(len(ect_info))
+        data_vars = {col: ('epoch', ect_info[col].to_numpy()) for col in ect_info.columns if col != 'epoch'}
+        data_vars['FEDU'] = (DIMS_FEDU, fedu, {k: v for k, v in (fedu_metadata or {}).items() if isinstance(v, (str, int, float))})
+
+        return xr.Dataset(data_vars, coords={'epoch': epochs, 'alpha': self.coords['alpha'],
+                                             'energy': self.coords['energy']})
+
+    def reduce(self, op, dim='epoch'):
+
+        '''
+        Reduce FEDU over one or more dimensions, ignoring NaN values, chunk by
+        chunk.
+
+        Args:
+            - op (str): 'mean', 'sum', 'count', 'min' or 'max'.
+            - dim (str or tuple, optional): The dimensions to reduce, among
+              'epoch', 'alpha' and 'energy'. Default is 'epoch'.
+
+        Returns:
+            - numpy.ndarray: The result, with the dimensions not reduced (in
+              the order of DIMS_FEDU). Without valid values, the mean, min and
+              max are NaN.
+
+        Raises:
+            - ValueError: If `op` or `dim` are unknown.
+        '''
+
+        if op not in REDUCTIONS:
+            raise ValueError(f"Unknown reduction '{op}', use one of {REDUCTIONS}")
+        dims = (dim,) if isinstance(dim, str) else tuple(dim)
+        unknown = [d for d in dims if d not in DIMS_FEDU]
+        if unknown:
+            raise ValueError(f'Unknown dimensions {unknown}, use some of {DIMS_FEDU}')
+        axes = tuple(sorted(DIMS_FEDU.index(d) for d in dims))
+
+        partials = list(self._map(axes=axes))
+        if not partials:
+            raise ValueError('The selection has no data')
+        if 0 in axes:
+            # Combine the partial results of the days
+            total = {'sum': sum(p['sum'] for p in partials), 'count': sum(p['count'] for p in partials),
+                     'min': functools.reduce(np.fmin, (p['min'] for p in partials)),
+                     'max': functools.reduce(np.fmax, (p['max'] for p in partials))}
+        else:
+            total = {key: np.concatenate([p[key] for p in partials]) for key in partials[0]}
+
+        if op == 'count':
+            return total['count']
+        if op == 'sum':
+            return total['sum']
+        if op == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where(total['count'] > 0, total['sum']/total['count'], np.nan)
+        return total[op]
+
+    def mean(self, dim='epoch'):
+        return self.reduce('mean', dim)
+
+    def sum(self, dim='epoch'):
+        return self.reduce('sum', dim)
+
+    def count(self, dim='epoch'):
+        return self.reduce('count', dim)
+
+    def min(self, dim='epoch'):
+        return self.reduce('min', dim)
+
+    def max(self, dim='epoch'):
+        return self.reduce('max', dim)
+
+
+def open_dataset_ECT(start_date, end_date, local_root_dir, relevant_var, rename_mapping, probe, instrument, level = '3',
+                     key='fedu', workers=None, executor=None, cache=None, valid_range=True, energies=None, alphas=None):
+
+    '''
+    Open the RBSP ECT data of one probe for a date range (e.g. the whole
+    mission) as a lazy ECTDataset, one chunk per daily file, that can be
+    sliced by time, energy and pitch angle and reduced without holding the
+    whole range in memory. Only the local directory is listed, even when
+    `energies` or `alphas` are given; the files are opened when the data is
+    computed.
+
+        ds = open_dataset_ECT('2012-09-01', '2019-10-14', root, ['Epoch', 'L'], mapping, 'a', 'rept')
+        ds['2015-03-01':'2015-03-31'].sel(energy=(2, 4), alpha=90).mean('epoch')
+
+    Args:
+        - start_date, end_date, local_root_dir, relevant_var, rename_mapping,
+          instrument, level, key, workers, executor, cache, valid_range,
+          energies, alphas: See `load_CDFfiles_ECT`. `energies` and `alphas`
+          are an initial selection of channels, like `ECTDataset.sel`.
+        - probe (str): The satellite identifier ('a' or 'b').
+
+    Returns:
+        - ECTDataset: The lazy dataset.
+    '''
+
+    time_range = resolve_time_range(start_date, end_date)
+    date_array = pd.date_range(start=time_range[0].normalize(), end=time_range[1] - pd.Timedelta(1, 'ns'), freq='D')
+    dates, filepaths = get_local_filepaths_ECT(date_array, local_root_dir, probe, instrument, '3')
+
+    read_options = {'key': key, 'relevant_var': relevant_var, 'rename_mapping': rename_mapping, 'cache': cache,
+                    'plan': build_read_plan_ECT(relevant_var, rename_mapping), 'valid_range': valid_range}
+    dataset = ECTDataset(list(zip(dates, filepaths)), read_options, time_range, workers=workers, executor=executor)
+
+    return dataset.sel(energy=energies, alpha=alphas)
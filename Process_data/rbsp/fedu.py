@@ -0,0 +1,362 @@
+import numpy as np
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+# Axes of the FEDU cube returned by read_CDFfile_ECT: (time, pitch angle, energy)
+ALPHA_AXIS = 1
+ENERGY_AXIS = 2
+
+
+############ Functions to select energy channels and pitch angles ##############
+
+def resolve_channels(values, selector, name='channel'):
+
+    '''
+    Resolve a selection of channels (energies or pitch angles) against the
+    values of the channels, returning their indices.
+
+    Args:
+        - values (numpy.ndarray): The value of every channel (e.g. FEDU_Energy).
+          If it has one row per record, the first row is used.
+        - selector: What to select:
+            - None: every channel.
+            - A number: the channel closest to it.
+            - A list or array of numbers: the channel closest to each of them,
+              in the given order.
+            - A tuple (min, max): the channels with min <= value <= max,
+              in channel order. Either bound can be None.
+        - name (str, optional): Name of the channels in error messages.
+
+    Returns:
+        - numpy.ndarray or None: The indices of the selected channels, or None
+          if every channel is selected.
+
+    Raises:
+        - ValueError: If a range does not contain any channel.
+    '''
+
+    if selector is None:
+        return None
+
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim > 1:
+        values = values[0]
+
+    if isinstance(selector, tuple):
+        low, high = selector
+        keep = np.ones(values.shape, dtype=bool)
+        if low is not None:
+            keep &= values >= low
+        if high is not None:
+            keep &= values <= high
+        index = np.flatnonzero(keep)
+        if len(index) == 0:
+            raise ValueError(f'No {name} in the range {selector}, the {name}s are {values}')
+        return index
+
+    targets = np.atleast_1d(np.asarray(selector, dtype=np.float64))
+    index = np.abs(values[np.newaxis, :] - targets[:, np.newaxis]).argmin(axis=1)
+
+    # Repeated channels (two targets closest to the same channel) only once
+    _, first = np.unique(index, return_index=True)
+    return index[np.sort(first)]
+
+
+def _as_slice(index):
+    # Contiguous increasing selections are taken as views
+    if len(index) > 0 and np.array_equal(index, np.arange(index[0], index[-1] + 1)):
+        return slice(index[0], index[-1] + 1)
+    return index
+
+
+def _select_labels(labels, index, n_channels):
+    labels_array = np.asarray(labels)
+    if labels_array.ndim == 1 and len(labels_array) == n_channels:
+        return labels_array[index]
+    return labels
+
+
+def select_FEDU(fedu_data, fedu_metadata, alpha_index=None, energy_index=None):
+
+    '''
+    Keep only some pitch angles and energy channels of a FEDU cube of shape
+    (time, pitch angle, energy), and update its metadata (values and labels of
+    the channels) to match. When pitch angles are selected, the edges of their
+    bins in the full grid are kept in 'alpha_bounds' (see `alpha_bounds`), so
+    the products integrate over the solid angle of the selected bins only.
+
+    Args:
+        - fedu_data (numpy.ndarray): The FEDU cube.
+        - fedu_metadata (dict): The FEDU metadata, with 'alpha_values',
+          'alpha_labels', 'energy_values' and 'energy_labels'.
+        - alpha_index (numpy.ndarray, optional): Indices of the pitch angles to
+          keep, as returned by `resolve_channels`. Default is None (all).
+        - energy_index (numpy.ndarray, optional): Indices of the energy
+          channels to keep. Default is None (all).
+
+    Returns:
+        - tuple: A tuple containing:
+            1. fedu_data (numpy.ndarray): A new contiguous array holding only
+               the selected channels (or `fedu_data` itself if nothing is
+               selected).
+            2. fedu_metadata (dict): A copy of the metadata for the selection.
+    '''
+
+    if alpha_index is None and energy_index is None:
+        return fedu_data, fedu_metadata
+
+    fedu_metadata = dict(fedu_metadata)
+    selection = [slice(None)]*fedu_data.ndim
+
+    if alpha_index is not None:
+        n_alpha = fedu_data.shape[ALPHA_AXIS]
+        selection[ALPHA_AXIS] = _as_slice(alpha_index)
+        bounds = fedu_metadata.get('alpha_bounds')
+        if bounds is None:
+            bounds = alpha_bounds(fedu_metadata['alpha_values'])
+        fedu_metadata['alpha_bounds'] = np.asarray(bounds)[alpha_index]
+        fedu_metadata['alpha_values'] = np.asarray(fedu_metadata['alpha_values'])[..., alpha_index]
+        fedu_metadata['alpha_labels'] = _select_labels(fedu_metadata['alpha_labels'], alpha_index, n_alpha)
+
+    if energy_index is not None:
+        n_energy = fedu_data.shape[ENERGY_AXIS]
+        selection[ENERGY_AXIS] = _as_slice(energy_index)
+        fedu_metadata['energy_values'] = np.asarray(fedu_metadata['energy_values'])[..., energy_index]
+        fedu_metadata['energy_labels'] = _select_labels(fedu_metadata['energy_labels'], energy_index, n_energy)
+
+    # Index one axis at a time, since two index arrays would be broadcast
+    # together instead of selecting a block
+    for axis in (ALPHA_AXIS, ENERGY_AXIS):
+        if not isinstance(selection[axis], slice):
+            fedu_data = np.take(fedu_data, selection[axis], axis=axis)
+            selection[axis] = slice(None)
+    fedu_data = np.ascontiguousarray(fedu_data[tuple(selection)])
+
+    return fedu_data, fedu_metadata
+
+
+############ Vectorized derived products of FEDU ##############################
+
+def alpha_bounds(alpha_values):
+
+    '''
+    Return the edges (degrees) of the bin of every pitch angle of a full grid:
+    halfway between the pitch angles, and 0 and 180 degrees for the outermost
+    ones.
+
+    Args:
+        - alpha_values (numpy.ndarray): The pitch angles, in degrees, in
+          increasing order. If it has one row per record, the first row is
+          used.
+
+    Returns:
+        - numpy.ndarray: The (lower, upper) edges of each bin, of shape
+          (pitch angle, 2).
+    '''
+
+    alpha = np.asarray(alpha_values, dtype=np.float64)
+    if alpha.ndim > 1:
+        alpha = alpha[0]
+    edges = np.concatenate([[0.0], (alpha[1:] + alpha[:-1])/2, [180.0]])
+
+    return np.stack([edges[:-1], edges[1:]], axis=1)
+
+
+def solid_angles(alpha_values, bounds=None):
+
+    '''
+    Return the solid angle (sr) of every pitch angle bin, 2*pi*(cos(a1) - cos(a2)),
+    where a1 and a2 are the edges of the bin. For a full grid (see
+    `alpha_bounds`) they add up to 4*pi, and for uniform bins they are the
+    sin(alpha) weights of the integral over pitch angle.
+
+    Args:
+        - alpha_values (numpy.ndarray): The pitch angles, in degrees, in
+          increasing order.
+        - bounds (numpy.ndarray, optional): The edges of the bins, of shape
+          (pitch angle, 2), e.g. the 'alpha_bounds' of a selection of pitch
+          angles. Default is None (`alpha_values` is the full grid).
+
+    Returns:
+        - numpy.ndarray: The solid angle of each bin.
+    '''
+
+    if bounds is None:
+        bounds = alpha_bounds(alpha_values)
+    edges = np.radians(np.asarray(bounds, dtype=np.float64))
+
+    return 2*np.pi*(np.cos(edges[:, 0]) - np.cos(edges[:, 1]))
+
+
+def omnidirectional_flux(fedu, alpha_values, bounds=None):
+
+    '''
+    Integrate FEDU over solid angle, 2*pi * integral of j(alpha) sin(alpha),
+    for every time and energy. Missing (NaN) pitch angles are left out, and
+    the integral of the valid ones is scaled by the solid angle of all the
+    bins over theirs, i.e. the missing bins are given the mean flux of the
+    valid ones. Times without any valid pitch angle give NaN.
+
+    For a full grid of pitch angles the integral is over 4*pi. For a
+    selection of them (`bounds`), it is only over the solid angle of the
+    selected bins.
+
+    Args:
+        - fedu (numpy.ndarray): FEDU of shape (time, pitch angle, energy).
+        - alpha_values (numpy.ndarray): The pitch angles (degrees).
+        - bounds (numpy.ndarray, optional): The edges of the pitch angle bins
+          (see `solid_angles`). Default is None (full grid).
+
+    Returns:
+        - numpy.ndarray: The omnidirectional flux, of shape (time, energy), in
+          the units of FEDU times sr.
+    '''
+
+    weights = solid_angles(alpha_values, bounds)
+    total_angle = weights.sum()
+    weights = weights[np.newaxis, :, np.newaxis]
+    valid = np.isfinite(fedu)
+
+    total = np.where(valid, fedu, 0).astype(np.float64, copy=False)
+    total = (total*weights).sum(axis=ALPHA_AXIS)
+    covered = (valid*weights).sum(axis=ALPHA_AXIS)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(covered > 0, total*(total_angle/covered), np.nan)
+
+
+def anisotropy(fedu, alpha_values, perpendicular=90.0, parallel=None):
+
+    '''
+    Compute the ratio between the flux perpendicular and parallel to the
+    magnetic field, j(90)/j(0), for every time and energy, using the pitch
+    angles closest to `perpendicular` and `parallel`. Missing fluxes or a
+    zero parallel flux give NaN.
+
+    Args:
+        - fedu (numpy.ndarray): FEDU of shape (time, pitch angle, energy).
+        - alpha_values (numpy.ndarray): The pitch angles (degrees).
+        - perpendicular (float, optional): Pitch angle of the numerator.
+          Default is 90.
+        - parallel (float, optional): Pitch angle of the denominator. Default
+          is None (the smallest pitch angle).
+
+    Returns:
+        - numpy.ndarray: The anisotropy, of shape (time, energy).
+    '''
+
+    alpha_values = np.asarray(alpha_values, dtype=np.float64)
+    if parallel is None:
+        parallel = alpha_values.min()
+
+    i_perp = np.abs(alpha_values - perpendicular).argmin()
+    i_para = np.abs(alpha_values - parallel).argmin()
+    j_perp = fedu[:, i_perp, :].astype(np.float64)
+    j_para = fedu[:, i_para, :].astype(np.float64)
+
+    ratio = np.full(j_perp.shape, np.nan)
+    np.divide(j_perp, j_para, out=ratio, where=(j_para > 0) & np.isfinite(j_perp))
+
+    return ratio
+
+
+def fit_sin_n(fedu, alpha_values, min_points=3):
+
+    '''
+    Fit j(alpha) = A*sin(alpha)**n to the pitch angle distribution of every
+    time and energy, by least squares on log(j) = log(A) + n*log(sin(alpha)).
+    All the fits are solved at once from the sums of the normal equations;
+    only positive and finite fluxes are used, and the field aligned bins (0
+    and 180 degrees, where log(sin(alpha)) is -inf) are left out. Fits with fewer than
+    `min_points` points (or a degenerate distribution of pitch angles) give
+    NaN.
+
+    Args:
+        - fedu (numpy.ndarray): FEDU of shape (time, pitch angle, energy).
+        - alpha_values (numpy.ndarray): The pitch angles (degrees).
+        - min_points (int, optional): Minimum number of valid pitch angles.
+          Default is 3.
+
+    Returns:
+        - tuple: A tuple containing:
+            1. amplitude (numpy.ndarray): A, of shape (time, energy).
+            2. n (numpy.ndarray): The exponent n, of shape (time, energy).
+    '''
+
+    alpha_values = np.asarray(alpha_values, dtype=np.float64)
+    # sin(180 deg) is not exactly 0 in floating point, compare the angles
+    inside = ((alpha_values > 0) & (alpha_values < 180))[np.newaxis, :, np.newaxis]
+    x = np.log(np.sin(np.radians(np.where(inside[0, :, 0], alpha_values, 90))))[np.newaxis, :, np.newaxis]
+
+    valid = np.isfinite(fedu) & (fedu > 0) & inside
+    with np.errstate(divide='ignore', invalid='ignore'):
+        y = np.where(valid, np.log(np.where(valid, fedu, 1).astype(np.float64)), 0)
+
+    s0 = valid.sum(axis=ALPHA_AXIS)
+    sx = (valid*x).sum(axis=ALPHA_AXIS)
+    sxx = (valid*x*x).sum(axis=ALPHA_AXIS)
+    sy = y.sum(axis=ALPHA_AXIS)
+    sxy = (y*x).sum(axis=ALPHA_AXIS)
+
+    det = s0*sxx - sx*sx
+    ok = (s0 >= min_points) & (np.abs(det) > 1e-12)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        n = np.where(ok, (s0*sxy - sx*sy)/det, np.nan)
+        log_amplitude = np.where(ok, (sy - n*sx)/s0, np.nan)
+
+    return np.exp(log_amplitude), n
+
+
+# Products that `compute_products_FEDU` can compute, and the arrays they return
+PRODUCTS_FEDU = {
+    'omni': ('omni',),
+    'anisotropy': ('anisotropy',),
+    'sin_n': ('sin_n_amplitude', 'sin_n_index')}
+
+
+def compute_products_FEDU(fedu, fedu_metadata, products):
+
+    '''
+    Compute derived products of a FEDU cube, using the pitch angles in its
+    metadata.
+
+    Args:
+        - fedu (numpy.ndarray): FEDU of shape (time, pitch angle, energy).
+        - fedu_metadata (dict): The FEDU metadata, with 'alpha_values' (and
+          'alpha_bounds' after a selection of pitch angles).
+        - products (list): Names of the products, among 'omni' (see
+          `omnidirectional_flux`), 'anisotropy' (see `anisotropy`) and
+          'sin_n' (see `fit_sin_n`).
+
+    Returns:
+        - dict: The arrays of the products, of shape (time, energy), named as
+          in PRODUCTS_FEDU ('omni', 'anisotropy', 'sin_n_amplitude' and
+          'sin_n_index').
+
+    Raises:
+        - ValueError: If a product is unknown.
+    '''
+
+    alpha_values = np.asarray(fedu_metadata['alpha_values'], dtype=np.float64)
+    if alpha_values.ndim > 1:
+        alpha_values = alpha_values[0]
+
+    results = {}
+    for product in products:
+        if product == 'omni':
+            results['omni'] = omnidirectional_flux(fedu, alpha_values, fedu_metadata.get('alpha_bounds'))
+        elif product == 'anisotropy':
+            results['anisotropy'] = anisotropy(fedu, alpha_values)
+        elif product == 'sin_n':
+            results['sin_n_amplitude'], results['sin_n_index'] = fit_sin_n(fedu, alpha_values)
+        else:
+            raise ValueError(f"Unknown FEDU product '{product}', use one of {list(PRODUCTS_FEDU)}")
+
+    return results
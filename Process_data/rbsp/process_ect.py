@@ -1,9 +1,24 @@
 import pandas as pd
 import cdflib
 import datetime
-import numpy as np
-import glob
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
 from Download_data.rbsp import download_ect as dd_ect
+from Process_data.rbsp.fedu import resolve_channels, select_FEDU, compute_products_FEDU, PRODUCTS_FEDU
+from Process_data.utils.parallel import map_ordered, prefetch_ordered
+from Process_data.utils.accumulate import ArrayAccumulator, ColumnAccumulator, stack_accumulators
+from Process_data.utils.epoch import decode_epoch
+from Process_data.utils.plan import build_read_plan, split_components
+from Process_data.utils.cleaning import clean_frame, clean_array
+from Process_data.utils.interpolate import interpolate_frame, interpolate_accumulator
+from Process_data.utils.compact import compact_frame, compact_array
+from Process_data.utils.file_index import FileIndex, open_file_index
+from Process_data.utils.metadata import METADATA_CACHE, MetadataTracker
+from Process_data.utils.profiling import logger, timed, track_load
+from Process_data.utils.store import PartitionedStore
+from Process_data.utils.shared import SharedArrays, frame_schema, write_shared
+from Process_data.utils.window import resolve_time_range, clip_time_range, find_record_range, read_records, count_records_in_range
 
 
 """
@@ -16,14 +31,13 @@ Date: Dic 2024
 
 ###################### Function to obtain local filenames ##########################
 
-def get_local_filepath_ECT(date, local_root_dir, probe, instrument, level = '3'):
+def get_local_filepath_ECT(date, local_root_dir, probe, instrument, level = '3', index=None):
 
     '''
     Constructs and retrieves the full local file path for RBSP ECT data files
-    based on the provided date, probe, instrument, and data level. It searches
-    within the appropriate local directory and uses a wildcard pattern (*) to
-    match versions of the file and retrieves the first file path that matches
-    the pattern.
+    based on the provided date, probe, instrument, and data level. The file is
+    looked up in a FileIndex of the local directory, which matches every
+    version of the file and returns the newest one.
 
     Args:
         - date (datetime.date): The date for the data file.
@@ -33,30 +47,72 @@ def get_local_filepath_ECT(date, local_root_dir, probe, instrument, level = '3')
         - instrument (str): The ECT instrument name ('mageis' or 'rept').
         - level (str, optional): The data processing level ('2' or '3').
           Defaults to '3'.
+        - index (Process_data.utils.file_index.FileIndex, optional): The index
+          of the local files. Default is None (the directory is listed).
 
     Returns:
-        - filepath (str): The full local file path of the RBSP ECT data file
-          that matches the pattern.
-
-    Raises:
-        - IndexError: If no file matching the configuration date is found in
-          the local directory.
+        - filepath (str): The full local file path of the newest version of the
+          RBSP ECT data file, or 0 if no file is found for that date.
     '''
 
-    filename = f"rbsp{probe}_*_ect-{instrument}-*_{date.strftime('%Y%m%d')}_v*.cdf"
+    if index is None:
+        index = FileIndex()
+
+    stem_pattern = f"rbsp{probe}_*_ect-{instrument}-*"
 
     local_dir = dd_ect.get_local_dir_ECT(date, local_root_dir, probe, instrument, level)
-    # link de interés: https://docs.python.org/es/3/library/glob.html
-#    print(glob.glob(local_dir + filename))
-    try:
-        filepath = glob.glob(local_dir + filename)[0]
+    filepath = index.find(local_dir, stem_pattern, date)
 #    print('LOCAL PATH', filepath)
-    except:
+    if filepath is None:
         filepath = 0
 
     return filepath
 
 
+def get_local_filepaths_ECT(date_array, local_root_dir, probe, instrument, level = '3', index=None):
+
+    '''
+    Retrieve the local file paths of the RBSP ECT data files for every date of
+    `date_array`, skipping (and reporting) the dates without a local file.
+
+    Args:
+        - date_array (pandas.DatetimeIndex): The dates of the files.
+        - local_root_dir (str): The root directory where the RBSP ECT data files
+          are stored locally.
+        - probe (str): The RBSP probe identifier ('a' or 'b').
+        - instrument (str): The ECT instrument name ('mageis' or 'rept').
+        - level (str, optional): The data processing level ('2' or '3').
+          Defaults to '3'.
+        - index (Process_data.utils.file_index.FileIndex, optional): The index
+          of the local files. Default is None (the index persisted in
+          `local_root_dir`, see `Process_data.utils.file_index.open_file_index`).
+
+    Returns:
+        - tuple: A tuple containing:
+            1. dates (list): The dates with a local file.
+            2. filepaths (list): The local file path for each date in `dates`.
+    '''
+
+    if index is None:
+        index = open_file_index(local_root_dir)
+
+    dates = []
+    filepaths = []
+    with timed('lookup') as stage:
+        for date in date_array:
+            filepath = get_local_filepath_ECT(date, local_root_dir, probe, instrument, level, index)
+            if filepath == 0:
+                logger.info('No file in local')
+                continue
+            dates.append(date)
+            filepaths.append(filepath)
+
+        index.save()
+        stage.add(len(filepaths))
+
+    return dates, filepaths
+
+
 ############ Functions to read and process cdf files for rept data #############
 
 def filter_metadata_ECT(original_metadata):
@@ -104,7 +160,29 @@ def filter_metadata_ECT(original_metadata):
     return filtered_metadata
 
 
-def read_CDFfile_ECT(cdf_path, key, relevant_var, rename_mapping):
+SPLIT_SUFFIXES_ECT = {'Position': ('1', '2', '3')}
+
+
+def build_read_plan_ECT(relevant_var, rename_mapping):
+
+    '''
+    Compile the variables to read from every RBSP ECT file, without duplicates,
+    with 'Position' split into one column per component.
+
+    Args:
+        - relevant_var (list): A list of variable names (str) to extract from the
+          CDF file (e.g., 'Position', 'Epoch').
+        - rename_mapping (dict): Mapping from CDF variable names to column names.
+
+    Returns:
+        - plan (Process_data.utils.plan.ReadPlan): The compiled plan.
+    '''
+
+    return build_read_plan(relevant_var, rename_mapping, SPLIT_SUFFIXES_ECT)
+
+
+def read_CDFfile_ECT(cdf_path, key, relevant_var, rename_mapping, plan=None, time_range=None, metadata_cache=None,
+                     energies=None, alphas=None):
 
     '''
     Load and parse a RBSP ECT CDF file.
@@ -119,6 +197,23 @@ def read_CDFfile_ECT(cdf_path, key, relevant_var, rename_mapping):
         - key (str): The key flux variable to load. Currently, only 'fedu' is supported.
         - relevant_var (list): A list of variable names (str) to extract from the
           CDF file (e.g., 'Position', 'Epoch').
+        - rename_mapping (dict): Mapping from CDF variable names to column names.
+        - plan (Process_data.utils.plan.ReadPlan, optional): The plan built by
+          `build_read_plan_ECT`. If given, `relevant_var` and `rename_mapping`
+          are ignored. Default is None.
+        - time_range (tuple, optional): A (start, end) window, end exclusive. If
+          given, only the records inside it are decoded, for the scalar
+          variables and for FEDU. Default is None (all the records).
+        - metadata_cache (Process_data.utils.metadata.MetadataCache, optional):
+          Cache of the metadata of every dataset version, so the attributes
+          are parsed once per version instead of once per file. Default is
+          None (the module level METADATA_CACHE).
+        - energies (optional): Energy channels of FEDU to keep, resolved
+          against FEDU_Energy: a value or list of values (closest channels) or
+          a (min, max) tuple. See `Process_data.rbsp.fedu.resolve_channels`.
+          Default is None (all the channels).
+        - alphas (optional): Pitch angles of FEDU to keep, resolved against
+          FEDU_Alpha in the same way. Default is None (all the pitch angles).
 
     Returns:
         - tuple: A tuple containing two elements:
@@ -138,52 +233,71 @@ def read_CDFfile_ECT(cdf_path, key, relevant_var, rename_mapping):
         - KeyError: If any of the variables in `relevant_var` are not found in the CDF file.
     '''
 
-    cdf = cdflib.CDF(cdf_path)
+    if plan is None:
+        plan = build_read_plan_ECT(relevant_var, rename_mapping)
+
+    if metadata_cache is None:
+        metadata_cache = METADATA_CACHE
+
+    with timed('open', cdf_path) as stage:
+        cdf = cdflib.CDF(cdf_path)
+        rec_range = find_record_range(cdf, time_range)
+        stage.add(nbytes=os.path.getsize(cdf_path))
     dict_cdf = {}
     dict_cdf_metadata = {}
 
     #Esto se puede hacer altiro como dataframe
-    for var in relevant_var:
-        var_metadata = cdf.varattsget(var)
-        filtered_metadata = filter_metadata_ECT(var_metadata)
-
-        renamed_key = rename_mapping.get(var)
-
-        if var == 'Position':
-            dict_cdf_metadata[renamed_key+'1'] = filtered_metadata
-            dict_cdf_metadata[renamed_key+'2'] = filtered_metadata
-            dict_cdf_metadata[renamed_key+'3'] = filtered_metadata
-
-            dict_cdf[renamed_key+'1'] = cdf[var][:,0]
-            dict_cdf[renamed_key+'2'] = cdf[var][:,1]
-            dict_cdf[renamed_key+'3'] = cdf[var][:,2]
-        else:
-            dict_cdf_metadata[renamed_key] = filtered_metadata
-            dict_cdf[renamed_key] = cdf[var]
+    with timed('read', cdf_path) as stage:
+        for var, names in plan.columns:
+            filtered_metadata = metadata_cache.get(cdf_path, ('ECT', var),
+                                                        lambda: filter_metadata_ECT(cdf.varattsget(var))).copy()
+
+            values = read_records(cdf, var, rec_range)
+            stage.add(nbytes=values.nbytes)
+            if len(names) == 1:
+                dict_cdf_metadata[names[0]] = filtered_metadata
+                dict_cdf[names[0]] = values
+            else:
+                for i, name in enumerate(names):
+                    dict_cdf_metadata[name] = filtered_metadata
+                    dict_cdf[name] = values[:,i]
 
-    df_cdf = pd.DataFrame(dict_cdf)
+        df_cdf = pd.DataFrame(dict_cdf)
+        stage.add(len(df_cdf))
 
-    if 'Epoch' in relevant_var:
+    if 'Epoch' in plan.variables:
 #        print('epoch')
-        df_cdf['epoch'] = pd.to_datetime(cdflib.cdfepoch.encode(df_cdf['epoch'].values))
+        with timed('epoch', cdf_path) as stage:
+            df_cdf['epoch'] = decode_epoch(df_cdf['epoch'].values)
+            stage.add(len(df_cdf))
     if key == 'fedu':
-        fedu_data = cdf['FEDU']
-        fedu_metadata = cdf.varattsget('FEDU')
-        dict_fedu_metadata = filter_metadata_ECT(fedu_metadata)
-        dict_fedu_metadata['energy_values'] = cdf['FEDU_Energy']
-        dict_fedu_metadata['energy_labels'] = cdf['FEDU_ENERGY_LABL'][0]
-        dict_fedu_metadata['alpha_values'] = cdf['FEDU_Alpha']
-        dict_fedu_metadata['alpha_labels'] = cdf['FEDU_PA_LABL'][0]
+        with timed('read_fedu', cdf_path) as stage:
+            fedu_data = read_records(cdf, 'FEDU', rec_range)
+            stage.add(len(fedu_data), fedu_data.nbytes)
+            dict_fedu_metadata = metadata_cache.get(cdf_path, ('ECT', 'FEDU'), lambda: filter_metadata_ECT(cdf.varattsget('FEDU'))).copy()
+            dict_fedu_metadata['energy_values'] = metadata_cache.get(cdf_path, 'FEDU_Energy', lambda: cdf['FEDU_Energy'])
+            dict_fedu_metadata['energy_labels'] = metadata_cache.get(cdf_path, 'FEDU_ENERGY_LABL', lambda: cdf['FEDU_ENERGY_LABL'][0])
+            dict_fedu_metadata['alpha_values'] = metadata_cache.get(cdf_path, 'FEDU_Alpha', lambda: cdf['FEDU_Alpha'])
+            dict_fedu_metadata['alpha_labels'] = metadata_cache.get(cdf_path, 'FEDU_PA_LABL', lambda: cdf['FEDU_PA_LABL'][0])
+
+            # Keep only the requested channels as soon as the day is decoded
+            alpha_index = resolve_channels(dict_fedu_metadata['alpha_values'], alphas, 'pitch angle')
+            energy_index = resolve_channels(dict_fedu_metadata['energy_values'], energies, 'energy channel')
+            fedu_data, dict_fedu_metadata = select_FEDU(fedu_data, dict_fedu_metadata, alpha_index, energy_index)
 
     return [df_cdf, dict_cdf_metadata], [fedu_data, dict_fedu_metadata]
 
 
-def clean_CDFfile_ECT(df, dict_metadata, f, f_metadata, interp=False):
+def clean_CDFfile_ECT(df, dict_metadata, f, f_metadata, interp=False, inplace=False, valid_range=True, components=None,
+                      max_gap=None):
 
     '''
-    Clean RBSP ECT data by replacing fill values for missing data (as specified
-    in the metadata) with NaN values. It can also linearly interpolate the NaN
-    values in the DataFrame 'df' if specified.
+    Clean RBSP ECT data by replacing fill values for missing data and, if
+    `valid_range` is True, values outside the valid range (as specified in the
+    metadata) with NaN values. The scalar columns and the flux array are each
+    masked in a single vectorized pass (see `Process_data.utils.cleaning`). It
+    can also linearly interpolate in time the NaN values of the science columns
+    of 'df' if specified (see `Process_data.utils.interpolate`).
 
     Args:
         - df (pandas.DataFrame): The input DataFrame containing scalar RBSP ECT data.
@@ -192,8 +306,17 @@ def clean_CDFfile_ECT(df, dict_metadata, f, f_metadata, interp=False):
         - f (numpy.ndarray): A multidimensional array containing flux data.
         - f_metadata (dict): Metadata for the flux array `f`, including fill
           values and valid ranges.
-        - interp (bool, optional): If True, applies linear interpolation to the
-          NaN values in the DataFrame `df`. Default is False.
+        - interp (bool, optional): If True, applies linear interpolation in time
+          to the NaN values of the science columns of `df`. Default is False.
+        - inplace (bool, optional): If True, the flux array `f` is cleaned in
+          place (when it is writeable) instead of on a copy. Default is False.
+        - valid_range (bool, optional): If True, values below `min_valid` or
+          above `max_valid` are also replaced by NaN. Default is True.
+        - components (dict, optional): Component index of the columns split from
+          'Position' (see `Process_data.utils.plan.split_components`), to use
+          the valid range of each component. Default is None.
+        - max_gap (optional): Longest gap between valid samples filled by the
+          interpolation (e.g. '5min'). Default is None (no limit).
 
     Returns:
         - tuple: A tuple containing:
@@ -203,41 +326,371 @@ def clean_CDFfile_ECT(df, dict_metadata, f, f_metadata, interp=False):
                replaced with NaN.
     '''
 
-    df_clean = pd.DataFrame()
-    for var in df.columns:
-        fill_value = dict_metadata[var]['fill_value']
-        min_valid = dict_metadata[var]['min_valid']
-        max_valid = dict_metadata[var]['max_valid']
-
-        df_clean[var] = df[var].replace(fill_value, np.nan)
-#        df_clean.loc[df_clean[var] > max_valid, var] = np.nan
-#        df_clean.loc[df_clean[var] < min_valid, var] = np.nan
+    df_clean = clean_frame(df, dict_metadata, valid_range, components)
     if interp:
-        print('Interpolating bad ECT data')
-        df = df.interpolate(axis=0)
+        logger.info('Interpolating bad ECT data')
+        df_clean = interpolate_frame(df_clean, dict_metadata, max_gap=max_gap)
 
     # Estamos limpiando fedus
-    fill_value = f_metadata['fill_value']
-    min_valid = f_metadata['min_valid']
-    max_valid = f_metadata['max_valid']
-
-    f_clean = np.copy(f)
-    f_clean[f_clean == fill_value] = np.nan
-    f_clean[f_clean < min_valid] = np.nan
+    f_clean = clean_array(f, f_metadata['fill_value'], f_metadata['min_valid'], f_metadata['max_valid'],
+                          valid_range, inplace)
     return df_clean, f_clean
 
 
-def load_CDFfiles_ECT(start_date, end_date, local_root_dir, relevant_var, rename_mapping, probe, instrument, level = '3', key='fedu'):
+def process_CDFfile_ECT(cdf_path, key, relevant_var, rename_mapping, cache=None, plan=None, time_range=None, valid_range=True,
+                        energies=None, alphas=None):
+
+    '''
+    Read and clean a single RBSP ECT CDF file. This is the unit of work done
+    for every day by `load_CDFfiles_ECT`, kept at module level so it can be
+    sent to worker processes.
+
+    Args:
+        - cdf_path (str): The path to the CDF file to be loaded.
+        - key (str): The key flux variable to load. Currently, only 'fedu' is supported.
+        - relevant_var (list): A list of variable names (str) to extract from the
+          CDF file (e.g., 'Position', 'Epoch').
+        - rename_mapping (dict): Mapping from CDF variable names to column names.
+        - cache (Process_data.utils.cache.DayCache, optional): Cache of cleaned
+          files. If given, the result is read from it when available and
+          stored in it otherwise. Default is None.
+        - plan (Process_data.utils.plan.ReadPlan, optional): The plan built by
+          `build_read_plan_ECT`. Default is None (built from `relevant_var` and
+          `rename_mapping`).
+        - time_range (tuple, optional): A (start, end) window, end exclusive, to
+          restrict the records read. Default is None (all the records).
+        - valid_range (bool, optional): If True, values outside the valid range
+          of their variable are replaced by NaN. Default is True.
+        - energies, alphas (optional): Energy channels and pitch angles of FEDU
+          to keep (see `read_CDFfile_ECT`). Default is None (all).
+
+    Returns:
+        - tuple: A tuple containing:
+            1. ect_df_clean (pandas.DataFrame): The cleaned scalar parameters.
+            2. fedu_data_clean (numpy.ndarray): The cleaned FEDU data.
+            3. ect_metadata (dict): Metadata for the scalar parameters.
+            4. fedu_metadata (dict): Metadata for the FEDU data.
+    '''
+
+    if plan is None:
+        plan = build_read_plan_ECT(relevant_var, rename_mapping)
+
+    fetched = _fetch_CDFfile_ECT(cdf_path, key, relevant_var, rename_mapping, cache, plan, time_range, valid_range,
+                                 energies, alphas)
+
+    return _finish_CDFfile_ECT(fetched, cache, plan, valid_range)
+
+
+def _fetch_CDFfile_ECT(cdf_path, key, relevant_var, rename_mapping, cache=None, plan=None, time_range=None, valid_range=True,
+                       energies=None, alphas=None):
+
+    '''
+    I/O part of `process_CDFfile_ECT`: look the file up in the cache and read
+    it if it is not there. Returns (cache_key, raw, result), where `raw` is
+    the output of `read_CDFfile_ECT` and `result` the cached result (only one
+    of them is not None).
+    '''
+
+    if plan is None:
+        plan = build_read_plan_ECT(relevant_var, rename_mapping)
+
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(cdf_path, plan.variables, dict(plan.columns), instrument='ECT', key=key,
+                                   time_range=time_range, valid_range=valid_range, energies=energies, alphas=alphas)
+        with timed('cache', cdf_path) as stage:
+            cached = cache.load(cache_key)
+            stage.add(0 if cached is None else len(cached[0]))
+        if cached is not None:
+            ect_df_clean, (ect_metadata, fedu_metadata), arrays = cached
+            return cache_key, None, (ect_df_clean, arrays['fedu'], ect_metadata, fedu_metadata)
+
+    fetched = read_CDFfile_ECT(cdf_path, key, relevant_var, rename_mapping, plan, time_range, energies=energies, alphas=alphas)
+
+    return cache_key, fetched, None
+
+
+def _finish_CDFfile_ECT(fetched, cache=None, plan=None, valid_range=True):
+
+    '''
+    CPU part of `process_CDFfile_ECT`: clean what `_fetch_CDFfile_ECT` read
+    and store it in the cache.
+    '''
+
+    cache_key, raw, result = fetched
+    if result is not None:
+        return result
+
+    ect, fedu = raw
+    ect_df, ect_metadata = ect
+    fedu_data, fedu_metadata = fedu
+
+    components = split_components(plan) if plan is not None else None
+
+    # fedu_data was just decoded from the file, no need to keep the raw copy
+    with timed('clean') as stage:
+        ect_df_clean, fedu_data_clean = clean_CDFfile_ECT(ect_df, ect_metadata, fedu_data, fedu_metadata, inplace=True,
+                                                          valid_range=valid_range, components=components)
+        stage.add(len(ect_df_clean), fedu_data_clean.nbytes)
+
+    if cache is not None:
+        with timed('cache'):
+            cache.store(cache_key, ect_df_clean, [ect_metadata, fedu_metadata], {'fedu': fedu_data_clean})
+
+    return ect_df_clean, fedu_data_clean, ect_metadata, fedu_metadata
+
+
+def get_file_ranges_ECT(dates, time_range):
+
+    '''
+    Return, for the daily file of each date, the part of `time_range` to read
+    from it (None when the whole day is inside the window).
+    '''
+
+    return [clip_time_range(time_range, date, date + pd.Timedelta(days=1)) for date in dates]
+
+
+def _process_day_ECT(item, **kwargs):
+    cdf_path, time_range = item
+    return process_CDFfile_ECT(cdf_path, time_range=time_range, **kwargs)
+
+
+def _process_day_shared_ECT(item, key='fedu', **kwargs):
+    # Write the day into the shared memory of `spec` if it fits, and only send
+    # back its number of records and its metadata
+    cdf_path, time_range, spec = item
+    ect_df_clean, fedu_data_clean, ect_metadata, fedu_metadata = process_CDFfile_ECT(cdf_path, key, time_range=time_range,
+                                                                                     **kwargs)
+    arrays = {col: ect_df_clean[col].to_numpy() for col in ect_df_clean.columns}
+    arrays[key] = fedu_data_clean
+    if len(fedu_data_clean) == len(ect_df_clean) and write_shared(spec, 0, spec['rows'], arrays):
+        return len(ect_df_clean), ect_metadata, fedu_metadata
+
+    return ect_df_clean, fedu_data_clean, ect_metadata, fedu_metadata
+
+
+def _map_shared_ECT(process_day, process_shared, items, key, workers, executor):
+
+    '''
+    Process the days on the pool like `map_ordered`, but with the cleaned
+    data of every day written by the workers into shared memory allocated
+    here (sized from the number of records of its file), so it does not go
+    through pickles, and returned as views of it. The first day is processed
+    here, to learn the columns and dtypes of the data.
+    '''
+
+    items = list(items)
+    if not items:
+        return
+
+    first = process_day(items[0])
+    yield first
+
+    columns = first[0].columns
+    schema = frame_schema(first[0], {key: first[1]})
+    if schema is None:
+        # Columns that cannot be shared, send them pickled
+        yield from map_ordered(process_day, items[1:], workers, executor)
+        return
+
+    blocks = {}
+
+    def shared_items():
+        for i, (cdf_path, time_range) in enumerate(items[1:]):
+            blocks[i] = SharedArrays(schema, count_records_in_range(cdf_path, time_range, 'FEDU'))
+            yield cdf_path, time_range, blocks[i].spec
+
+    try:
+        for i, result in enumerate(map_ordered(process_shared, shared_items(), workers, executor)):
+            block = blocks.pop(i)
+            block.unlink()
+            if isinstance(result[0], pd.DataFrame):
+                yield result
+            else:
+                n, ect_metadata, fedu_metadata = result
+                yield block.frame(columns, 0, n), block.arrays[key][:n], ect_metadata, fedu_metadata
+    finally:
+        # The consumer stopped early or a day failed
+        for block in blocks.values():
+            block.unlink()
+
+
+def _fetch_day_ECT(item, **kwargs):
+    cdf_path, time_range = item
+    return _fetch_CDFfile_ECT(cdf_path, time_range=time_range, **kwargs)
+
+
+def _iter_files_ECT(dates, filepaths, file_ranges, key, relevant_var, rename_mapping, workers, executor, cache, valid_range,
+                    prefetch=None, energies=None, alphas=None, shared_memory=False):
+    plan = build_read_plan_ECT(relevant_var, rename_mapping)
+    items = zip(filepaths, file_ranges)
+
+    if prefetch and executor is None and (workers is None or workers <= 1):
+        # Read the next files in background threads while this one is cleaned
+        fetch_day = functools.partial(_fetch_day_ECT, key=key, relevant_var=relevant_var,
+                                      rename_mapping=rename_mapping, cache=cache, plan=plan,
+                                      valid_range=valid_range, energies=energies, alphas=alphas)
+        results = (_finish_CDFfile_ECT(fetched, cache, plan, valid_range)
+                   for fetched in prefetch_ordered(fetch_day, items, prefetch))
+    else:
+        process_day = functools.partial(_process_day_ECT, key=key, relevant_var=relevant_var,
+                                        rename_mapping=rename_mapping, cache=cache, plan=plan,
+                                        valid_range=valid_range, energies=energies, alphas=alphas)
+        if shared_memory and (executor is not None or (workers is not None and workers > 1)):
+            process_shared = functools.partial(_process_day_shared_ECT, key=key, relevant_var=relevant_var,
+                                               rename_mapping=rename_mapping, cache=cache, plan=plan,
+                                               valid_range=valid_range, energies=energies, alphas=alphas)
+            results = _map_shared_ECT(process_day, process_shared, items, key, workers, executor)
+        else:
+            results = map_ordered(process_day, items, workers, executor)
+    for date, (ect_df_clean, fedu_data_clean, ect_metadata, fedu_metadata) in zip(dates, results):
+        yield date, ect_df_clean, ect_metadata, fedu_data_clean, fedu_metadata
+
+
+def iter_CDFfiles_ECT(start_date, end_date, local_root_dir, relevant_var, rename_mapping, probe, instrument, level = '3', key='fedu',
+                      workers=None, executor=None, cache=None, valid_range=True, prefetch=None, energies=None, alphas=None,
+                      shared_memory=False):
+
+    '''
+    Iterate over the RBSP ECT CDF files of a single probe for a specified date
+    range, yielding the cleaned data of one day at a time. Only the days being
+    processed are held in memory (with `workers`, up to twice as many days as
+    workers are processed ahead), and only the records between `start_date`
+    and `end_date` are decoded.
+
+    Args:
+        - start_date (datetime.date or datetime.datetime): The start of the range
+          to process (inclusive).
+        - end_date (datetime.date or datetime.datetime): The end of the range to
+          process (inclusive). A date without time includes the whole day.
+        - local_root_dir (str): Path to the local directory containing the CDF files.
+        - relevant_var (list): List of variable names to extract from the CDF files.
+        - rename_mapping (dict): Mapping from CDF variable names to column names.
+        - probe (str): The satellite identifier ('a' or 'b').
+        - instrument (str): The instrument name whose data will be processed
+          ('rept' or 'mageis').
+        - level (str, optional): Data processing level ('2' or '3'). Default is '3'.
+        - key (str, optional): Key to specify the flux data to extract. Default is 'fedu'.
+        - workers, executor, cache, valid_range, prefetch, energies, alphas,
+          shared_memory: See `load_CDFfiles_ECT`. With `shared_memory`, the
+          DataFrame and FEDU of each day (but the first) are views of a
+          block of shared memory, freed once they are no longer used.
+
+    Returns:
+        - generator: For each day with a local file, a tuple containing:
+            1. date (pandas.Timestamp): The date of the file.
+            2. ect_df_clean (pandas.DataFrame): The cleaned scalar parameters.
+            3. ect_metadata (dict): Metadata for the scalar parameters.
+            4. fedu_data_clean (numpy.ndarray): The cleaned FEDU data.
+            5. fedu_metadata (dict): Metadata for the FEDU data.
+    '''
+
+    time_range = resolve_time_range(start_date, end_date)
+    date_array = pd.date_range(start=time_range[0].normalize(), end=time_range[1] - pd.Timedelta(1, 'ns'), freq='D')
+    dates, filepaths = get_local_filepaths_ECT(date_array, local_root_dir, probe, instrument, '3')
+    file_ranges = get_file_ranges_ECT(dates, time_range)
+
+    yield from _iter_files_ECT(dates, filepaths, file_ranges, key, relevant_var, rename_mapping, workers, executor, cache,
+                               valid_range, prefetch, energies, alphas, shared_memory)
+
+
+def _load_probe_ECT(p, date_array, time_range, local_root_dir, relevant_var, rename_mapping, instrument, key, workers, executor,
+                    cache, fedu_dir, valid_range, prefetch, index, energies, alphas, products=None, keep_fedu=True,
+                    interp=False, max_gap=None, compact=False, shared_memory=False):
+
+    '''
+    Load the data of a single probe for `load_CDFfiles_ECT`. The scalar
+    parameters are returned in their ColumnAccumulator, so they can be turned
+    into a DataFrame or stacked with the other probe. The FEDU products are
+    computed day by day and returned in a dictionary (None if no product is
+    requested).
+    '''
+
+    ect_acc = ColumnAccumulator()
+
+    dates, filepaths = get_local_filepaths_ECT(date_array, local_root_dir, p, instrument, '3', index)
+    file_ranges = get_file_ranges_ECT(dates, time_range)
+
+    if not keep_fedu:
+        fedu_acc = None
+    elif fedu_dir is None:
+        fedu_acc = ArrayAccumulator()
+    else:
+        # The size of the file must be known before writing to it
+        os.makedirs(fedu_dir, exist_ok=True)
+        n_records = sum(count_records_in_range(filepath, file_range, 'FEDU')
+                        for filepath, file_range in zip(filepaths, file_ranges))
+        fedu_path = os.path.join(fedu_dir, f"rbsp{p}_{instrument}_fedu_{date_array[0].strftime('%Y%m%d')}_"
+                                           f"{date_array[-1].strftime('%Y%m%d')}.npy")
+        fedu_acc = ArrayAccumulator(n_records, filename=fedu_path)
+        ect_acc.reserve(n_records)
+    product_accs = {name: ArrayAccumulator() for product in products or [] for name in PRODUCTS_FEDU[product]}
+    row_offsets = []
+    n_rows = 0
+    ect_tracker = MetadataTracker(f'rbsp{p} {instrument}')
+    fedu_tracker = MetadataTracker(f'rbsp{p} {instrument} FEDU')
+    # Returned as they are if there is no file in the range
+    ect_metadata, fedu_metadata = {}, {}
+
+    for date, ect_df_clean, ect_metadata, fedu_data_clean, fedu_metadata in _iter_files_ECT(dates, filepaths, file_ranges, key, relevant_var, rename_mapping,
+                                                                                           workers, executor, cache, valid_range,
+                                                                                           prefetch, energies, alphas, shared_memory):
+        ect_tracker.update(date, ect_metadata)
+        fedu_tracker.update(date, fedu_metadata)
+        if compact:
+            with timed('compact'):
+                ect_df_clean = compact_frame(ect_df_clean, ect_metadata)
+                fedu_data_clean = compact_array(fedu_data_clean)
+        if products:
+            with timed('products') as stage:
+                day_products = compute_products_FEDU(fedu_data_clean, fedu_metadata, products)
+                stage.add(len(fedu_data_clean))
+        with timed('accumulate') as stage:
+            row_offsets.append(n_rows)
+            n_rows += len(fedu_data_clean)
+            ect_acc.append(ect_df_clean)
+            stage.add(len(ect_df_clean), int(ect_df_clean.memory_usage(index=False).sum()))
+            if products:
+                for name, values in day_products.items():
+                    product_accs[name].append(compact_array(values) if compact else values)
+            if fedu_acc is not None:
+                fedu_acc.append(fedu_data_clean)
+                stage.add(nbytes=fedu_data_clean.nbytes)
+
+    if interp:
+        logger.info('Interpolating bad ECT data')
+        with timed('interpolate') as stage:
+            interpolate_accumulator(ect_acc, ect_metadata, max_gap=max_gap)
+            stage.add(ect_acc.size)
+
+    fedu = None if fedu_acc is None else fedu_acc.result()
+    fedu_products = {name: acc.result() for name, acc in product_accs.items()} if products else None
+
+    if fedu_dir is not None and fedu_acc is not None:
+        fedu_metadata['row_offsets'] = pd.DataFrame({'start': row_offsets, 'stop': row_offsets[1:] + [n_rows]},
+                                                    index=pd.DatetimeIndex(dates, name='date'))
+
+    return ect_acc, fedu, ect_metadata, fedu_metadata, fedu_products
+
+
+def load_CDFfiles_ECT(start_date, end_date, local_root_dir, relevant_var, rename_mapping, probe, instrument, level = '3', key='fedu', workers=None, executor=None,
+                      cache=None, fedu_dir=None, valid_range=True, prefetch=None, combine=False, energies=None, alphas=None,
+                      products=None, keep_fedu=True, interp=False, max_gap=None, compact=False, profile=None,
+                      shared_memory=False):
 
     '''
     Load and process RBSP ECT CDF files for a specified date range and selected
     RBSP probes (A, B, or both). It extracts scalar parameters, multi-dimensional
     flux data and associated metadata. The cleaned and processed data is returned
-    for further analysis.
+    for further analysis. The files are processed one day at a time by
+    `iter_CDFfiles_ECT`.
 
     Args:
-        - start_date (datetime.date): The start date of the range to process (inclusive).
-        - end_date (datetime.date): The end date of the range to process (inclusive).
+        - start_date (datetime.date or datetime.datetime): The start of the range
+          to process (inclusive).
+        - end_date (datetime.date or datetime.datetime): The end of the range to
+          process (inclusive). A date without time includes the whole day. Only
+          the records inside the range are decoded and returned.
         - local_root_dir (str): Path to the local directory containing the CDF files.
         - relevant_var (list): List of variable names to extract from the CDF files.
         - probe (str): The satellite identifier ('a', 'b', or 'both'). If 'both',
@@ -247,6 +700,89 @@ def load_CDFfiles_ECT(start_date, end_date, local_root_dir, relevant_var, rename
         - level (str, optional): Data processing level ('2' or '3'). Default is '3'.
         - key (str, optional): Key to specify the flux data to extract. Default is 'fedu'.
           Currently onle 'fedu' is supported.
+        - workers (int, optional): Number of worker processes used to read and
+          clean the daily files in parallel. None or 1 processes the files
+          serially. The results are reassembled in date order, so the output is
+          the same as in the serial case. Default is None.
+        - executor (concurrent.futures.Executor, optional): An existing executor
+          used instead of creating a process pool. Default is None.
+        - cache (Process_data.utils.cache.DayCache, optional): Cache of cleaned
+          daily files. Files already in the cache are not decoded again.
+          Default is None.
+        - fedu_dir (str, optional): If given, the cleaned FEDU of every day is
+          written into a single .npy file in this directory (one per probe,
+          named rbsp<probe>_<instrument>_fedu_<start>_<end>.npy) and `fedu` is
+          returned as a read/write np.memmap of that file, so the whole cube is
+          never held in memory. `fedu_metadata` then also has a 'row_offsets'
+          DataFrame with the first ('start') and one-past-last ('stop') row of
+          every day in `fedu` and `ect_info`. Default is None.
+        - valid_range (bool, optional): If True, values below VALIDMIN or above
+          VALIDMAX (scalar parameters and FEDU) are replaced by NaN, like the
+          fill values. Default is True.
+        - prefetch (int, optional): Number of daily files read ahead by
+          background threads while the current day is cleaned and accumulated
+          in the calling thread, so reading and cleaning overlap. At most
+          `prefetch` days are held in memory besides the current one. Ignored
+          when `workers` or `executor` are given. Default is None (no
+          prefetching).
+        - combine (bool, optional): If True, return a single `ect_info` for all
+          the probes, indexed by a (probe, epoch) MultiIndex, instead of one
+          list per probe (see Returns). It requires 'Epoch' in `relevant_var`.
+          Default is False.
+        - energies (optional): Energy channels of FEDU to keep, resolved
+          against FEDU_Energy (MeV): a value or list of values (the closest
+          channels are kept, in that order) or a (min, max) tuple (the channels
+          inside the range, either bound can be None). The other channels are
+          dropped right after each day is decoded, so neither the cleaning nor
+          the result hold them. The energy values and labels in
+          `fedu_metadata` are updated to match. Default is None (all).
+        - alphas (optional): Pitch angles of FEDU to keep, resolved against
+          FEDU_Alpha (degrees) in the same way. Default is None (all).
+        - products (list, optional): Derived products of FEDU computed day by
+          day, right after cleaning, with the pitch angles in `fedu_metadata`
+          (after the selection of `energies` and `alphas`): 'omni'
+          (omnidirectional flux), 'anisotropy' (90/0 degree flux ratio) and
+          'sin_n' (fit of A*sin(alpha)**n). See Process_data.rbsp.fedu.
+          Default is None (no products).
+        - keep_fedu (bool, optional): If False, the FEDU cube is not kept
+          (`fedu` is None and `fedu_dir` is ignored), only its products.
+          Default is True.
+        - interp (bool, optional): If True, the NaN values of the science
+          columns of `ect_info` (not the support data) are linearly
+          interpolated in time, once all the days of a probe are loaded, so
+          gaps across midnight are filled too. FEDU is not interpolated. It
+          requires 'Epoch' in `relevant_var`. Default is False.
+        - max_gap (optional): Longest gap between valid samples filled by the
+          interpolation (e.g. '5min'); longer gaps are left as NaN. Default is
+          None (no limit).
+        - compact (bool, optional): If True, every day is stored in less
+          memory before it is accumulated: FEDU and its products as float32,
+          the floating point scalar parameters as float32 and the integer
+          ones in the smallest type allowed by their valid range (see
+          `Process_data.utils.compact`). Default is False.
+        - profile (optional): Profiling of the stages of the load (file
+          lookup, open, reads, epoch decoding, cleaning, accumulation, ...):
+          True logs a summary table at the end, a callable is called with the
+          timing of every stage and a `Process_data.utils.profiling.LoadProfile`
+          is filled with them. The stages run by worker processes are not
+          timed. The timings are always logged at DEBUG level to the
+          'Process_data.profile' logger. Default is None.
+        - shared_memory (bool, optional): If True, with `workers` or
+          `executor`, the worker processes write the cleaned data of every day
+          into shared memory allocated by this process, sized from the number
+          of records of its file, instead of sending it back pickled (see
+          `Process_data.utils.shared`). The first day of every probe is then
+          processed by this process, to learn the layout of the data. The
+          result is the same. Default is False.
+
+    With probe='both' the two probes are loaded at the same time, in two
+    threads sharing the local file index and the metadata cache, unless the
+    days are processed by worker processes (`workers` or `executor`): the
+    probes are then loaded one after the other, since forking the workers
+    from one thread while the other holds a lock can deadlock them.
+
+    A probe without any local file in the range (e.g. a gap of the mission)
+    gets an empty DataFrame, FEDU array and metadata.
 
     Returns:
         - list: A list containing the processed data for the selected probes:
@@ -255,53 +791,141 @@ def load_CDFfiles_ECT(start_date, end_date, local_root_dir, relevant_var, rename
                 2. fedu (numpy.ndarray): A NumPy array with cleaned multi-dimensional FEDU data.
                 3. ect_metadata (dict): Metadata for the scalar parameters in `ect_info`.
                 4. fedu_metadata (dict): Metadata for the multi-dimensional FEDU data.
+                5. fedu_products (dict): Only if `products` is given, the arrays
+                   of the products, of shape (time, energy) and with rows
+                   matching `ect_info`, named 'omni', 'anisotropy',
+                   'sin_n_amplitude' and 'sin_n_index'.
+        - If `combine` is True, a single list instead:
+            1. ect_info (pandas.DataFrame): The scalar parameters of all the
+               probes, indexed by (probe, epoch), probe by probe in time order.
+            2. fedu (dict): The FEDU array of each probe, whose rows match
+               `ect_info.loc[probe]`.
+            3. ect_metadata (dict): The metadata of the scalar parameters of
+               each probe.
+            4. fedu_metadata (dict): The metadata of the FEDU data of each probe.
+            5. fedu_products (dict): Only if `products` is given, the products
+               of each probe.
+
+    Raises:
+        - ValueError: If a product is unknown.
     '''
 
-    print(f'\nPROCESSING ECT-{instrument.upper()} INSTRUMENT DATA')
+    unknown = [product for product in products or [] if product not in PRODUCTS_FEDU]
+    if unknown:
+        raise ValueError(f'Unknown FEDU products {unknown}, use some of {list(PRODUCTS_FEDU)}')
 
-    date_array = pd.date_range(start=start_date, end=end_date, freq='D')
-    output = []
+    with track_load(f'ECT-{instrument.upper()}', profile):
+        logger.info(f'\nPROCESSING ECT-{instrument.upper()} INSTRUMENT DATA')
 
-    if probe=='both':
-        probes_list = ['a', 'b']
-    else:
-        probes_list = [probe]
+        time_range = resolve_time_range(start_date, end_date)
+        date_array = pd.date_range(start=time_range[0].normalize(), end=time_range[1] - pd.Timedelta(1, 'ns'), freq='D')
 
-    print(probes_list)
+        if probe=='both':
+            probes_list = ['a', 'b']
+        else:
+            probes_list = [probe]
+
+        logger.info('%s', probes_list)
+
+        # Shared by the probes, which are loaded at the same time
+        index = open_file_index(local_root_dir)
+        load_probe = functools.partial(_load_probe_ECT, date_array=date_array, time_range=time_range, local_root_dir=local_root_dir,
+                                       relevant_var=relevant_var, rename_mapping=rename_mapping, instrument=instrument, key=key,
+                                       workers=workers, executor=executor, cache=cache, fedu_dir=fedu_dir,
+                                       valid_range=valid_range, prefetch=prefetch, index=index,
+                                       energies=energies, alphas=alphas, products=products, keep_fedu=keep_fedu,
+                                       interp=interp, max_gap=max_gap, compact=compact, shared_memory=shared_memory)
+
+        processes = executor is not None or (workers is not None and workers > 1)
+        if len(probes_list) > 1 and not processes:
+            with ThreadPoolExecutor(max_workers=len(probes_list)) as pool:
+                results = list(pool.map(load_probe, probes_list))
+        else:
+            results = [load_probe(p) for p in probes_list]
+
+        with timed('finalize') as stage:
+            if combine:
+                ect_info = stack_accumulators([result[0] for result in results], probes_list)
+                output = [ect_info] + [{p: result[i] for p, result in zip(probes_list, results)} for i in range(1, 4)]
+                if products:
+                    output.append({p: result[4] for p, result in zip(probes_list, results)})
+            else:
+                output = [[ect_acc.to_frame(), fedu, ect_metadata, fedu_metadata] + ([fedu_products] if products else [])
+                          for ect_acc, fedu, ect_metadata, fedu_metadata, fedu_products in results]
+            stage.add(sum(result[0].size for result in results))
 
-    for p in probes_list:
-        f = []
-        flag = True
-#        print(p)
+        logger.info('----')
+        logger.info("DONE")
+        logger.info('----')
 
-        for date in date_array:
-            filepath = get_local_filepath_ECT(date, local_root_dir, p, instrument, '3')
-            if filepath == 0:
-                print('No file in local')
-                continue
-            ect, fedu = read_CDFfile_ECT(filepath, key, relevant_var, rename_mapping)
+    return output
 
-            ect_df, ect_metadata = ect
-            fedu_data, fedu_metadata = fedu
 
-            ect_df_clean, fedu_data_clean = clean_CDFfile_ECT(ect_df, ect_metadata, fedu_data, fedu_metadata)
+############ Incremental store for daily runs ##################################
 
-            if flag:
-                ect_info = ect_df_clean.copy()
-                flag=False
+def update_store_ECT(store_dir, start_date, end_date, local_root_dir, relevant_var, rename_mapping, probe, instrument, level = '3',
+                     key='fedu', workers=None, executor=None, valid_range=True, prefetch=None, energies=None, alphas=None):
 
-            else:
-                ect_info = pd.concat([ect_info, ect_df_clean])
+    '''
+    Add the RBSP ECT files of a date range to an incremental store (see
+    `Process_data.utils.store.PartitionedStore`), one partition per day:
+    the scalar parameters as Parquet and FEDU as one .npy chunk per day.
+    Only the days without a partition, or whose local file changed since it
+    was stored (a new version, or a re-downloaded file), are read and
+    cleaned, so a daily run costs one day whatever the length of the store.
+    The whole files are stored, whatever the time of `start_date` and
+    `end_date`.
+
+    The store of each probe is in <store_dir>/rbsp<probe> and is read with
+    `Process_data.utils.store.open_store`, e.g.
+    open_store(f'{store_dir}/rbspa', '2014-01-01', '2014-01-31').to_frame().
 
-            f.append(fedu_data_clean)
+    Args:
+        - store_dir (str): Directory of the store.
+        - start_date, end_date, local_root_dir, relevant_var, rename_mapping,
+          probe, instrument, level, key, workers, executor, valid_range,
+          prefetch, energies, alphas: See `load_CDFfiles_ECT`. 'Epoch' must be
+          in `relevant_var`. The options that change the stored data must be
+          the same in every update of a store.
+
+    Returns:
+        - dict: The dates (partitions) written for each probe.
 
-        ect_info = ect_info.reset_index(drop=True)
-        fedu = np.concatenate(f, axis=0)
+    Raises:
+        - ValueError: If 'Epoch' is not in `relevant_var`, or the store was
+          created with other options.
+    '''
 
-        output.append([ect_info, fedu, ect_metadata, fedu_metadata])
+    if 'Epoch' not in relevant_var:
+        raise ValueError("The store needs the epochs, add 'Epoch' to relevant_var")
 
-    print('----')
-    print("DONE")
-    print('----')
+    time_range = resolve_time_range(start_date, end_date)
+    date_array = pd.date_range(start=time_range[0].normalize(), end=time_range[1] - pd.Timedelta(1, 'ns'), freq='D')
+    probes_list = ['a', 'b'] if probe == 'both' else [probe]
+    options = {'instrument': instrument, 'key': key, 'relevant_var': list(relevant_var),
+               'rename_mapping': rename_mapping, 'valid_range': valid_range, 'energies': energies, 'alphas': alphas}
 
-    return output
+    index = open_file_index(local_root_dir)
+    written = {}
+    for p in probes_list:
+        store = PartitionedStore(os.path.join(store_dir, f'rbsp{p}'), dict(options, probe=p))
+        dates, filepaths = get_local_filepaths_ECT(date_array, local_root_dir, p, instrument, '3', index)
+        new = [(date, filepath) for date, filepath in zip(dates, filepaths)
+               if not store.is_current(date.strftime('%Y-%m-%d'), filepath)]
+        logger.info(f'ECT-{instrument.upper()} rbsp{p} store: {len(new)} new or changed days of {len(dates)}')
+
+        written[p] = []
+        new_dates = [date for date, _ in new]
+        new_paths = [filepath for _, filepath in new]
+        days = _iter_files_ECT(new_dates, new_paths, [None]*len(new), key, relevant_var, rename_mapping, workers, executor,
+                               None, valid_range, prefetch, energies, alphas)
+        try:
+            for filepath, (date, ect_df_clean, ect_metadata, fedu_data_clean, fedu_metadata) in zip(new_paths, days):
+                label = date.strftime('%Y-%m-%d')
+                store.write(label, filepath, ect_df_clean, [ect_metadata, fedu_metadata], {'fedu': fedu_data_clean})
+                written[p].append(label)
+        finally:
+            # The days written so far are kept if the run is interrupted
+            store.save()
+
+    return written
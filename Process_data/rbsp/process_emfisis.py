@@ -2,11 +2,22 @@ import pandas as pd
 import cdflib
 import datetime
 import numpy as np
-import glob
 import pathlib
 from Download_data.rbsp import download_emfisis as dd_emf
 import os
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import matplotlib.pyplot as plt
+from Process_data.utils.parallel import map_ordered, prefetch_ordered
+from Process_data.utils.accumulate import ColumnAccumulator, stack_accumulators
+from Process_data.utils.epoch import decode_epoch
+from Process_data.utils.plan import build_read_plan
+from Process_data.utils.file_index import FileIndex, open_file_index
+from Process_data.utils.metadata import METADATA_CACHE, MetadataTracker
+from Process_data.utils.interpolate import interpolate_frame, interpolate_accumulator
+from Process_data.utils.compact import compact_frame, pack_flags
+from Process_data.utils.profiling import logger, timed, track_load
+from Process_data.utils.window import resolve_time_range, clip_time_range, find_record_range, read_records
 
 
 """
@@ -16,14 +27,13 @@ Adapted from original codes by Victor Pinto
 Date: Sept 2025
 """
 
-def get_local_filepath_EMFISIS(date, local_root_dir, probe,level = '3',coordinates = 'geo', interval= '4'):
+def get_local_filepath_EMFISIS(date, local_root_dir, probe,level = '3',coordinates = 'geo', interval= '4', index=None):
 
     '''
     Constructs and retrieves the full local file path for RBSP EMFISIS data files
-    based on the provided date, probe, instrument, and data level. It searches
-    within the appropriate local directory and uses a wildcard pattern (*) to
-    match versions of the file and retrieves the first file path that matches
-    the pattern.
+    based on the provided date, probe, instrument, and data level. The file is
+    looked up in a FileIndex of the local directory, which matches every
+    version of the file and returns the newest one.
 
     Args:
         - date (datetime.date): The date for the data file.
@@ -33,24 +43,30 @@ def get_local_filepath_EMFISIS(date, local_root_dir, probe,level = '3',coordinat
         - instrument (str): The ECT instrument name ('mageis' or 'rept').
         - level (str, optional): The data processing level ('2' or '3').
           Defaults to '3'.
+        - index (Process_data.utils.file_index.FileIndex, optional): The index
+          of the local files. Default is None (the directory is listed).
 
     Returns:
-        - filepath (str): The full local file path of the RBSP ECT data file
-          that matches the pattern.
+        - filepath (str): The full local file path of the newest version of the
+          RBSP EMFISIS data file.
 
     Raises:
         - IndexError: If no file matching the configuration date is found in
           the local directory.
     '''
 
+    if index is None:
+        index = FileIndex()
 
-    filename = f"rbsp-{probe}_magnetometer_{interval}sec-{coordinates}_emfisis-l{level}_{date.strftime('%Y%m%d')}_v*.cdf"
+    stem_pattern = f"rbsp-{probe}_magnetometer_{interval}sec-{coordinates}_emfisis-l{level}"
 
     # rbsp-a_magnetometer_4sec-geo_emfisis-l3_20140226_v1.3.2.cdf
 
     local_dir = dd_emf.get_local_dir_EMFISIS(date, local_root_dir, probe,level)
-    filepath = glob.glob(os.path.join(local_dir , filename))[0]
+    filepath = index.find(local_dir, stem_pattern, date)
 #    print('LOCAL PATH', filepath)
+    if filepath is None:
+        raise IndexError(f"No local EMFISIS file for rbsp-{probe} on {date.strftime('%Y-%m-%d')} in {local_dir}")
 
     return filepath
 
@@ -103,7 +119,39 @@ def filter_metadata_EMFISIS(original_metadata):
     return pd.DataFrame.from_dict(filtered_metadata, orient='index')
 
 
-def read_CDFfile_EMFISIS(cdf_path, relevant_var, rename_mapping):
+# Quality flags (and |B|) always read with the magnetometer data, with their
+# fixed column names
+REQUIRED_VAR_EMFISIS = {
+    'magFill': 'did fill?',
+    'magInvalid': 'is valid?',
+    'calState': 'calibrating?',
+    'Magnitude': '|B|'}
+
+SPLIT_SUFFIXES_EMFISIS = {
+    'coordinates': ('1', '2', '3'),
+    'Mag': ('-x1', '-x2', '-x3')}
+
+
+def build_read_plan_EMFISIS(relevant_var, rename_mapping):
+
+    '''
+    Compile the variables to read from every RBSP EMFISIS file: the requested
+    ones followed by the quality flags and 'Magnitude', without duplicates,
+    with 'Mag' and 'coordinates' split into one column per component.
+
+    Args:
+        - relevant_var (list): A list of variable names (str) to extract from the
+          CDF file (e.g., 'Mag', 'Epoch').
+        - rename_mapping (dict): Mapping from CDF variable names to column names.
+
+    Returns:
+        - plan (Process_data.utils.plan.ReadPlan): The compiled plan.
+    '''
+
+    return build_read_plan(relevant_var, rename_mapping, SPLIT_SUFFIXES_EMFISIS, REQUIRED_VAR_EMFISIS)
+
+
+def read_CDFfile_EMFISIS(cdf_path, relevant_var, rename_mapping, plan=None, time_range=None, metadata_cache=None):
 
     '''
     Load and parse a RBSP EMFISIS CDF file.
@@ -116,7 +164,20 @@ def read_CDFfile_EMFISIS(cdf_path, relevant_var, rename_mapping):
     Args:
         - cdf_path (str): The path to the CDF file to be loaded.
         - relevant_var (list): A list of variable names (str) to extract from the
-          CDF file (e.g., 'Position', 'Epoch').
+          CDF file (e.g., 'Position', 'Epoch'). It is not modified.
+        - rename_mapping (dict): Mapping from CDF variable names to column names.
+          It is not modified.
+        - plan (Process_data.utils.plan.ReadPlan, optional): The plan built by
+          `build_read_plan_EMFISIS`. If given, `relevant_var` and
+          `rename_mapping` are ignored, which avoids compiling them again for
+          every file. Default is None.
+        - time_range (tuple, optional): A (start, end) window, end exclusive. If
+          given, only the records inside it are decoded. Default is None (all
+          the records).
+        - metadata_cache (Process_data.utils.metadata.MetadataCache, optional):
+          Cache of the metadata of every dataset version, so the attributes
+          are parsed once per version instead of once per file. Default is
+          None (the module level METADATA_CACHE).
 
     Returns:
         - tuple: A tuple containing two elements:
@@ -128,66 +189,69 @@ def read_CDFfile_EMFISIS(cdf_path, relevant_var, rename_mapping):
         - KeyError: If any of the variables in relevant_var are not found in the CDF file.
     '''
 
-    cdf = cdflib.CDF(cdf_path)
-    dict_cdf = {}
-    dict_cdf_metadata = {}
-    rename_mapping['magInvalid'] = 'is valid?'
-    rename_mapping['calState'] = 'calibrating?'
-    rename_mapping['magFill'] = 'did fill?'
-    rename_mapping['Magnitude'] = '|B|'
-    Obligatorios = ['magFill','magInvalid', 'calState','Magnitude']
-    relevant_var.extend(Obligatorios)
-    #Esto se puede hacer altiro como dataframe
-    for var in relevant_var:
-        var_metadata = cdf.varattsget(var)
-        filtered_metadata = filter_metadata_EMFISIS(var_metadata)
+    if plan is None:
+        plan = build_read_plan_EMFISIS(relevant_var, rename_mapping)
 
-        renamed_key = rename_mapping.get(var)
+    if metadata_cache is None:
+        metadata_cache = METADATA_CACHE
 
-        if var == 'coordinates':
-            dict_cdf_metadata[renamed_key+'1'] = filtered_metadata
-            dict_cdf_metadata[renamed_key+'2'] = filtered_metadata
-            dict_cdf_metadata[renamed_key+'3'] = filtered_metadata
-
-            dict_cdf[renamed_key+'1'] = cdf[var][:,0]
-            dict_cdf[renamed_key+'2'] = cdf[var][:,1]
-            dict_cdf[renamed_key+'3'] = cdf[var][:,2]
-        elif var == 'Mag':
-            dict_cdf_metadata[renamed_key+'-x1'] = filtered_metadata
-            dict_cdf_metadata[renamed_key+'-x2'] = filtered_metadata
-            dict_cdf_metadata[renamed_key+'-x3'] = filtered_metadata
-
-            dict_cdf[renamed_key+'-x1'] = cdf[var][:,0]
-            dict_cdf[renamed_key+'-x2'] = cdf[var][:,1]
-            dict_cdf[renamed_key+'-x3'] = cdf[var][:,2]
+    with timed('open', cdf_path) as stage:
+        cdf = cdflib.CDF(cdf_path)
+        rec_range = find_record_range(cdf, time_range)
+        stage.add(nbytes=os.path.getsize(cdf_path))
+    dict_cdf = {}
+    dict_cdf_metadata = {}
 
-        else:
-            dict_cdf_metadata[renamed_key] = filtered_metadata
-            dict_cdf[renamed_key] = cdf[var]
+    #Esto se puede hacer altiro como dataframe
+    with timed('read', cdf_path) as stage:
+        for var, names in plan.columns:
+            filtered_metadata = metadata_cache.get(cdf_path, ('EMFISIS', var),
+                                                        lambda: filter_metadata_EMFISIS(cdf.varattsget(var))).copy()
+
+            values = read_records(cdf, var, rec_range)
+            stage.add(nbytes=values.nbytes)
+            if len(names) == 1:
+                dict_cdf_metadata[names[0]] = filtered_metadata
+                dict_cdf[names[0]] = values
+            else:
+                for i, name in enumerate(names):
+                    dict_cdf_metadata[name] = filtered_metadata
+                    dict_cdf[name] = values[:,i]
 
-    df_cdf = pd.DataFrame(dict_cdf)
+        df_cdf = pd.DataFrame(dict_cdf)
+        stage.add(len(df_cdf))
 
-    if 'Epoch' in relevant_var:
+    if 'Epoch' in plan.variables:
 #        print('epoch')
-        df_cdf['epoch'] = pd.to_datetime(cdflib.cdfepoch.encode(df_cdf['epoch'].values))
+        with timed('epoch', cdf_path) as stage:
+            df_cdf['epoch'] = decode_epoch(df_cdf['epoch'].values)
+            stage.add(len(df_cdf))
 
 
     return [df_cdf, dict_cdf_metadata]
 
 
-def clean_CDFfile_EMFISIS(df,interp=False):
+def science_columns_EMFISIS(columns):
+    # The magnetometer columns masked by the quality flags (and interpolated):
+    # the components of Mag, ending with "x1", "x2", or "x3", and |B|
+    suffixes = ("x1", "x2", "x3", "|B|")
+    return [c for c in columns if str(c).endswith(suffixes)]
+
+
+def clean_CDFfile_EMFISIS(df,interp=False,max_gap=None):
     #cleans the data from error value replacing with nan if:
     #    -it's a fill value
     #    -it's a value taken while calibrating
     #    -it's an invalid value
     # All of this criteria are taken according to the meta data
+    # With interp, the magnetometer columns (not the flags) are interpolated
+    # in time, without filling gaps longer than max_gap
 
 
    cols_to_check = ['did fill?', 'calibrating?', 'is valid?']
 
 # Collect all columns ending with "x1", "x2", or "x3"
-   suffixes = ("x1", "x2", "x3", "|B|")
-   target_cols = [c for c in df.columns if str(c).endswith(suffixes)]
+   target_cols = science_columns_EMFISIS(df.columns)
 
 # Build mask
    mask = df[cols_to_check].eq(1).any(axis=1)
@@ -196,73 +260,455 @@ def clean_CDFfile_EMFISIS(df,interp=False):
    df.loc[mask, target_cols] = np.nan
 
    if interp:
-       df_clean = df.interpolate(axis = 0)
+       df_clean = interpolate_frame(df, columns=target_cols, max_gap=max_gap)
        return df_clean
    return df
 
 
 
-def load_CDFfiles_EMFISIS(start_date, end_date, local_root_dir, relevant_var, rename_mapping, probe, level = '3',Interpol = False):
+# Bits of the quality flags in the 'quality' column of compact loads
+QUALITY_BITS_EMFISIS = {
+    'did fill?': 1,
+    'is valid?': 2,
+    'calibrating?': 4}
+
+
+def compact_CDFfile_EMFISIS(df, dict_metadata):
+
+    '''
+    Store cleaned EMFISIS data in less memory: the three quality flags are
+    packed into a single uint8 'quality' column (bit 1 magFill, bit 2
+    magInvalid, bit 4 calState, see QUALITY_BITS_EMFISIS, and 16, 32 and 64
+    when they are unknown, see `Process_data.utils.compact.pack_flags`) and
+    the other columns are converted to the dtypes of
+    `Process_data.utils.compact.compact_dtype` (float32 science data).
+
+    Args:
+        - df (pandas.DataFrame): The cleaned data.
+        - dict_metadata (dict): Metadata for the columns of `df`. The metadata
+          of the 'quality' column is added to it.
+
+    Returns:
+        - df_compact (pandas.DataFrame): The compact data.
+    '''
+
+    if any(flag in df.columns for flag in QUALITY_BITS_EMFISIS):
+        df = pack_flags(df, QUALITY_BITS_EMFISIS)
+        dict_metadata['quality'] = filter_metadata_EMFISIS({
+            'CATDESC': 'Quality flags bitmask: 1 = magFill, 2 = magInvalid, 4 = calState, '
+                       '16, 32, 64 = the same flags unknown',
+            'FIELDNAM': 'quality',
+            'VAR_TYPE': 'support_data'})
+
+    return compact_frame(df, dict_metadata)
+
+
+# Statistics computed for every bin by `resample_CDFfile_EMFISIS`
+RESAMPLE_STATS_EMFISIS = ('mean', 'median', 'std', 'count')
+
+
+def resample_CDFfile_EMFISIS(df, freq, stats=RESAMPLE_STATS_EMFISIS, time_column='epoch'):
+
+    '''
+    Aggregate cleaned EMFISIS data into fixed time bins (e.g. 1 or 5 minutes).
+    The bins are aligned to midnight, so the bins of consecutive days do not
+    overlap and resampling day by day gives the same result as resampling the
+    whole range. The statistics are computed over the valid (not NaN) samples
+    of every bin; bins without any sample are left out. The quality flags are
+    dropped, since the flagged values were already replaced by NaN.
+
+    Args:
+        - df (pandas.DataFrame): The cleaned data, as returned by
+          `clean_CDFfile_EMFISIS`, with an epoch column.
+        - freq (str or pandas.Timedelta): The length of the bins (e.g. '1min').
+          It must divide a day.
+        - stats (tuple, optional): The statistics computed for every bin:
+          'mean', 'median', 'std' (with one degree of freedom) and 'count' (of
+          valid samples), or any other reduction accepted by pandas
+          GroupBy.agg. Default is RESAMPLE_STATS_EMFISIS (all four).
+        - time_column (str, optional): The epoch column. Default is 'epoch'.
+
+    Returns:
+        - resampled_df (pandas.DataFrame): One row per bin, with the start of
+          the bin in `time_column` and a column <column>_<stat> for every
+          float column and statistic (e.g. 'Mag-x1_mean', '|B|_count').
+
+    Raises:
+        - ValueError: If `freq` does not divide a day or `time_column` is not a
+          column of `df`.
+    '''
+
+    step = pd.Timedelta(freq)
+    if step <= pd.Timedelta(0) or pd.Timedelta(days=1) % step != pd.Timedelta(0):
+        raise ValueError(f'The resampling frequency must divide a day, got {freq!r}')
+    if time_column not in df.columns:
+        raise ValueError(f"Resampling needs the '{time_column}' column (add 'Epoch' to relevant_var)")
+
+    flags = [name for name in REQUIRED_VAR_EMFISIS.values() if name != '|B|']
+    columns = [c for c in df.columns if c != time_column and c not in flags and df[c].dtype.kind == 'f']
+
+    # Number of the bin of every sample, counted from 1970-01-01
+    bins = df[time_column].to_numpy('datetime64[ns]').view('i8') // step.value
+
+    resampled_df = df[columns].groupby(bins, sort=True).agg(list(stats))
+    resampled_df.columns = [f'{column}_{stat}' for column, stat in resampled_df.columns]
+    resampled_df.insert(0, time_column, (resampled_df.index.to_numpy('i8')*step.value).view('datetime64[ns]'))
+
+    return resampled_df.reset_index(drop=True)
+
+
+def process_CDFfile_EMFISIS(cdf_path, relevant_var, rename_mapping, interp=False, cache=None, plan=None, time_range=None,
+                            max_gap=None):
+
+    '''
+    Read and clean a single RBSP EMFISIS CDF file. This is the unit of work done
+    for every day by `load_CDFfiles_EMFISIS`, kept at module level so it can be
+    sent to worker processes.
+
+    Args:
+        - cdf_path (str): The path to the CDF file to be loaded.
+        - relevant_var (list): A list of variable names (str) to extract from the
+          CDF file (e.g., 'Mag', 'Epoch').
+        - rename_mapping (dict): Mapping from CDF variable names to column names.
+        - interp (bool, optional): If True, interpolates the flagged values in
+          time. Default is False.
+        - cache (Process_data.utils.cache.DayCache, optional): Cache of cleaned
+          files. If given, the result is read from it when available and
+          stored in it otherwise. Default is None.
+        - plan (Process_data.utils.plan.ReadPlan, optional): The plan built by
+          `build_read_plan_EMFISIS`. Default is None (built from `relevant_var`
+          and `rename_mapping`).
+        - time_range (tuple, optional): A (start, end) window, end exclusive, to
+          restrict the records read. Default is None (all the records).
+        - max_gap (optional): Longest gap between valid samples filled by the
+          interpolation. Default is None (no limit).
+
+    Returns:
+        - tuple: A tuple containing:
+            1. emfisis_df_clean (pandas.DataFrame): The cleaned scalar parameters.
+            2. emfisis_metadata (dict): Metadata for the scalar parameters.
+    '''
+
+    if plan is None:
+        plan = build_read_plan_EMFISIS(relevant_var, rename_mapping)
+
+    fetched = _fetch_CDFfile_EMFISIS(cdf_path, relevant_var, rename_mapping, interp, cache, plan, time_range, max_gap)
+
+    return _finish_CDFfile_EMFISIS(fetched, interp, cache, max_gap)
+
+
+def _fetch_CDFfile_EMFISIS(cdf_path, relevant_var, rename_mapping, interp=False, cache=None, plan=None, time_range=None,
+                           max_gap=None):
+
+    '''
+    I/O part of `process_CDFfile_EMFISIS`: look the file up in the cache and
+    read it if it is not there. Returns (cache_key, raw, result), where `raw`
+    is the output of `read_CDFfile_EMFISIS` and `result` the cached result
+    (only one of them is not None).
+    '''
+
+    if plan is None:
+        plan = build_read_plan_EMFISIS(relevant_var, rename_mapping)
+
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(cdf_path, plan.variables, dict(plan.columns), instrument='EMFISIS', interp=interp,
+                                   time_range=time_range, max_gap=max_gap if interp else None)
+        with timed('cache', cdf_path) as stage:
+            cached = cache.load(cache_key)
+            stage.add(0 if cached is None else len(cached[0]))
+        if cached is not None:
+            emfisis_df_clean, emfisis_metadata, _ = cached
+            return cache_key, None, (emfisis_df_clean, emfisis_metadata)
+
+    return cache_key, read_CDFfile_EMFISIS(cdf_path, relevant_var, rename_mapping, plan, time_range), None
+
+
+def _finish_CDFfile_EMFISIS(fetched, interp=False, cache=None, max_gap=None):
+
+    '''
+    CPU part of `process_CDFfile_EMFISIS`: clean what `_fetch_CDFfile_EMFISIS`
+    read and store it in the cache.
+    '''
+
+    cache_key, raw, result = fetched
+    if result is not None:
+        return result
+
+    emfisis_df, emfisis_metadata = raw
+    with timed('clean') as stage:
+        emfisis_df_clean = clean_CDFfile_EMFISIS(emfisis_df, interp, max_gap)
+        stage.add(len(emfisis_df_clean))
+
+    if cache is not None:
+        with timed('cache'):
+            cache.store(cache_key, emfisis_df_clean, emfisis_metadata)
+
+    return emfisis_df_clean, emfisis_metadata
+
+
+def _process_day_EMFISIS(item, **kwargs):
+    cdf_path, time_range = item
+    return process_CDFfile_EMFISIS(cdf_path, time_range=time_range, **kwargs)
+
+
+def _fetch_day_EMFISIS(item, **kwargs):
+    cdf_path, time_range = item
+    return _fetch_CDFfile_EMFISIS(cdf_path, time_range=time_range, **kwargs)
+
+
+def iter_CDFfiles_EMFISIS(start_date, end_date, local_root_dir, relevant_var, rename_mapping, probe, level = '3',Interpol = False,
+                          workers=None, executor=None, cache=None, prefetch=None, index=None, resample=None,
+                          resample_stats=RESAMPLE_STATS_EMFISIS, max_gap=None):
+
+    '''
+    Iterate over the RBSP EMFISIS CDF files of a single probe for a specified
+    date range, yielding the cleaned data of one day at a time. Only the days
+    being processed are held in memory (with `workers`, up to twice as many
+    days as workers are processed ahead), and only the records between
+    `start_date` and `end_date` are decoded.
+
+    Args:
+        - start_date (datetime.date or datetime.datetime): The start of the range
+          to process (inclusive).
+        - end_date (datetime.date or datetime.datetime): The end of the range to
+          process (inclusive). A date without time includes the whole day.
+        - local_root_dir (str): Path to the local directory containing the CDF files.
+        - relevant_var (list): List of variable names to extract from the CDF files.
+        - rename_mapping (dict): Mapping from CDF variable names to column names.
+        - probe (str): The satellite identifier ('a' or 'b').
+        - level (str, optional): Data processing level ('2' or '3'). Default is '3'.
+        - Interpol, workers, executor, cache, prefetch, resample, resample_stats,
+          max_gap: See `load_CDFfiles_EMFISIS`. Here Interpol fills the gaps
+          inside each day only.
+        - index (Process_data.utils.file_index.FileIndex, optional): The index
+          of the local files. Default is None (the index persisted in
+          `local_root_dir`).
+
+    Returns:
+        - generator: For each day, a tuple containing:
+            1. date (pandas.Timestamp): The date of the file.
+            2. emfisis_df_clean (pandas.DataFrame): The cleaned scalar parameters
+               (resampled if `resample` is given).
+            3. emfisis_metadata (dict): Metadata for the scalar parameters.
+          Nothing is yielded if there is no local file in the whole range.
+
+    Raises:
+        - IndexError: If the files of only some of the days are missing.
+    '''
+
+    time_range = resolve_time_range(start_date, end_date)
+    date_array = pd.date_range(start=time_range[0].normalize(), end=time_range[1] - pd.Timedelta(1, 'ns'), freq='D')
+    if index is None:
+        index = open_file_index(local_root_dir)
+    with timed('lookup') as stage:
+        filepaths = []
+        missing = []
+        for date in date_array:
+            try:
+                filepaths.append(get_local_filepath_EMFISIS(date, local_root_dir, probe,'3', index=index))
+            except IndexError as error:
+                missing.append(error)
+        index.save()
+        stage.add(len(filepaths))
+    if not filepaths:
+        # Nothing to load in the range (e.g. a gap of the mission)
+        logger.info('No file in local')
+        return
+    if missing:
+        raise missing[0]
+    file_ranges = [clip_time_range(time_range, date, date + pd.Timedelta(days=1)) for date in date_array]
+
+    # Compiled once for the whole range instead of once per file
+    plan = build_read_plan_EMFISIS(relevant_var, rename_mapping)
+
+    items = zip(filepaths, file_ranges)
+
+    if prefetch and executor is None and (workers is None or workers <= 1):
+        # Read the next files in background threads while this one is cleaned
+        fetch_day = functools.partial(_fetch_day_EMFISIS, relevant_var=relevant_var,
+                                      rename_mapping=rename_mapping, interp=Interpol, cache=cache, plan=plan,
+                                      max_gap=max_gap)
+        results = (_finish_CDFfile_EMFISIS(fetched, Interpol, cache, max_gap)
+                   for fetched in prefetch_ordered(fetch_day, items, prefetch))
+    else:
+        process_day = functools.partial(_process_day_EMFISIS, relevant_var=relevant_var,
+                                        rename_mapping=rename_mapping, interp=Interpol, cache=cache, plan=plan,
+                                        max_gap=max_gap)
+        results = map_ordered(process_day, items, workers, executor)
+    for date, (emfisis_df_clean, emfisis_metadata) in zip(date_array, results):
+        if resample is not None:
+            with timed('resample') as stage:
+                stage.add(len(emfisis_df_clean))
+                emfisis_df_clean = resample_CDFfile_EMFISIS(emfisis_df_clean, resample, resample_stats)
+        yield date, emfisis_df_clean, emfisis_metadata
+
+
+def _load_probe_EMFISIS(p, start_date, end_date, local_root_dir, relevant_var, rename_mapping, level, Interpol, workers, executor,
+                        cache, prefetch, index, resample=None, resample_stats=RESAMPLE_STATS_EMFISIS, max_gap=None,
+                        compact=False):
+
+    '''
+    Load the data of a single probe for `load_CDFfiles_EMFISIS`. The data is
+    returned in its ColumnAccumulator, so it can be turned into a DataFrame
+    or stacked with the other probe.
+    '''
+
+    emfisis_acc = ColumnAccumulator()
+    emfisis_tracker = MetadataTracker(f'rbsp{p} EMFISIS')
+    # Returned as it is if there is no file in the range
+    emfisis_metadata = {}
+
+    # Without resampling, the interpolation is done once all the days are
+    # accumulated, so it also fills the gaps across midnight
+    interp_days = Interpol and resample is not None
+
+    for date, emfisis_df_clean, emfisis_metadata in iter_CDFfiles_EMFISIS(start_date, end_date, local_root_dir, relevant_var, rename_mapping, p, level,
+                                                                          interp_days, workers, executor, cache, prefetch, index,
+                                                                          resample, resample_stats, max_gap):
+        emfisis_tracker.update(date, emfisis_metadata)
+        if compact:
+            with timed('compact'):
+                emfisis_df_clean = compact_CDFfile_EMFISIS(emfisis_df_clean, emfisis_metadata)
+        with timed('accumulate') as stage:
+            emfisis_acc.append(emfisis_df_clean)
+            stage.add(len(emfisis_df_clean), int(emfisis_df_clean.memory_usage(index=False).sum()))
+
+    if Interpol and not interp_days:
+        with timed('interpolate') as stage:
+            interpolate_accumulator(emfisis_acc, columns=science_columns_EMFISIS(emfisis_acc.columns), max_gap=max_gap)
+            stage.add(emfisis_acc.size)
+
+    return emfisis_acc, emfisis_metadata
+
+
+def load_CDFfiles_EMFISIS(start_date, end_date, local_root_dir, relevant_var, rename_mapping, probe, level = '3',Interpol = False, workers=None, executor=None,
+                          cache=None, prefetch=None, combine=False, resample=None, resample_stats=RESAMPLE_STATS_EMFISIS,
+                          max_gap=None, compact=False, profile=None):
 
     '''
     Load and process RBSP EMFISIS CDF files for a specified date range and selected
     RBSP probes (A, B, or both). It extracts scalar parameters  and associated metadata. The cleaned and processed data is returned
-    for further analysis.
+    for further analysis. The files are processed one day at a time by
+    `iter_CDFfiles_EMFISIS`.
 
     meta data means thing such as measure units, max min value, name of variable etc.
     Args:
-        - start_date (datetime.date): The start date of the range to process (inclusive).
-        - end_date (datetime.date): The end date of the range to process (inclusive).
+        - start_date (datetime.date or datetime.datetime): The start of the range
+          to process (inclusive).
+        - end_date (datetime.date or datetime.datetime): The end of the range to
+          process (inclusive). A date without time includes the whole day. Only
+          the records inside the range are decoded and returned.
         - local_root_dir (str): Path to the local directory containing the CDF files.
         - relevant_var (list): List of variable names to extract from the CDF files.
         - probe (str): The satellite identifier ('a', 'b', or 'both'). If 'both',
           data for both probes will be loaded..
         - level (str, optional): Data processing level ('2' or '3'). Default is '3'.
+        - Interpol (bool, optional): If True, the flagged magnetometer values
+          (the components of Mag and |B|, not the flags) are linearly
+          interpolated in time, once all the days of a probe are loaded, so
+          gaps across midnight are filled too. With `resample`, each day is
+          interpolated before it is resampled instead. It requires 'Epoch' in
+          `relevant_var`. Default is False.
+        - max_gap (optional): Longest gap between valid samples filled by the
+          interpolation (e.g. '1min'); longer gaps are left as NaN. Default is
+          None (no limit).
+        - workers (int, optional): Number of worker processes used to read and
+          clean the daily files in parallel. None or 1 processes the files
+          serially. The results are reassembled in date order, so the output is
+          the same as in the serial case. Default is None.
+        - executor (concurrent.futures.Executor, optional): An existing executor
+          used instead of creating a process pool. Default is None.
+        - cache (Process_data.utils.cache.DayCache, optional): Cache of cleaned
+          daily files. Files already in the cache are not decoded again.
+          Default is None.
+        - prefetch (int, optional): Number of daily files read ahead by
+          background threads while the current day is cleaned and accumulated
+          in the calling thread, so reading and cleaning overlap. At most
+          `prefetch` days are held in memory besides the current one. Ignored
+          when `workers` or `executor` are given. Default is None (no
+          prefetching).
+        - combine (bool, optional): If True, return a single `emfisis_info` for
+          all the probes, indexed by a (probe, epoch) MultiIndex, instead of
+          one list per probe (see Returns). It requires 'Epoch' in
+          `relevant_var`. Default is False.
+        - resample (str or pandas.Timedelta, optional): If given, the cleaned
+          data of every day is aggregated into bins of this length (e.g.
+          '1min' or '5min', aligned to midnight) before it is accumulated, so
+          the full resolution data is never held for more than one day. The
+          columns of `emfisis_info` are then <column>_<stat> (e.g.
+          'Mag-x1_mean'), see `resample_CDFfile_EMFISIS`. It requires 'Epoch'
+          in `relevant_var`. Default is None (4 second data).
+        - resample_stats (tuple, optional): The statistics of every bin.
+          Default is ('mean', 'median', 'std', 'count'), the count being the
+          number of valid samples.
+        - compact (bool, optional): If True, every day is stored in less
+          memory before it is accumulated: the quality flags are packed into
+          a single uint8 'quality' bitmask column (see
+          `compact_CDFfile_EMFISIS`) and the data is stored as float32.
+          Default is False.
+        - profile (optional): Profiling of the stages of the load (file
+          lookup, open, reads, epoch decoding, cleaning, accumulation, ...):
+          True logs a summary table at the end, a callable is called with the
+          timing of every stage and a `Process_data.utils.profiling.LoadProfile`
+          is filled with them. The stages run by worker processes are not
+          timed. The timings are always logged at DEBUG level to the
+          'Process_data.profile' logger. Default is None.
+
+    With probe='both' the two probes are loaded at the same time, in two
+    threads sharing the local file index and the metadata cache, unless the
+    days are processed by worker processes (`workers` or `executor`): the
+    probes are then loaded one after the other, as in `load_CDFfiles_ECT`.
+
+    A probe without any local file in the range (e.g. a gap of the mission)
+    gets an empty DataFrame and metadata. If only some of the days have no
+    file, IndexError is raised, as by `get_local_filepath_EMFISIS`.
 
     Returns:
         - list: A list containing the processed data for the selected probes:
             - For each probe, the list includes:
                 1. emfisis_info (pandas.DataFrame): A DataFrame with cleaned scalar parameters.
                 2. emfisis_metadata (dict): Metadata for the scalar parameters in emfisis_info.
+        - If `combine` is True, a single list instead:
+            1. emfisis_info (pandas.DataFrame): The data of all the probes,
+               indexed by (probe, epoch), probe by probe in time order.
+            2. emfisis_metadata (dict): The metadata of each probe.
     '''
 
 
-    date_array = pd.date_range(start=start_date, end=end_date, freq='D')
-    output = []
-
-    if probe=='both':
-        probes_list = ['a', 'b']
-    else:
-        probes_list = [probe]
-
-    print(probes_list)
-
-    for p in probes_list:
-        f = []
-        flag = True
-#        print(p)
-
-        for date in date_array:
-            filepath = get_local_filepath_EMFISIS(date, local_root_dir, p,'3')
-
-            emfisis= read_CDFfile_EMFISIS(filepath, relevant_var, rename_mapping)
-
-            emfisis_df, emfisis_metadata = emfisis
-
-            emfisis_df_clean = clean_CDFfile_EMFISIS(emfisis_df,Interpol)
-
-            if flag:
-                emfisis_info = emfisis_df_clean.copy()
-                flag=False
+    with track_load('EMFISIS', profile):
+        if probe=='both':
+            probes_list = ['a', 'b']
+        else:
+            probes_list = [probe]
+
+        logger.info('%s', probes_list)
+
+        # Shared by the probes, which are loaded at the same time
+        index = open_file_index(local_root_dir)
+        load_probe = functools.partial(_load_probe_EMFISIS, start_date=start_date, end_date=end_date, local_root_dir=local_root_dir,
+                                       relevant_var=relevant_var, rename_mapping=rename_mapping, level=level, Interpol=Interpol,
+                                       workers=workers, executor=executor, cache=cache, prefetch=prefetch, index=index,
+                                       resample=resample, resample_stats=resample_stats, max_gap=max_gap,
+                                       compact=compact)
+
+        processes = executor is not None or (workers is not None and workers > 1)
+        if len(probes_list) > 1 and not processes:
+            with ThreadPoolExecutor(max_workers=len(probes_list)) as pool:
+                results = list(pool.map(load_probe, probes_list))
+        else:
+            results = [load_probe(p) for p in probes_list]
 
+        with timed('finalize') as stage:
+            if combine:
+                emfisis_info = stack_accumulators([emfisis_acc for emfisis_acc, _ in results], probes_list)
+                output = [emfisis_info, {p: emfisis_metadata for p, (_, emfisis_metadata) in zip(probes_list, results)}]
             else:
-                emfisis_info = pd.concat([emfisis_info, emfisis_df_clean])
-
-        emfisis_info = emfisis_info.reset_index(drop=True)
-        output.append([emfisis_info, emfisis_metadata])
+                output = [[emfisis_acc.to_frame(), emfisis_metadata] for emfisis_acc, emfisis_metadata in results]
+            stage.add(sum(emfisis_acc.size for emfisis_acc, _ in results))
 
-    print('----')
-    print("DONE")
-    print('----')
+        logger.info('----')
+        logger.info("DONE")
+        logger.info('----')
 
     return output
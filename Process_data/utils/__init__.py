@@ -0,0 +1,15 @@
+from Process_data.utils.parallel import map_ordered, prefetch_ordered
+from Process_data.utils.accumulate import ArrayAccumulator, ColumnAccumulator, count_records, stack_accumulators
+from Process_data.utils.cache import DayCache
+from Process_data.utils.epoch import decode_epoch
+from Process_data.utils.plan import ReadPlan, build_read_plan, split_components
+from Process_data.utils.window import resolve_time_range, clip_time_range, find_record_range, read_records, count_records_in_range
+from Process_data.utils.cleaning import clean_frame, clean_array
+from Process_data.utils.file_index import FileIndex, open_file_index
+from Process_data.utils.metadata import MetadataCache, MetadataTracker, MetadataDriftWarning, METADATA_CACHE
+from Process_data.utils.align import align_epochs, align_frames
+from Process_data.utils.interpolate import interpolate_gaps, interpolate_frame, interpolate_accumulator, science_columns
+from Process_data.utils.compact import compact_dtype, compact_frame, compact_array, pack_flags
+from Process_data.utils.profiling import LoadProfile, use_default_handler, logger
+from Process_data.utils.store import PartitionedStore, StoreDataset, open_store
+from Process_data.utils.shared import SharedArrays, frame_schema, write_shared
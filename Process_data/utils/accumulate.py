@@ -0,0 +1,280 @@
+import cdflib
+import numpy as np
+import pandas as pd
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+###### Functions and classes to accumulate per-file results without pd.concat ######
+
+def count_records(cdf_path, var='Epoch'):
+
+    '''
+    Return the number of records of a variable in a CDF file. Only the
+    variable descriptor is read, not the data, so this is cheap enough to size
+    the output buffers before decoding the files.
+
+    Args:
+        - cdf_path (str): The path to the CDF file.
+        - var (str, optional): The record varying variable to inspect.
+          Default is 'Epoch'.
+
+    Returns:
+        - n (int): The number of records.
+    '''
+
+    return cdflib.CDF(cdf_path).varinq(var).Last_Rec + 1
+
+
+class ArrayAccumulator:
+
+    '''
+    Accumulates arrays along their first axis into a single preallocated NumPy
+    buffer. The buffer grows geometrically when it runs out of space, so
+    appending N days costs O(N) copies in total instead of the O(N^2) of
+    concatenating the result after every file.
+
+    If `filename` is given, the buffer is instead a memory-mapped .npy file of
+    exactly `capacity` rows, created when the first array is appended (its
+    dtype and trailing dimensions are taken from that array). File backed
+    buffers cannot grow, so `capacity` must be the total number of records.
+
+    Args:
+        - capacity (int, optional): Number of rows to preallocate once the
+          first array is appended. Default is 0 (size of the first array).
+        - filename (str, optional): Path of the .npy file backing the buffer.
+          Default is None (buffer in memory).
+    '''
+
+    def __init__(self, capacity=0, filename=None):
+        self.capacity = capacity
+        self.filename = filename
+        self.size = 0
+        self.buffer = None
+
+    def reserve(self, capacity):
+
+        '''
+        Make sure the buffer can hold at least `capacity` rows without growing.
+        '''
+
+        if self.buffer is None:
+            self.capacity = max(self.capacity, capacity)
+        elif capacity > len(self.buffer):
+            self._reallocate(capacity, self.buffer.dtype)
+
+    def _reallocate(self, capacity, dtype):
+        if self.filename is not None:
+            raise ValueError(f'The memory-mapped buffer {self.filename} has room for '
+                             f'{len(self.buffer)} records of {self.buffer.dtype}, cannot '
+                             f'hold {capacity} records of {dtype}')
+        new_buffer = np.empty((capacity,) + self.buffer.shape[1:], dtype=dtype)
+        new_buffer[:self.size] = self.buffer[:self.size]
+        self.buffer = new_buffer
+
+    def append(self, values):
+
+        '''
+        Copy `values` at the end of the buffer, growing or promoting its dtype
+        if needed.
+
+        Args:
+            - values (numpy.ndarray): Array whose first axis are records. The
+              remaining dimensions must match the ones already accumulated.
+        '''
+
+        values = np.asarray(values)
+        n = len(values)
+
+        if self.buffer is None and self.filename is not None:
+            self.buffer = np.lib.format.open_memmap(self.filename, mode='w+', dtype=values.dtype,
+                                                    shape=(self.capacity,) + values.shape[1:])
+        if self.buffer is None:
+            capacity = max(self.capacity, n)
+            self.buffer = np.empty((capacity,) + values.shape[1:], dtype=values.dtype)
+        else:
+            if values.shape[1:] != self.buffer.shape[1:]:
+                raise ValueError(f'Cannot append array of shape {values.shape} to '
+                                 f'accumulated shape {self.buffer.shape[1:]}')
+            dtype = np.result_type(self.buffer.dtype, values.dtype)
+            if self.size + n > len(self.buffer):
+                self._reallocate(max(self.size + n, 2*len(self.buffer)), dtype)
+            elif dtype != self.buffer.dtype:
+                self._reallocate(len(self.buffer), dtype)
+
+        self.buffer[self.size:self.size + n] = values
+        self.size += n
+
+    def fill_missing(self, n):
+
+        '''
+        Append `n` missing records (NaN or NaT). Integer and boolean buffers
+        are promoted to float64, as pd.concat does with missing columns.
+        '''
+
+        if self.buffer is None or self.buffer.dtype.kind in 'iub':
+            missing = np.full((n,) + (() if self.buffer is None else self.buffer.shape[1:]), np.nan)
+        elif self.buffer.dtype.kind in 'mM':
+            missing = np.full((n,) + self.buffer.shape[1:], np.datetime64('NaT')).astype(self.buffer.dtype)
+        elif self.buffer.dtype.kind == 'O':
+            missing = np.full((n,) + self.buffer.shape[1:], np.nan, dtype=object)
+        else:
+            missing = np.full((n,) + self.buffer.shape[1:], np.nan, dtype=self.buffer.dtype)
+        self.append(missing)
+
+    def result(self):
+
+        '''
+        Return the accumulated array, trimmed to the number of appended records.
+        For file backed buffers the data is flushed to disk and a np.memmap is
+        returned. The accumulator should not be appended to afterwards.
+        '''
+
+        if self.buffer is None:
+            return np.empty((0,))
+        if isinstance(self.buffer, np.memmap):
+            self.buffer.flush()
+            return self.buffer[:self.size]
+        if self.size < len(self.buffer):
+            self.buffer.resize((self.size,) + self.buffer.shape[1:], refcheck=False)
+        return self.buffer
+
+
+class ColumnAccumulator:
+
+    '''
+    Accumulates DataFrames with the same columns into one preallocated NumPy
+    buffer per column, and builds the final DataFrame only once in `to_frame`.
+    Columns are kept in order of first appearance; a column missing from some
+    of the frames is filled with NaN for their rows, like pd.concat does.
+
+    Args:
+        - capacity (int, optional): Number of rows to preallocate once the
+          first frame is appended. Default is 0 (size of the first frame).
+    '''
+
+    def __init__(self, capacity=0):
+        self.capacity = capacity
+        self.size = 0
+        self.columns = {}
+        self.dtypes = {}
+
+    def reserve(self, capacity):
+
+        '''
+        Make sure every column can hold at least `capacity` rows without growing.
+        '''
+
+        self.capacity = max(self.capacity, capacity)
+        for acc in self.columns.values():
+            acc.reserve(capacity)
+
+    def append(self, df):
+
+        '''
+        Copy the columns of `df` at the end of the accumulated buffers.
+
+        Args:
+            - df (pandas.DataFrame): The frame to append.
+        '''
+
+        n = len(df)
+        for col in df.columns:
+            if col not in self.columns:
+                acc = ArrayAccumulator(self.capacity)
+                if self.size:
+                    acc.fill_missing(self.size)
+                self.columns[col] = acc
+                self.dtypes[col] = df[col].dtype
+            self.columns[col].append(df[col].to_numpy())
+
+        for col, acc in self.columns.items():
+            if acc.size < self.size + n:
+                acc.fill_missing(self.size + n - acc.size)
+
+        self.size += n
+
+    def to_frame(self):
+
+        '''
+        Build the DataFrame from the accumulated columns, with a default
+        RangeIndex.
+
+        Returns:
+            - df (pandas.DataFrame): The accumulated data.
+        '''
+
+        data = {}
+        for col, acc in self.columns.items():
+            values = acc.result()
+            dtype = self.dtypes[col]
+            if not isinstance(dtype, np.dtype):
+                values = pd.array(values, dtype=dtype)
+            data[col] = values
+
+        return pd.DataFrame(data, copy=False)
+
+
+def stack_accumulators(accumulators, keys, key_name='probe', time_column='epoch'):
+
+    '''
+    Build a single DataFrame from several ColumnAccumulators (e.g. one per
+    probe), indexed by a (key, time) MultiIndex. Every column is copied once,
+    from the accumulated buffers into the final array, without building an
+    intermediate DataFrame per accumulator. The rows of each key keep their
+    order (time order for the loaders). Columns missing from some of the
+    accumulators are filled with NaN for their rows.
+
+    Args:
+        - accumulators (list): The ColumnAccumulator of every key.
+        - keys (list): The key of every accumulator (e.g. ['a', 'b']).
+        - key_name (str, optional): Name of the first index level. Default is
+          'probe'.
+        - time_column (str, optional): Column used as second index level.
+          Default is 'epoch'.
+
+    Returns:
+        - df (pandas.DataFrame): The stacked data.
+    '''
+
+    sizes = [acc.size for acc in accumulators]
+    bounds = np.concatenate([[0], np.cumsum(sizes)])
+
+    # Columns in order of first appearance
+    dtypes = {}
+    for acc in accumulators:
+        for col in acc.columns:
+            dtypes.setdefault(col, acc.dtypes[col])
+
+    data = {}
+    for col in dtypes:
+        parts = [acc.columns.get(col) for acc in accumulators]
+        buffers = [part.buffer[:part.size] for part in parts if part is not None and part.buffer is not None]
+        dtype = np.result_type(*buffers) if buffers else np.float64
+        if any(part is None for part in parts) and dtype.kind in 'iub':
+            dtype = np.result_type(dtype, np.float64)
+
+        shape = (bounds[-1],) + (buffers[0].shape[1:] if buffers else ())
+        values = np.empty(shape, dtype=dtype)
+        for i, part in enumerate(parts):
+            if part is None or part.buffer is None:
+                values[bounds[i]:bounds[i + 1]] = np.datetime64('NaT') if dtype.kind == 'M' else np.nan
+            else:
+                values[bounds[i]:bounds[i + 1]] = part.buffer[:part.size]
+
+        if not isinstance(dtypes[col], np.dtype):
+            values = pd.array(values, dtype=dtypes[col])
+        data[col] = values
+
+    # Nothing was accumulated, e.g. no file in the range
+    times = data.pop(time_column, np.empty(0, dtype='datetime64[ns]'))
+    codes = np.repeat(np.arange(len(keys)), sizes)
+    index = pd.MultiIndex.from_arrays([pd.Categorical.from_codes(codes, categories=keys), times],
+                                      names=[key_name, time_column])
+
+    return pd.DataFrame(data, index=index, copy=False)
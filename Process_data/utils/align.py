@@ -0,0 +1,249 @@
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+ALIGN_METHODS = ('nearest', 'previous', 'mean')
+
+_NAT = np.iinfo(np.int64).min
+
+
+def _as_ns(epochs):
+    # Epochs as int64 nanoseconds (NaT is the smallest int64)
+    return np.asarray(epochs).astype('datetime64[ns]').view('i8')
+
+
+def _to_ns(delta):
+    return None if delta is None else pd.Timedelta(delta).value
+
+
+############ Kernels on sorted epochs ##########################################
+
+def _nearest(source, values, queries, tolerance):
+    i = np.searchsorted(source, queries)
+    left = np.clip(i - 1, 0, len(source) - 1)
+    right = np.clip(i, 0, len(source) - 1)
+    d_left = np.abs(queries - source[left])
+    d_right = np.abs(source[right] - queries)
+
+    # Ties go to the previous sample
+    index = np.where(d_right < d_left, right, left)
+    found = np.ones(len(queries), dtype=bool) if tolerance is None else np.minimum(d_left, d_right) <= tolerance
+
+    return values[index], found
+
+
+def _previous(source, values, queries, tolerance):
+    index = np.searchsorted(source, queries, side='right') - 1
+    found = index >= 0
+    if tolerance is not None:
+        found &= queries - source[np.maximum(index, 0)] <= tolerance
+
+    return values[np.maximum(index, 0)], found
+
+
+def _window_mean(source, values, queries, window):
+    # Mean of the valid samples in (query - window, query], from cumulative sums
+    valid = np.isfinite(values)
+    sums = np.zeros((len(values) + 1, values.shape[1]))
+    counts = np.zeros((len(values) + 1, values.shape[1]))
+    np.cumsum(np.where(valid, values, 0), axis=0, out=sums[1:])
+    np.cumsum(valid, axis=0, out=counts[1:])
+
+    low = np.searchsorted(source, queries - window, side='right')
+    high = np.searchsorted(source, queries, side='right')
+    n = counts[high] - counts[low]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (sums[high] - sums[low])/n
+    mean[n == 0] = np.nan
+
+    return mean, np.ones(len(queries), dtype=bool)
+
+
+############ Alignment of a source series onto target epochs ###################
+
+def align_epochs(epochs, source_epochs, source_values, method='nearest', lags=(0,), tolerance=None, window=None,
+                 chunk='1D'):
+
+    '''
+    Align the values of a time series (e.g. OMNI) onto other epochs (e.g. the
+    samples of an RBSP instrument), for several time lags at once. Every
+    target epoch t and lag L takes the source value at t - L (so a positive
+    lag looks back in time), chosen with `method`:
+        - 'nearest': the closest source sample (the earlier one on ties).
+        - 'previous': the last source sample at or before t - L.
+        - 'mean': the mean of the valid source samples in (t - L - window, t - L].
+
+    The lookups are binary searches (numpy.searchsorted) on the sorted
+    epochs. The target epochs are processed in chunks of `chunk` (one day by
+    default), each against the slice of the source it can reach, so the
+    memory used does not grow with the length of the series.
+
+    Args:
+        - epochs (array-like): The target epochs (datetime64). They do not
+          need to be sorted.
+        - source_epochs (array-like): The epochs of the source (datetime64).
+        - source_values (array-like): The source values, of shape (m,) or
+          (m, k).
+        - method (str, optional): 'nearest', 'previous' or 'mean'. Default is
+          'nearest'.
+        - lags (list, optional): The time lags (anything accepted by
+          pandas.Timedelta, e.g. '30min'). Default is (0,).
+        - tolerance (optional): Maximum distance between t - L and the source
+          sample for 'nearest' and 'previous'; farther samples give NaN.
+          Default is None (no limit).
+        - window (optional): Length of the averaging window for 'mean'.
+        - chunk (optional): Length of the chunks of target epochs. Default is
+          one day.
+
+    Returns:
+        - aligned (numpy.ndarray): Float array of shape (n, len(lags), k) (or
+          (n, len(lags)) for 1-D `source_values`), NaN where there is no
+          source sample (or the target epoch is NaT).
+
+    Raises:
+        - ValueError: If `method` is unknown, or `window` is missing for 'mean'.
+    '''
+
+    if method not in ALIGN_METHODS:
+        raise ValueError(f"Unknown alignment method '{method}', use one of {ALIGN_METHODS}")
+    if method == 'mean' and window is None:
+        raise ValueError("The 'mean' alignment needs a window")
+
+    epochs = _as_ns(epochs)
+    source = _as_ns(source_epochs)
+    values = np.asarray(source_values, dtype=np.float64)
+    squeeze = values.ndim == 1
+    if squeeze:
+        values = values[:, np.newaxis]
+
+    lags_ns = np.array([_to_ns(lag) for lag in lags], dtype=np.int64)
+    tolerance = _to_ns(tolerance)
+    window = _to_ns(window)
+    chunk = _to_ns(chunk)
+
+    keep = source != _NAT
+    source, values = source[keep], values[keep]
+    if np.any(source[1:] < source[:-1]):
+        order = np.argsort(source, kind='stable')
+        source, values = source[order], values[order]
+
+    aligned = np.full((len(epochs), len(lags_ns), values.shape[1]), np.nan)
+
+    # Targets sorted and split into chunks, NaT targets left as NaN
+    targets = np.flatnonzero(epochs != _NAT)
+    if np.any(epochs[targets[1:]] < epochs[targets[:-1]]):
+        targets = targets[np.argsort(epochs[targets], kind='stable')]
+    if len(targets) == 0 or len(source) == 0:
+        return aligned[..., 0] if squeeze else aligned
+
+    target_epochs = epochs[targets]
+    bounds = np.flatnonzero(np.diff(target_epochs // chunk)) + 1
+    bounds = np.concatenate([[0], bounds, [len(targets)]])
+
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        queries = target_epochs[start:stop, np.newaxis] - lags_ns[np.newaxis, :]
+
+        # Slice of the source reachable from the chunk, with one more sample
+        # on each side for the nearest and previous lookups
+        first, last = queries.min() - (window or 0), queries.max()
+        low = max(np.searchsorted(source, first, side='left') - 1, 0)
+        high = min(np.searchsorted(source, last, side='right') + 1, len(source))
+
+        if method == 'nearest':
+            found_values, found = _nearest(source[low:high], values[low:high], queries.ravel(), tolerance)
+        elif method == 'previous':
+            found_values, found = _previous(source[low:high], values[low:high], queries.ravel(), tolerance)
+        else:
+            found_values, found = _window_mean(source[low:high], values[low:high], queries.ravel(), window)
+
+        found_values = np.where(found[:, np.newaxis], found_values, np.nan)
+        aligned[targets[start:stop]] = found_values.reshape(stop - start, len(lags_ns), -1)
+
+    return aligned[..., 0] if squeeze else aligned
+
+
+############ Alignment of DataFrames ############################################
+
+def _frame_epochs(df, time_column):
+    if time_column in df.columns:
+        return df[time_column].to_numpy()
+    if time_column in (df.index.names or []):
+        return df.index.get_level_values(time_column).to_numpy()
+    if isinstance(df.index, pd.DatetimeIndex):
+        return df.index.to_numpy()
+    raise ValueError(f"No '{time_column}' column or index level to align on")
+
+
+def lag_label(lag):
+
+    '''
+    Return the suffix of the columns of a lag in `align_frames`, e.g. '' for
+    no lag and '_lag30min' for 30 minutes.
+    '''
+
+    lag = pd.Timedelta(lag)
+    if lag == pd.Timedelta(0):
+        return ''
+    sign = '-' if lag < pd.Timedelta(0) else ''
+
+    offset = to_offset(abs(lag))
+
+    return f'_lag{sign}{offset.n}{offset.name}'
+
+
+def align_frames(source, targets, columns=None, method='nearest', lags=(0,), tolerance=None, window=None,
+                 time_column='epoch', chunk='1D'):
+
+    '''
+    Align the columns of a source DataFrame (e.g. the OMNI frame returned by
+    `load_CDFfiles_OMNI`) onto the epochs of one or more target DataFrames
+    (e.g. the `ect_info` or `emfisis_info` frames of the RBSP loaders, per
+    probe or combined), with `align_epochs`. The source is converted to a
+    NumPy array once and reused for every target.
+
+    Args:
+        - source (pandas.DataFrame): The data to align, with its epochs in the
+          `time_column` column or index level.
+        - targets (pandas.DataFrame, list or dict): The frame or frames whose
+          epochs are used, in a `time_column` column or index level (e.g. the
+          (probe, epoch) MultiIndex of a combined load).
+        - columns (list, optional): The source columns to align. Default is
+          None (all the numeric columns).
+        - method, lags, tolerance, window, chunk: See `align_epochs`.
+        - time_column (str, optional): Name of the epoch column or index
+          level. Default is 'epoch'.
+
+    Returns:
+        - aligned (pandas.DataFrame, list or dict): For every target, a
+          DataFrame with its index and one float column per source column and
+          lag, named <column> for lag 0 and <column>_lag<lag> otherwise (e.g.
+          'V_lag30min'). `.to_numpy()` gives the array for a model.
+    '''
+
+    if columns is None:
+        columns = [c for c in source.columns if c != time_column and source[c].dtype.kind in 'fiub']
+
+    source_epochs = _frame_epochs(source, time_column)
+    source_values = source[columns].to_numpy(dtype=np.float64)
+    names = [f'{column}{lag_label(lag)}' for lag in lags for column in columns]
+
+    def align(target):
+        aligned = align_epochs(_frame_epochs(target, time_column), source_epochs, source_values, method, lags,
+                               tolerance, window, chunk)
+        return pd.DataFrame(aligned.reshape(len(target), -1), index=target.index, columns=names)
+
+    if isinstance(targets, pd.DataFrame):
+        return align(targets)
+    if isinstance(targets, dict):
+        return {key: align(target) for key, target in targets.items()}
+
+    return [align(target) for target in targets]
@@ -0,0 +1,259 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+from Process_data.utils.profiling import logger
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+# Bump when the layout of the cached entries or the cleaning output changes,
+# so that old entries are not reused.
+CACHE_VERSION = 3
+
+
+############ Functions to serialize metadata dictionaries as JSON ##############
+
+def encode_metadata(value):
+
+    '''
+    Convert a metadata structure (as returned by the `read_CDFfile_*` functions)
+    into something that can be written with `json.dump`. NumPy scalars and
+    arrays keep their dtype, and DataFrames (used for the EMFISIS metadata)
+    keep their index and columns, so `decode_metadata` gives back the same
+    objects.
+
+    Args:
+        - value: A dict, list, NumPy array or scalar, DataFrame or plain value.
+
+    Returns:
+        - A JSON serializable version of `value`.
+    '''
+
+    if isinstance(value, dict):
+        return {'__dict__': [[encode_metadata(k), encode_metadata(v)] for k, v in value.items()]}
+    if isinstance(value, (list, tuple)):
+        return [encode_metadata(v) for v in value]
+    if isinstance(value, pd.DataFrame):
+        return {'__dataframe__': {
+            'index': [encode_metadata(i) for i in value.index],
+            'columns': [encode_metadata(c) for c in value.columns],
+            'dtypes': [str(dtype) for dtype in value.dtypes],
+            'data': [[encode_metadata(v) for v in row] for row in value.itertuples(index=False)]}}
+    if isinstance(value, np.ndarray):
+        return {'__ndarray__': value.tolist(), 'dtype': value.dtype.str}
+    if isinstance(value, np.generic):
+        return {'__npscalar__': value.item(), 'dtype': value.dtype.str}
+    return value
+
+
+def decode_metadata(value):
+
+    '''
+    Inverse of `encode_metadata`.
+    '''
+
+    if isinstance(value, list):
+        return [decode_metadata(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if '__dict__' in value:
+        return {decode_metadata(k): decode_metadata(v) for k, v in value['__dict__']}
+    if '__dataframe__' in value:
+        d = value['__dataframe__']
+        data = [[decode_metadata(v) for v in row] for row in d['data']]
+        df = pd.DataFrame(data, index=[decode_metadata(i) for i in d['index']],
+                          columns=[decode_metadata(c) for c in d['columns']], dtype=object)
+        return df.astype(dict(zip(df.columns, d['dtypes'])))
+    if '__ndarray__' in value:
+        return np.array(value['__ndarray__'], dtype=np.dtype(value['dtype']))
+    if '__npscalar__' in value:
+        return np.array(value['__npscalar__'], dtype=np.dtype(value['dtype']))[()]
+    return value
+
+
+################ Persistent cache of cleaned per-file results ##################
+
+class DayCache:
+
+    '''
+    On-disk cache of the cleaned content of single CDF files. Each entry is a
+    directory holding the scalar DataFrame as Parquet (or a pickle if no
+    Parquet engine is installed), every extra array (e.g. FEDU) as .npy and the
+    metadata as JSON. Entries are keyed by the source path, its modification
+    time and size, the requested variables, the rename mapping and any other
+    option that changes the result, so a re-downloaded or re-versioned file is
+    decoded again.
+
+    When `max_bytes` is given, the least recently used entries are removed
+    after each write until the cache fits.
+
+    Args:
+        - cache_dir (str): Directory where the entries are stored. It is created
+          if it does not exist.
+        - max_bytes (int, optional): Maximum size of the cache in bytes. None
+          means unbounded. Default is None.
+        - mode (str, optional): 'use' reads and writes entries, 'rebuild'
+          ignores the existing entries and overwrites them, and 'bypass' neither
+          reads nor writes. Default is 'use'.
+    '''
+
+    def __init__(self, cache_dir, max_bytes=None, mode='use'):
+        if mode not in ('use', 'rebuild', 'bypass'):
+            raise ValueError(f"Unknown cache mode '{mode}', use 'use', 'rebuild' or 'bypass'")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.mode = mode
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, cdf_path, relevant_var, rename_mapping, **options):
+
+        '''
+        Build the key of the entry for `cdf_path`.
+
+        Args:
+            - cdf_path (str): The path to the source CDF file.
+            - relevant_var (list): The variables read from the file.
+            - rename_mapping (dict): The mapping used to rename the variables.
+            - **options: Any other argument that changes the cached result.
+
+        Returns:
+            - key (str): A hexadecimal digest identifying the entry.
+        '''
+
+        stat = os.stat(cdf_path)
+        description = [CACHE_VERSION, os.path.abspath(cdf_path), stat.st_mtime_ns, stat.st_size,
+                       list(relevant_var), sorted((str(k), str(v)) for k, v in rename_mapping.items()),
+                       sorted((k, repr(v)) for k, v in options.items())]
+
+        return hashlib.sha1(json.dumps(description).encode()).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key):
+
+        '''
+        Read the entry `key`.
+
+        Returns:
+            - tuple or None: (df, metadata, arrays) where `arrays` is a dict of
+              the stored NumPy arrays, or None if the entry does not exist or
+              the cache is not in 'use' mode.
+        '''
+
+        if self.mode != 'use':
+            return None
+
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, 'metadata.json')) as fp:
+                content = json.load(fp)
+            frame_path = os.path.join(entry_dir, content['frame'])
+            if content['frame'].endswith('.parquet'):
+                df = pd.read_parquet(frame_path)
+            else:
+                df = pd.read_pickle(frame_path)
+            arrays = {name: np.load(os.path.join(entry_dir, name + '.npy')) for name in content['arrays']}
+        except (OSError, ValueError, KeyError):
+            return None
+
+        # Recently used entries are the last ones to be evicted
+        os.utime(entry_dir)
+
+        return df, decode_metadata(content['metadata']), arrays
+
+    def store(self, key, df, metadata, arrays=None):
+
+        '''
+        Write the entry `key`, replacing it if it already exists. A failed
+        write (e.g. a column the Parquet engine cannot store, or a full disk)
+        only logs a warning and leaves no entry, it never fails the load.
+
+        Args:
+            - df (pandas.DataFrame): The cleaned scalar data.
+            - metadata: The metadata returned with `df` (see `encode_metadata`).
+            - arrays (dict, optional): Extra NumPy arrays to store, by name.
+        '''
+
+        if self.mode == 'bypass':
+            return
+
+        arrays = arrays or {}
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=self.cache_dir)
+        try:
+            try:
+                frame = 'frame.parquet'
+                df.to_parquet(os.path.join(tmp_dir, frame))
+            except ImportError:
+                frame = 'frame.pkl'
+                df.to_pickle(os.path.join(tmp_dir, frame))
+
+            for name, values in arrays.items():
+                np.save(os.path.join(tmp_dir, name + '.npy'), values)
+
+            content = {'frame': frame, 'arrays': list(arrays), 'metadata': encode_metadata(metadata)}
+            with open(os.path.join(tmp_dir, 'metadata.json'), 'w') as fp:
+                json.dump(content, fp)
+
+            entry_dir = self._entry_dir(key)
+            if os.path.exists(entry_dir):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            # Another process may have written the same entry concurrently
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        except Exception as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            logger.warning(f'Could not write the cache entry {key}: {e!r}')
+
+        if self.max_bytes is not None:
+            self.evict()
+
+    def entries(self):
+
+        '''
+        List the cache entries as (last_used, size_in_bytes, path) tuples.
+        '''
+
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir() or entry.name.startswith('.'):
+                continue
+            size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+            entries.append((entry.stat().st_mtime, size, entry.path))
+
+        return entries
+
+    def evict(self):
+
+        '''
+        Remove the least recently used entries until the cache is smaller than
+        `max_bytes`.
+        '''
+
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+
+        '''
+        Remove every entry of the cache.
+        '''
+
+        for _, _, path in self.entries():
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+########## Functions to mask fill values and out of range values ##############
+
+def _limit(value, component=None):
+
+    '''
+    Convert a FILLVAL/VALIDMIN/VALIDMAX attribute to a float (NaN if absent).
+    Attributes of multi-component variables hold one value per component; the
+    one of `component` is used, and they are ignored if it is not known.
+    '''
+
+    if value is None:
+        return np.nan
+    try:
+        value = np.ravel(np.asarray(value, dtype=np.float64))
+    except (TypeError, ValueError):
+        return np.nan
+
+    if value.size == 1:
+        return value[0]
+    if component is not None and component < value.size:
+        return value[component]
+    return np.nan
+
+
+def get_limits(var_metadata, component=None):
+
+    '''
+    Return the (fill_value, min_valid, max_valid) of a variable from its
+    filtered metadata, as floats, with NaN for the missing ones.
+
+    Args:
+        - var_metadata (dict): The filtered metadata of the variable.
+        - component (int, optional): For columns split from a multi-component
+          variable, the index of the component. Default is None.
+
+    Returns:
+        - tuple: (fill_value, min_valid, max_valid).
+    '''
+
+    return (_limit(var_metadata.get('fill_value'), component),
+            _limit(var_metadata.get('min_valid'), component),
+            _limit(var_metadata.get('max_valid'), component))
+
+
+def invalid_mask(values, fill_value, min_valid=np.nan, max_valid=np.nan, valid_range=True):
+
+    '''
+    Return the boolean mask of the values equal to the fill value or, if
+    `valid_range` is True, outside [min_valid, max_valid]. The limits can be
+    scalars or arrays broadcastable against `values` (e.g. one per row of a
+    block of columns); NaN limits never match.
+    '''
+
+    mask = values == fill_value
+    if valid_range:
+        mask |= values < min_valid
+        mask |= values > max_valid
+
+    return mask
+
+
+def clean_array(values, fill_value, min_valid=None, max_valid=None, valid_range=True, inplace=False):
+
+    '''
+    Replace the fill values and, if `valid_range` is True, the values outside
+    [min_valid, max_valid] of a floating point array with NaN, in one pass.
+
+    Args:
+        - values (numpy.ndarray): The array to clean.
+        - fill_value, min_valid, max_valid: The limits of the variable (None or
+          NaN if absent).
+        - valid_range (bool, optional): If True, also mask the values outside
+          the valid range. Default is True.
+        - inplace (bool, optional): If True, `values` is cleaned in place when
+          it is writeable instead of on a copy. Default is False.
+
+    Returns:
+        - numpy.ndarray: The cleaned array.
+    '''
+
+    fill_value, min_valid, max_valid = (_limit(v) for v in (fill_value, min_valid, max_valid))
+
+    if not (inplace and values.flags.writeable):
+        values = np.copy(values)
+    np.putmask(values, invalid_mask(values, fill_value, min_valid, max_valid, valid_range), np.nan)
+
+    return values
+
+
+def clean_frame(df, dict_metadata, valid_range=True, components=None):
+
+    '''
+    Replace the fill values and, if `valid_range` is True, the values outside
+    the valid range of every numeric column of `df` with NaN, following the
+    per-variable rules of `dict_metadata`. The columns are processed in blocks
+    of the same dtype, so each block is compared with the vectors of limits in
+    a single vectorized pass. The block is a new buffer and is masked in
+    place; `df` is not modified.
+
+    Float columns keep their dtype. Integer columns are converted to float64
+    only if some of their values are masked, as Series.replace does. Datetime,
+    boolean and object columns, and columns without metadata, are returned
+    unchanged.
+
+    Args:
+        - df (pandas.DataFrame): The data to clean.
+        - dict_metadata (dict): The filtered metadata of each column.
+        - valid_range (bool, optional): If True, also mask the values outside
+          the valid range. Default is True.
+        - components (dict, optional): For columns split from a multi-component
+          variable, the index of their component, used to pick their limits.
+          Default is None.
+
+    Returns:
+        - df_clean (pandas.DataFrame): The cleaned DataFrame.
+    '''
+
+    components = components or {}
+
+    groups = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, np.dtype) and dtype.kind in 'fiu' and dict_metadata.get(col) is not None:
+            groups.setdefault(dtype, []).append(col)
+
+    data = {col: df[col] for col in df.columns}
+
+    for dtype, cols in groups.items():
+        limits = np.array([get_limits(dict_metadata[col], components.get(col)) for col in cols])
+        fill_value, min_valid, max_valid = (limits[:, [i]] for i in range(3))
+
+        # One contiguous row per column
+        block = np.empty((len(cols), len(df)), dtype=dtype)
+        for i, col in enumerate(cols):
+            block[i] = df[col].to_numpy()
+
+        mask = invalid_mask(block, fill_value, min_valid, max_valid, valid_range)
+
+        if dtype.kind == 'f':
+            np.putmask(block, mask, np.nan)
+            for i, col in enumerate(cols):
+                data[col] = block[i]
+        else:
+            for i, col in enumerate(cols):
+                if mask[i].any():
+                    data[col] = np.where(mask[i], np.nan, block[i])
+                else:
+                    data[col] = block[i]
+
+    return pd.DataFrame(data, index=df.index, copy=False)
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+_FLOAT32_MAX = np.finfo(np.float32).max
+
+
+def _var_limits(var_metadata):
+    # Finite fill value and valid range, with the names used by every reader
+    if isinstance(var_metadata, pd.DataFrame):
+        var_metadata = var_metadata.iloc[:, 0].to_dict()
+    if not isinstance(var_metadata, dict):
+        return np.empty(0)
+
+    limits = []
+    for key in ('fill_value', 'min_valid', 'max_valid', 'min_value', 'max_value'):
+        try:
+            values = np.ravel(np.asarray(var_metadata.get(key), dtype=np.float64))
+        except (TypeError, ValueError):
+            continue
+        limits.append(values[np.isfinite(values)])
+
+    return np.concatenate(limits) if limits else np.empty(0)
+
+
+############ Functions to store the data in narrower dtypes ####################
+
+def compact_dtype(dtype, var_metadata=None):
+
+    '''
+    Return the narrowest dtype that holds the values allowed by the metadata of
+    a variable: float32 for floating point columns whose fill value and valid
+    range fit in float32, and the smallest integer type holding the fill value
+    and valid range of integer columns (kept as is if they are unknown). The
+    decision depends only on the dtype and the metadata, so every file of a
+    load gets the same dtype.
+
+    Args:
+        - dtype (numpy.dtype): The dtype of the column.
+        - var_metadata (dict, optional): The metadata of the variable.
+
+    Returns:
+        - dtype (numpy.dtype): The compact dtype.
+    '''
+
+    if not isinstance(dtype, np.dtype):
+        return dtype
+
+    limits = _var_limits(var_metadata)
+    if dtype.kind == 'f':
+        if dtype.itemsize > 4 and np.all(np.abs(limits) <= _FLOAT32_MAX):
+            return np.dtype(np.float32)
+        return dtype
+
+    if dtype.kind in 'iu' and len(limits) > 0:
+        low, high = np.min(limits), np.max(limits)
+        for compact in (np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32):
+            info = np.iinfo(compact)
+            if info.min <= low and high <= info.max:
+                if np.dtype(compact).itemsize < dtype.itemsize:
+                    return np.dtype(compact)
+                break
+
+    return dtype
+
+
+def compact_frame(df, metadata=None, time_column='epoch'):
+
+    '''
+    Convert the columns of a cleaned DataFrame to the dtypes of
+    `compact_dtype`. Integer columns with values outside their valid range
+    keep their dtype. The epochs are not modified.
+
+    Args:
+        - df (pandas.DataFrame): The cleaned data.
+        - metadata (dict, optional): The metadata of every column. Default is
+          None (floating point columns become float32).
+        - time_column (str, optional): The epoch column. Default is 'epoch'.
+
+    Returns:
+        - df (pandas.DataFrame): The data with the compact dtypes.
+    '''
+
+    metadata = metadata or {}
+    dtypes = {col: compact_dtype(dtype, metadata.get(col)) for col, dtype in df.dtypes.items() if col != time_column}
+    dtypes = {col: dtype for col, dtype in dtypes.items() if dtype != df[col].dtype and _fits(df[col], dtype)}
+    if not dtypes:
+        return df
+
+    return df.astype(dtypes)
+
+
+def _fits(column, dtype):
+    # Integer values outside the valid range (e.g. with valid_range=False) keep
+    # the original dtype, the accumulators promote the dtype when needed
+    if dtype.kind not in 'iu' or len(column) == 0:
+        return True
+    info = np.iinfo(dtype)
+    return info.min <= column.min() and column.max() <= info.max
+
+
+def compact_array(values):
+
+    '''
+    Return a floating point array (e.g. FEDU) as float32.
+    '''
+
+    if values.dtype.kind == 'f' and values.dtype.itemsize > 4:
+        return values.astype(np.float32)
+    return values
+
+
+# Shift of the bit set by `pack_flags` when a flag is unknown (NaN)
+UNKNOWN_SHIFT = 4
+
+
+def pack_flags(df, bits, column='quality'):
+
+    '''
+    Replace several 0/1 quality flag columns by a single uint8 bitmask column,
+    placed where the first flag was. Flags missing from `df` are ignored.
+
+    A flag equal to 1 sets its bit. A flag that is unknown (NaN, e.g. masked
+    by the cleaning) sets its bit shifted by UNKNOWN_SHIFT instead (16 for
+    bit 1, 32 for bit 2, ...), so it is not taken as a good value: 0 means
+    that every flag is known and 0.
+
+    Args:
+        - df (pandas.DataFrame): The data.
+        - bits (dict): The bit (1, 2, 4 or 8) of every flag column.
+        - column (str, optional): Name of the bitmask column. Default is
+          'quality'.
+
+    Returns:
+        - df (pandas.DataFrame): The data with the bitmask instead of the flags.
+
+    Raises:
+        - ValueError: If a bit does not leave room for its unknown bit.
+    '''
+
+    flags = [flag for flag in bits if flag in df.columns]
+    if not flags:
+        return df
+
+    too_large = {flag: bits[flag] for flag in flags if bits[flag] << UNKNOWN_SHIFT > np.iinfo(np.uint8).max}
+    if too_large:
+        raise ValueError(f'The bits of the flags must be at most {2**(8 - UNKNOWN_SHIFT - 1)}, not {too_large}')
+
+    mask = np.zeros(len(df), dtype=np.uint8)
+    for flag in flags:
+        values = df[flag].to_numpy(dtype=np.float64, na_value=np.nan)
+        mask[values == 1] |= np.uint8(bits[flag])
+        mask[np.isnan(values)] |= np.uint8(bits[flag] << UNKNOWN_SHIFT)
+
+    position = df.columns.get_loc(flags[0])
+    df = df.drop(columns=flags)
+    df.insert(position, column, mask)
+
+    return df
@@ -0,0 +1,168 @@
+import numpy as np
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+# Leap seconds since 1972: (UTC date from which it applies, TAI - UTC in seconds).
+# Same table as cdflib (CDFLeapSeconds.txt); needs a new row when IERS
+# announces another leap second.
+LEAP_SECONDS = [
+    ('1972-01-01', 10), ('1972-07-01', 11), ('1973-01-01', 12), ('1974-01-01', 13),
+    ('1975-01-01', 14), ('1976-01-01', 15), ('1977-01-01', 16), ('1978-01-01', 17),
+    ('1979-01-01', 18), ('1980-01-01', 19), ('1981-07-01', 20), ('1982-07-01', 21),
+    ('1983-07-01', 22), ('1985-07-01', 23), ('1988-01-01', 24), ('1990-01-01', 25),
+    ('1991-01-01', 26), ('1992-07-01', 27), ('1993-07-01', 28), ('1994-07-01', 29),
+    ('1996-01-01', 30), ('1997-07-01', 31), ('1999-01-01', 32), ('2006-01-01', 33),
+    ('2009-01-01', 34), ('2012-07-01', 35), ('2015-07-01', 36), ('2017-01-01', 37)]
+
+# 0000-01-01T00:00:00 (origin of CDF_EPOCH and CDF_EPOCH16) relative to 1970-01-01
+EPOCH_0AD_MS = 62167219200000
+EPOCH_0AD_S = 62167219200
+
+# TT2000 = 0 is 2000-01-01T11:58:55.816 UTC, when TAI - UTC was 32 s
+TT2000_J2000_NS = np.datetime64('2000-01-01T11:58:55.816', 'ns').astype(np.int64)
+TT2000_J2000_LEAP = 32
+
+# TT2000 fill and pad values
+TT2000_FILL = np.iinfo(np.int64).min
+TT2000_PAD = np.iinfo(np.int64).min + 1
+
+NAT = np.iinfo(np.int64).min
+
+
+def _leap_second_table():
+
+    '''
+    Return the TT2000 values at which each leap second of LEAP_SECONDS
+    starts, together with the TAI - UTC offset after it. The inserted second
+    (23:59:60) is mapped to 23:59:59, since datetime64 cannot represent it.
+    '''
+
+    utc = np.array([np.datetime64(date, 'ns') for date, _ in LEAP_SECONDS]).astype(np.int64)
+    leap = np.array([seconds for _, seconds in LEAP_SECONDS], dtype=np.int64)
+
+    tt2000 = utc - TT2000_J2000_NS + (leap - TT2000_J2000_LEAP)*1_000_000_000 - 1_000_000_000
+
+    return tt2000, leap
+
+
+TT2000_LEAP_STARTS, TT2000_LEAP_OFFSETS = _leap_second_table()
+
+
+############ Functions to decode CDF time variables without strings ############
+
+def tt2000_to_datetime64(values):
+
+    '''
+    Convert CDF_TIME_TT2000 values (nanoseconds since J2000 in Terrestrial
+    Time) to UTC datetime64[ns], using the LEAP_SECONDS table. Fill and pad
+    values become NaT. Dates before 1972 use the 1972 offset.
+
+    Args:
+        - values (numpy.ndarray): int64 TT2000 values.
+
+    Returns:
+        - numpy.ndarray: The datetime64[ns] values.
+    '''
+
+    values = np.asarray(values, dtype=np.int64)
+
+    i = np.searchsorted(TT2000_LEAP_STARTS, values, side='right') - 1
+    leap = TT2000_LEAP_OFFSETS[np.maximum(i, 0)]
+
+    ns = values + TT2000_J2000_NS - (leap - TT2000_J2000_LEAP)*1_000_000_000
+    ns[(values == TT2000_FILL) | (values == TT2000_PAD)] = NAT
+
+    return ns.view('datetime64[ns]')
+
+
+def epoch_to_datetime64(values):
+
+    '''
+    Convert CDF_EPOCH values (milliseconds since 0000-01-01) to datetime64[ns].
+    As in cdflib.cdfepoch.encode, sub-millisecond fractions are truncated.
+    Fill values (-1e31), NaN and dates outside the datetime64[ns] range
+    become NaT.
+
+    Args:
+        - values (numpy.ndarray): float64 CDF_EPOCH values.
+
+    Returns:
+        - numpy.ndarray: The datetime64[ns] values.
+    '''
+
+    values = np.asarray(values, dtype=np.float64)
+    ms = np.floor(values) - EPOCH_0AD_MS
+
+    invalid = ~np.isfinite(ms) | (np.abs(ms) > 9.2e12)
+    ns = np.where(invalid, 0, ms).astype(np.int64)*1_000_000
+    ns[invalid] = NAT
+
+    return ns.view('datetime64[ns]')
+
+
+def epoch16_to_datetime64(values):
+
+    '''
+    Convert CDF_EPOCH16 values (seconds since 0000-01-01 as real part and
+    picoseconds as imaginary part) to datetime64[ns], truncating the
+    picoseconds. Fill values (-1e31), NaN and dates outside the
+    datetime64[ns] range become NaT.
+
+    Args:
+        - values (numpy.ndarray): complex128 CDF_EPOCH16 values.
+
+    Returns:
+        - numpy.ndarray: The datetime64[ns] values.
+    '''
+
+    values = np.asarray(values, dtype=np.complex128)
+    seconds = values.real - EPOCH_0AD_S
+    picoseconds = values.imag
+
+    invalid = ~np.isfinite(seconds) | ~np.isfinite(picoseconds) | (np.abs(seconds) > 9.2e9)
+    seconds = np.where(invalid, 0, seconds).astype(np.int64)
+    picoseconds = np.where(invalid, 0, picoseconds).astype(np.int64)
+
+    ns = seconds*1_000_000_000 + picoseconds//1000
+    ns[invalid] = NAT
+
+    return ns.view('datetime64[ns]')
+
+
+def decode_epoch(values):
+
+    '''
+    Convert the raw values of a CDF time variable to datetime64[ns] with NumPy
+    arithmetic. It gives the same timestamps as
+    `pd.to_datetime(cdflib.cdfepoch.encode(values))` without formatting and
+    parsing a string per record. The CDF time type is taken from the dtype, as
+    cdflib does: float64 for CDF_EPOCH, complex128 for CDF_EPOCH16 and int64
+    for CDF_TIME_TT2000.
+
+    Args:
+        - values (numpy.ndarray): The values returned by cdflib for the time
+          variable.
+
+    Returns:
+        - numpy.ndarray: The datetime64[ns] values.
+
+    Raises:
+        - TypeError: If the dtype does not correspond to a CDF time type.
+    '''
+
+    values = np.asarray(values)
+
+    if values.dtype.kind == 'c':
+        return epoch16_to_datetime64(values)
+    if values.dtype.kind == 'f':
+        return epoch_to_datetime64(values)
+    if values.dtype.kind in 'iu':
+        return tt2000_to_datetime64(values)
+
+    raise TypeError(f'Cannot decode CDF time values of dtype {values.dtype}')
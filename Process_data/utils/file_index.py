@@ -0,0 +1,209 @@
+import os
+import re
+import json
+import fnmatch
+import tempfile
+import threading
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+# Bump when the layout of the index file changes
+INDEX_VERSION = 1
+
+INDEX_FILENAME = '.process_data_index.json'
+
+# <stem>_<YYYYMMDD>_v<version>.cdf, e.g.
+# rbspa_rel03_ect-rept-sci-L3_20140101_v5.1.0.cdf
+FILENAME_PATTERN = re.compile(r'^(?P<stem>.+)_(?P<date>\d{8})_v(?P<version>\d+(?:\.\d+)*)\.cdf$', re.IGNORECASE)
+
+
+def parse_version(version):
+
+    '''
+    Convert a version string such as '1.3.2' into a tuple of integers that
+    compares in version order (so that 'v10' is newer than 'v9').
+    '''
+
+    return tuple(int(part) for part in version.split('.'))
+
+
+############### Index of the CDF files of local archive directories ############
+
+class FileIndex:
+
+    '''
+    Index of the daily CDF files of local archive directories, mapping every
+    date to the newest version of its file. Each directory is listed once and
+    its content is kept, together with its modification time, so later lookups
+    do not touch the file system. A directory is listed again only if its
+    modification time changed since it was indexed (files added or removed).
+    The modification time of each directory is checked once per FileIndex
+    object; call `refresh` to check again.
+
+    If `path` is given, the index is read from that JSON file and `save`
+    writes it back, so the directories do not need to be listed again in later
+    sessions.
+
+    Args:
+        - path (str, optional): The JSON file where the index is persisted.
+          Default is None (index kept in memory only).
+    '''
+
+    def __init__(self, path=None):
+        self.path = path
+        self.dirs = {}
+        self._checked = set()
+        self._dirty = False
+        self._lock = threading.Lock()
+
+        if path is not None:
+            self.load()
+
+    def load(self):
+
+        '''
+        Read the index from `path`. A missing, unreadable or outdated file
+        leaves the index empty.
+        '''
+
+        try:
+            with open(self.path) as fp:
+                content = json.load(fp)
+        except (OSError, ValueError):
+            return
+        if content.get('version') != INDEX_VERSION:
+            return
+
+        self.dirs = content['dirs']
+
+    def save(self):
+
+        '''
+        Write the index to `path` if it changed. Errors (e.g. a read-only
+        archive) are ignored, the index is just not persisted.
+        '''
+
+        if self.path is None or not self._dirty:
+            return
+
+        with self._lock:
+            content = {'version': INDEX_VERSION, 'dirs': self.dirs}
+            try:
+                fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(self.path) or '.')
+            except OSError:
+                return
+            try:
+                with os.fdopen(fd, 'w') as fp:
+                    json.dump(content, fp)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError:
+                os.remove(tmp_path)
+
+    def refresh(self):
+
+        '''
+        Check again the modification time of the indexed directories in the
+        next lookups.
+        '''
+
+        self._checked.clear()
+
+    def _scan(self, local_dir):
+
+        '''
+        List `local_dir` and group its CDF files by stem and date, keeping
+        the newest version of every date.
+        '''
+
+        files = {}
+        try:
+            mtime_ns = os.stat(local_dir).st_mtime_ns
+            names = os.listdir(local_dir)
+        except OSError:
+            return {'mtime_ns': None, 'files': files}
+
+        for name in names:
+            match = FILENAME_PATTERN.match(name)
+            if match is None:
+                continue
+            by_date = files.setdefault(match['stem'], {})
+            current = by_date.get(match['date'])
+            if current is None or parse_version(match['version']) > parse_version(current[0]):
+                by_date[match['date']] = [match['version'], name]
+
+        return {'mtime_ns': mtime_ns, 'files': files}
+
+    def _directory(self, local_dir):
+        key = os.path.abspath(local_dir)
+
+        with self._lock:
+            if key not in self._checked:
+                try:
+                    mtime_ns = os.stat(key).st_mtime_ns
+                except OSError:
+                    mtime_ns = None
+                entry = self.dirs.get(key)
+                if entry is None or entry['mtime_ns'] != mtime_ns:
+                    self.dirs[key] = self._scan(key)
+                    self._dirty = True
+                self._checked.add(key)
+
+            return self.dirs[key]
+
+    def find(self, local_dir, stem_pattern, date):
+
+        '''
+        Return the path of the newest version of the file of `date` in
+        `local_dir`.
+
+        Args:
+            - local_dir (str): The directory of the file.
+            - stem_pattern (str): Shell-style pattern (as in glob) of the part
+              of the filename before _<YYYYMMDD>_v<version>.cdf, e.g.
+              'rbspa_*_ect-rept-*'.
+            - date (datetime.date): The date of the file.
+
+        Returns:
+            - filepath (str or None): The path of the file, or None if there is
+              no file for `date`.
+        '''
+
+        entry = self._directory(local_dir)
+        day = date.strftime('%Y%m%d')
+
+        best = None
+        for stem, by_date in entry['files'].items():
+            if day not in by_date or not fnmatch.fnmatchcase(stem, stem_pattern):
+                continue
+            version, name = by_date[day]
+            if best is None or parse_version(version) > parse_version(best[0]):
+                best = (version, name)
+
+        if best is None:
+            return None
+
+        return os.path.join(local_dir, best[1])
+
+
+def open_file_index(local_root_dir):
+
+    '''
+    Return the FileIndex persisted in the root directory of a local archive
+    (<local_root_dir>/.process_data_index.json).
+
+    Args:
+        - local_root_dir (str): The root directory of the local data files.
+
+    Returns:
+        - index (FileIndex): The index.
+    '''
+
+    return FileIndex(os.path.join(local_root_dir, INDEX_FILENAME))
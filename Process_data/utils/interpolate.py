@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+# Values of the VAR_TYPE attribute of the variables that are not measurements
+SUPPORT_VAR_TYPES = ('support_data', 'metadata', 'ignore_data')
+
+
+############ Gap-limited linear interpolation in time ##########################
+
+def interpolate_gaps(times, values, max_gap=None, inplace=False):
+
+    '''
+    Fill the NaN values of one or more series by linear interpolation in time
+    between the valid samples around them. A run of NaN values is filled only
+    if the valid samples before and after it are at most `max_gap` apart;
+    longer gaps and the NaN values at the beginning or end of the series (no
+    valid sample on one side) are left as NaN. Every column of `values` is
+    interpolated on its own, all of them at once.
+
+    Rows without a time (NaT, e.g. fill epochs) are left out: they are
+    neither filled nor used to fill the others.
+
+    Args:
+        - times (array-like): The epochs of the samples (datetime64), in
+          increasing order (but for NaT).
+        - values (numpy.ndarray): Float array of shape (n,) or (n, k).
+        - max_gap (optional): Longest gap between valid samples that is filled
+          (anything accepted by pandas.Timedelta, e.g. '5min'). Default is
+          None (no limit).
+        - inplace (bool, optional): If True, `values` is filled in place.
+          Default is False.
+
+    Returns:
+        - values (numpy.ndarray): The interpolated values.
+    '''
+
+    if not inplace:
+        values = np.array(values, dtype=np.result_type(values, np.float32))
+
+    block = values[:, np.newaxis] if values.ndim == 1 else values
+    if len(block) == 0 or not np.isnan(block).any():
+        return values
+
+    times = np.asarray(times).astype('datetime64[ns]')
+    untimed = np.isnat(times)
+    if untimed.any():
+        timed = np.flatnonzero(~untimed)
+        rows = block[timed]
+        _fill_gaps(times[timed], rows, max_gap)
+        block[timed] = rows
+    else:
+        _fill_gaps(times, block, max_gap)
+
+    return values
+
+
+def _fill_gaps(times, block, max_gap):
+    # Core of `interpolate_gaps`, in place, on a 2D block with valid times
+    n = len(block)
+    missing = np.isnan(block)
+    if n == 0 or not missing.any():
+        return
+
+    t = times.view('i8')
+    t = (t - t[0]).astype(np.float64)
+    rows = np.arange(n)[:, np.newaxis]
+
+    # Last valid row at or before, and first valid row at or after, every row
+    before = np.maximum.accumulate(np.where(missing, -1, rows), axis=0)
+    after = np.minimum.accumulate(np.where(missing, n, rows)[::-1], axis=0)[::-1]
+
+    fill = missing & (before >= 0) & (after < n)
+    if max_gap is not None:
+        t_before = t[np.clip(before, 0, n - 1)]
+        t_after = t[np.clip(after, 0, n - 1)]
+        fill &= (t_after - t_before) <= pd.Timedelta(max_gap).value
+
+    r, c = np.nonzero(fill)
+    b, a = before[r, c], after[r, c]
+    weight = (t[r] - t[b])/(t[a] - t[b])
+    block[r, c] = block[b, c] + weight*(block[a, c] - block[b, c])
+
+
+def _var_type(var_metadata):
+    if isinstance(var_metadata, pd.DataFrame):
+        var_metadata = var_metadata.iloc[:, 0].to_dict()
+    if isinstance(var_metadata, dict):
+        return var_metadata.get('var_type')
+    return None
+
+
+def science_columns(dtypes, metadata=None, time_column='epoch'):
+
+    '''
+    Select the columns to interpolate: the float columns, except the epochs
+    and the variables marked as support data (VAR_TYPE) in `metadata`, such
+    as quality flags, spacecraft IDs or channel labels.
+
+    Args:
+        - dtypes (dict or pandas.Series): The dtype of every column.
+        - metadata (dict, optional): The metadata of every column, as returned
+          by the readers. Default is None (every float column).
+        - time_column (str, optional): The epoch column. Default is 'epoch'.
+
+    Returns:
+        - list: The names of the columns.
+    '''
+
+    metadata = metadata or {}
+
+    return [col for col, dtype in dict(dtypes).items()
+            if col != time_column and isinstance(dtype, np.dtype) and dtype.kind == 'f'
+            and _var_type(metadata.get(col)) not in SUPPORT_VAR_TYPES]
+
+
+def interpolate_frame(df, metadata=None, columns=None, max_gap=None, time_column='epoch'):
+
+    '''
+    Interpolate the NaN values of the science columns of a DataFrame in time
+    with `interpolate_gaps`. The other columns are not modified.
+
+    Args:
+        - df (pandas.DataFrame): The data, with its epochs in `time_column`.
+        - metadata (dict, optional): The metadata of the columns, used to
+          select the science columns (see `science_columns`). Default is None.
+        - columns (list, optional): The columns to interpolate. Default is
+          None (the science columns).
+        - max_gap (optional): See `interpolate_gaps`. Default is None.
+        - time_column (str, optional): The epoch column. Default is 'epoch'.
+
+    Returns:
+        - df (pandas.DataFrame): A copy of `df` with the columns interpolated.
+
+    Raises:
+        - ValueError: If `time_column` is not a column of `df`.
+    '''
+
+    if time_column not in df.columns:
+        raise ValueError(f"Interpolation in time needs the '{time_column}' column (add 'Epoch' to relevant_var)")
+    if columns is None:
+        columns = science_columns(df.dtypes, metadata, time_column)
+
+    df = df.copy()
+    times = df[time_column].to_numpy()
+    for col in columns:
+        df[col] = interpolate_gaps(times, df[col].to_numpy(), max_gap)
+
+    return df
+
+
+def interpolate_accumulator(acc, metadata=None, columns=None, max_gap=None, time_column='epoch'):
+
+    '''
+    Interpolate in place the science columns accumulated in a
+    ColumnAccumulator (see `interpolate_frame`), so the loaders fill the gaps
+    across the boundaries between files before building the final frame.
+
+    Raises:
+        - ValueError: If `time_column` is not one of the accumulated columns.
+    '''
+
+    if acc.size == 0:
+        return
+    if time_column not in acc.columns:
+        raise ValueError(f"Interpolation in time needs the '{time_column}' column (add 'Epoch' to relevant_var)")
+    if columns is None:
+        columns = science_columns(acc.dtypes, metadata, time_column)
+
+    times = acc.columns[time_column].result()
+    for col in columns:
+        interpolate_gaps(times, acc.columns[col].result(), max_gap, inplace=True)
@@ -0,0 +1,181 @@
+import os
+import warnings
+import threading
+import numpy as np
+import pandas as pd
+from Process_data.utils.file_index import FILENAME_PATTERN
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+# Metadata entries whose change between files alters how the data must be read
+DRIFT_KEYS = ('fill_value', 'min_valid', 'max_valid', 'min_value', 'max_value', 'units',
+              'energy_values', 'alpha_values')
+
+
+class MetadataDriftWarning(UserWarning):
+
+    '''
+    Warning issued when the metadata of a variable changes between the files
+    of a load (e.g. a new fill value or energy grid in a new data version).
+    '''
+
+
+def dataset_version(cdf_path):
+
+    '''
+    Return the (dataset, version) of a CDF file from its name
+    (<dataset>_<YYYYMMDD>_v<version>.cdf). Files with other names are their
+    own dataset, without version.
+    '''
+
+    match = FILENAME_PATTERN.match(os.path.basename(cdf_path))
+    if match is None:
+        return os.path.abspath(cdf_path), None
+
+    return match['stem'], match['version']
+
+
+############ Cache of the metadata of every dataset version ####################
+
+class MetadataCache:
+
+    '''
+    In-memory cache of the parsed metadata and support data (e.g. energy
+    channels) of CDF variables, shared by all the files of the same dataset
+    and version, since they do not change from one day to the next. The
+    values are parsed from the first file of each version and reused for the
+    others.
+
+    Cached NumPy arrays are made read-only, since they are shared by every
+    caller.
+    '''
+
+    def __init__(self):
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, cdf_path, key, load):
+
+        '''
+        Return the value of `key` for the dataset version of `cdf_path`,
+        calling `load()` to compute it the first time.
+
+        Args:
+            - cdf_path (str): The path to the CDF file.
+            - key (hashable): What is cached, e.g. ('ECT', 'FEDU').
+            - load (callable): Function without arguments returning the value.
+
+        Returns:
+            - The cached value.
+        '''
+
+        entry_key = dataset_version(cdf_path) + (key,)
+        with self._lock:
+            if entry_key in self.entries:
+                return self.entries[entry_key]
+
+        value = load()
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+
+        with self._lock:
+            return self.entries.setdefault(entry_key, value)
+
+    def clear(self):
+
+        '''
+        Remove every cached value.
+        '''
+
+        with self._lock:
+            self.entries.clear()
+
+
+# Cache used by the readers when none is given
+METADATA_CACHE = MetadataCache()
+
+
+############ Detection of metadata changes between the files of a load #########
+
+def _same_value(a, b):
+    if a is b:
+        return True
+    try:
+        return np.array_equal(np.asarray(a), np.asarray(b), equal_nan=True)
+    except TypeError:
+        return np.array_equal(np.asarray(a), np.asarray(b))
+
+
+def _as_dict(var_metadata):
+    # EMFISIS keeps the metadata of each variable as a one column DataFrame
+    if isinstance(var_metadata, pd.DataFrame):
+        return var_metadata.iloc[:, 0].to_dict()
+    return var_metadata
+
+
+def compare_metadata(reference, metadata, keys=DRIFT_KEYS):
+
+    '''
+    List the differences in `keys` between two metadata dictionaries, either
+    flat (one variable, e.g. FEDU) or nested (one dictionary or one column
+    DataFrame per column).
+
+    Returns:
+        - list: (column, key, reference_value, new_value) tuples, with column
+          None for flat dictionaries.
+    '''
+
+    if any(isinstance(value, (dict, pd.DataFrame)) for value in reference.values()):
+        differences = []
+        for column, var_metadata in metadata.items():
+            ref_metadata, var_metadata = _as_dict(reference.get(column)), _as_dict(var_metadata)
+            if isinstance(ref_metadata, dict) and isinstance(var_metadata, dict):
+                differences += [(column,) + diff[1:] for diff in compare_metadata(ref_metadata, var_metadata, keys)]
+        return differences
+
+    return [(None, key, reference.get(key), metadata.get(key)) for key in keys
+            if (key in reference or key in metadata) and not _same_value(reference.get(key), metadata.get(key))]
+
+
+class MetadataTracker:
+
+    '''
+    Keeps the metadata of the first file of a load and warns (with a
+    MetadataDriftWarning) when a later file has different fill values, valid
+    ranges, units or support data, instead of silently keeping the metadata
+    of the last file. Each change is reported once.
+
+    Args:
+        - label (str): Name of the data in the warnings (e.g. 'rbspa ECT').
+    '''
+
+    def __init__(self, label):
+        self.label = label
+        self.reference = None
+        self._reported = set()
+
+    def update(self, date, metadata):
+
+        '''
+        Compare the metadata of the file of `date` with the one of the first
+        file.
+        '''
+
+        if self.reference is None:
+            self.reference = metadata
+            return
+
+        for column, key, old, new in compare_metadata(self.reference, metadata):
+            if (column, key) in self._reported:
+                continue
+            self._reported.add((column, key))
+            name = self.label if column is None else f'{self.label} {column}'
+            warnings.warn(f"Metadata '{key}' of {name} changed on {date:%Y-%m-%d}: {old!r} -> {new!r}. "
+                          f"The metadata returned is the one of the last file.",
+                          MetadataDriftWarning, stacklevel=3)
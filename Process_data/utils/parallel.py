@@ -0,0 +1,91 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+################ Functions to distribute per-file work on a pool ###############
+
+def map_ordered(func, items, workers=None, executor=None, depth=None):
+
+    '''
+    Apply `func` to every element of `items` and yield the results in the same
+    order as `items`. By default the work is done serially in the calling
+    process. If `executor` is given, the calls are submitted to it; otherwise,
+    if `workers` is larger than 1, a process pool with that many workers is
+    created for the duration of the iteration.
+
+    At most `depth` calls are pending at any time, so results that the caller
+    has not consumed yet do not pile up in memory.
+
+    Args:
+        - func (callable): Function of one argument applied to each item. When
+          a process pool is used it must be picklable (a module level function
+          or a functools.partial of one).
+        - items (iterable): The arguments passed to `func`, one per call.
+        - workers (int, optional): Number of worker processes. None or 1 runs
+          everything in the calling process. Default is None.
+        - executor (concurrent.futures.Executor, optional): An existing executor
+          to submit the calls to. It takes precedence over `workers` and is
+          not shut down. Default is None.
+        - depth (int, optional): Maximum number of pending calls. Default is
+          twice the number of workers (or 4 with an external executor).
+
+    Returns:
+        - generator: The results of `func(item)` for every item, in order.
+    '''
+
+    if executor is not None:
+        yield from _map_bounded(executor, func, items, depth or 4)
+        return
+
+    if workers is None or workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from _map_bounded(pool, func, items, depth or 2*workers)
+
+
+def prefetch_ordered(func, items, depth=2):
+
+    '''
+    Apply `func` to every element of `items` in background threads, running
+    ahead of the consumer by at most `depth` items, and yield the results in
+    the same order as `items`. Meant for the I/O bound part of the per-file
+    work (reading and decoding), so the next files are read while the caller
+    processes the current one; memory is bounded by `depth` pending results.
+
+    Args:
+        - func (callable): Function of one argument applied to each item.
+        - items (iterable): The arguments passed to `func`, one per call.
+        - depth (int, optional): Number of items read ahead (and of threads).
+          Default is 2.
+
+    Returns:
+        - generator: The results of `func(item)` for every item, in order.
+    '''
+
+    with ThreadPoolExecutor(max_workers=depth) as pool:
+        yield from _map_bounded(pool, func, items, depth)
+
+
+def _map_bounded(executor, func, items, depth):
+    pending = deque()
+    try:
+        for item in items:
+            if len(pending) >= depth:
+                yield pending.popleft().result()
+            pending.append(executor.submit(func, item))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # The consumer stopped early or a call failed
+        for future in pending:
+            future.cancel()
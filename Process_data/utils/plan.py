@@ -0,0 +1,78 @@
+from collections import namedtuple
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+ReadPlan = namedtuple('ReadPlan', ['variables', 'columns'])
+ReadPlan.__doc__ = '''
+Immutable description of what a reader extracts from each CDF file, built
+once per load with `build_read_plan` and reused for every file.
+
+    - variables (tuple): The CDF variables to read, without duplicates, in
+      order of first appearance.
+    - columns (tuple): One (var, names) pair per variable, where `names` is
+      the tuple of output columns. Variables with more than one column are
+      split along their second axis, one column per component.
+'''
+
+
+########### Function to compile the variables and columns of a reader ##########
+
+def build_read_plan(relevant_var, rename_mapping, split_suffixes=None, required_var=None):
+
+    '''
+    Compile the variables requested by the caller into a ReadPlan. Neither
+    `relevant_var` nor `rename_mapping` are modified.
+
+    Args:
+        - relevant_var (list): The variable names (str) requested by the caller.
+        - rename_mapping (dict): Mapping from CDF variable names to column names.
+        - split_suffixes (dict, optional): For multi-component variables, the
+          suffixes appended to the renamed variable for each component, e.g.
+          {'Position': ('1', '2', '3')}. Default is None.
+        - required_var (dict, optional): Variables that are always read, after
+          the requested ones, mapped to their fixed column names. Default is None.
+
+    Returns:
+        - plan (ReadPlan): The compiled plan.
+    '''
+
+    split_suffixes = split_suffixes or {}
+    required_var = required_var or {}
+
+    renames = dict(rename_mapping)
+    renames.update(required_var)
+
+    variables = tuple(dict.fromkeys(list(relevant_var) + list(required_var)))
+
+    columns = []
+    for var in variables:
+        renamed_key = renames.get(var)
+        if var in split_suffixes:
+            names = tuple(renamed_key + suffix for suffix in split_suffixes[var])
+        else:
+            names = (renamed_key,)
+        columns.append((var, names))
+
+    return ReadPlan(variables, tuple(columns))
+
+
+def split_components(plan):
+
+    '''
+    Return the index of the component of every column split from a
+    multi-component variable, e.g. {'pos1': 0, 'pos2': 1, 'pos3': 2}.
+
+    Args:
+        - plan (ReadPlan): The compiled plan.
+
+    Returns:
+        - components (dict): Column name to component index.
+    '''
+
+    return {name: i for _, names in plan.columns if len(names) > 1 for i, name in enumerate(names)}
@@ -0,0 +1,306 @@
+import os
+import sys
+import time
+import logging
+import threading
+import tracemalloc
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+# Logger of the package. The progress messages of the loaders are logged at
+# INFO level and, by default, written to the standard output like the prints
+# they replace (see `use_default_handler`).
+logger = logging.getLogger('Process_data')
+
+# Logger of the timings of every stage, at DEBUG level
+profile_logger = logging.getLogger('Process_data.profile')
+
+# Order of the stages in the summaries, the others go after them
+STAGES = ('lookup', 'cache', 'open', 'read', 'epoch', 'read_fedu', 'clean', 'resample', 'compact', 'products',
+          'accumulate', 'interpolate', 'finalize')
+
+
+############ Default output of the logger ######################################
+
+class _StdoutHandler(logging.StreamHandler):
+    # Writes to the current sys.stdout, so redirecting it (e.g. with
+    # contextlib.redirect_stdout) also redirects the messages, as with print
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+_DEFAULT_HANDLER = _StdoutHandler()
+_DEFAULT_HANDLER.setFormatter(logging.Formatter('%(message)s'))
+
+
+def use_default_handler(enabled=True):
+
+    '''
+    Write the messages of the 'Process_data' logger to the standard output,
+    without any decoration (the default), or stop doing it so they propagate
+    to the handlers configured by the application (e.g. with
+    logging.basicConfig).
+
+    Args:
+        - enabled (bool, optional): Default is True.
+    '''
+
+    if enabled:
+        if _DEFAULT_HANDLER not in logger.handlers:
+            logger.addHandler(_DEFAULT_HANDLER)
+        if logger.level == logging.NOTSET:
+            logger.setLevel(logging.INFO)
+        logger.propagate = False
+    else:
+        logger.removeHandler(_DEFAULT_HANDLER)
+        logger.propagate = True
+
+
+use_default_handler()
+
+
+############ Profile of a load #################################################
+
+def _max_rss():
+    if resource is None:
+        return None
+    # kB on Linux, bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 2**10
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*scale
+
+
+class LoadProfile:
+
+    '''
+    Time, records and bytes of every stage of a load: the lookup of the local
+    files ('lookup'), the day cache ('cache'), cdflib.CDF ('open', counting the
+    size of the files), the variable reads ('read' and 'read_fedu', counting
+    the bytes decoded), the decoding of the epochs ('epoch'), the cleaning
+    ('clean') and the accumulation of the days ('accumulate'), among others
+    (see STAGES).
+
+    Every stage is logged at DEBUG level to the 'Process_data.profile' logger
+    and passed to `callback`, if given, as a dictionary with the keys 'load',
+    'stage', 'file', 'seconds', 'records' and 'bytes'. Stages run by worker
+    processes (`workers` or `executor` of the RBSP loaders) are not recorded,
+    only those run by the calling process and its threads.
+
+    Args:
+        - callback (callable, optional): Function called with every stage, for
+          example to send it to a metrics system. Default is None.
+        - memory (bool, optional): If True, the peak of the memory allocated
+          during the load is measured with tracemalloc, which slows it down.
+          Default is False.
+    '''
+
+    def __init__(self, callback=None, memory=False):
+        self.callback = callback
+        self.memory = memory
+        self.records = []
+        self.loads = []
+        self._lock = threading.Lock()
+        self._tracing = False
+
+    def start(self, name):
+
+        '''
+        Start measuring a load named `name`.
+        '''
+
+        self._name = name
+        self._start = time.perf_counter()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+    def stop(self):
+
+        '''
+        Stop measuring the current load, adding its totals to `loads`.
+        '''
+
+        peak = None
+        if self.memory and tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1]
+            if self._tracing:
+                tracemalloc.stop()
+                self._tracing = False
+
+        self.loads.append({'load': self._name, 'seconds': time.perf_counter() - self._start,
+                           'peak_memory': peak, 'max_rss': _max_rss()})
+
+    def add(self, stage, seconds, records=0, nbytes=0, file=None):
+
+        '''
+        Record a stage (thread-safe).
+        '''
+
+        record = {'load': getattr(self, '_name', None), 'stage': stage, 'file': file, 'seconds': seconds,
+                  'records': records, 'bytes': nbytes}
+        with self._lock:
+            self.records.append(record)
+
+        if profile_logger.isEnabledFor(logging.DEBUG):
+            profile_logger.debug('%s %s %s: %.4f s, %d records, %d bytes', record['load'], stage,
+                                 os.path.basename(file) if file else '', seconds, records, nbytes)
+        if self.callback is not None:
+            self.callback(record)
+
+    def summary(self):
+
+        '''
+        Return the totals of every stage.
+
+        Returns:
+            - summary (pandas.DataFrame): Indexed by stage, with the number of
+              calls, the seconds, the share of the time of the loads (stages
+              run by several threads can add up to more than 100%), the records
+              and MB and the records and MB per second.
+        '''
+
+        columns = ['calls', 'seconds', 'share', 'records', 'MB', 'records/s', 'MB/s']
+        if not self.records:
+            return pd.DataFrame(columns=columns, index=pd.Index([], name='stage'))
+
+        records = pd.DataFrame(self.records)
+        summary = records.groupby('stage').agg(calls=('seconds', 'size'), seconds=('seconds', 'sum'),
+                                               records=('records', 'sum'), MB=('bytes', 'sum'))
+        order = [stage for stage in STAGES if stage in summary.index]
+        summary = summary.loc[order + sorted(set(summary.index) - set(order))]
+
+        total = sum(load['seconds'] for load in self.loads)
+        summary['MB'] = summary['MB']/2**20
+        summary['share'] = summary['seconds']/total if total else float('nan')
+        seconds = summary['seconds'].where(summary['seconds'] > 0)
+        summary['records/s'] = summary['records']/seconds
+        summary['MB/s'] = summary['MB']/seconds
+
+        return summary[columns]
+
+    def report(self):
+
+        '''
+        Return the summary as a text table, after a line with the time and
+        memory of every load.
+        '''
+
+        lines = []
+        for load in self.loads:
+            line = f"{load['load']}: {load['seconds']:.3f} s"
+            if load['peak_memory'] is not None:
+                line += f", peak traced memory {load['peak_memory']/2**20:.1f} MB"
+            if load['max_rss'] is not None:
+                line += f", max RSS {load['max_rss']/2**20:.1f} MB"
+            lines.append(line)
+
+        summary = self.summary()
+        formatters = {'share': '{:.1%}'.format, 'seconds': '{:.4f}'.format, 'MB': '{:.2f}'.format,
+                      'records/s': '{:.0f}'.format, 'MB/s': '{:.1f}'.format}
+        lines.append(summary.to_string(formatters=formatters))
+
+        return '\n'.join(lines)
+
+
+############ Stages of the active load #########################################
+
+# Profiles of the loads being run, the last one receives the stages
+_ACTIVE = []
+_ACTIVE_LOCK = threading.Lock()
+
+
+class track_load:
+
+    '''
+    Context manager used by the loaders to profile a load: the stages timed
+    with `timed` while it is active (in any thread) are added to its profile.
+
+    Args:
+        - name (str): Name of the load (e.g. 'OMNI 1MIN HRO2').
+        - profile (optional): The `profile` argument of the loaders: None (the
+          stages are only logged), True (the summary is also logged at INFO
+          level at the end of the load), a callable (called with every stage,
+          see LoadProfile) or a LoadProfile (filled with the stages, so its
+          summary can be read afterwards).
+    '''
+
+    def __init__(self, name, profile=None):
+        self.name = name
+        self.log_summary = profile is True
+        if isinstance(profile, LoadProfile):
+            self.profile = profile
+        else:
+            self.profile = LoadProfile(callback=profile if callable(profile) else None)
+
+    def __enter__(self):
+        self.profile.start(self.name)
+        with _ACTIVE_LOCK:
+            _ACTIVE.append(self.profile)
+        return self.profile
+
+    def __exit__(self, *exc_info):
+        with _ACTIVE_LOCK:
+            _ACTIVE.remove(self.profile)
+        self.profile.stop()
+        if self.log_summary and exc_info[0] is None:
+            logger.info(self.profile.report())
+
+
+def current_profile():
+
+    '''
+    Return the profile of the load being run, or None.
+    '''
+
+    return _ACTIVE[-1] if _ACTIVE else None
+
+
+class timed:
+
+    '''
+    Context manager timing a stage of the current load (nothing is recorded
+    if no load is active). The records and bytes processed are counted with
+    `add`:
+
+        with timed('read', cdf_path) as stage:
+            values = read_records(cdf, var, rec_range)
+            stage.add(len(values), values.nbytes)
+    '''
+
+    __slots__ = ('profile', 'stage', 'file', 'records', 'nbytes', 'start')
+
+    def __init__(self, stage, file=None):
+        self.profile = current_profile()
+        self.stage = stage
+        self.file = file
+        self.records = 0
+        self.nbytes = 0
+
+    def add(self, records=0, nbytes=0):
+        self.records += records
+        self.nbytes += nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profile is not None:
+            self.profile.add(self.stage, time.perf_counter() - self.start, self.records, self.nbytes, self.file)
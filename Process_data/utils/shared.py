@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+# Alignment of every array inside a block, in bytes
+ALIGN = 64
+
+
+############ Shared memory allocated by the parent process #####################
+
+class _Block:
+    # Exposes part of a SharedMemory to numpy. It is the base of the arrays
+    # built on it, so the memory stays mapped while any of them exists
+    def __init__(self, shm, address, shape, dtype):
+        self.shm = shm
+        self.__array_interface__ = {'version': 3, 'shape': shape, 'typestr': dtype.str, 'data': (address, False)}
+
+
+def frame_schema(df, arrays=None):
+
+    '''
+    Return the schema of the rows of a DataFrame and of extra arrays (e.g.
+    FEDU), to allocate SharedArrays for more data like them, or None if some
+    column is not a plain NumPy dtype (e.g. a pandas extension type).
+
+    Args:
+        - df (pandas.DataFrame): One record per row.
+        - arrays (dict, optional): Arrays whose rows match `df`, by name.
+          Default is None.
+
+    Returns:
+        - dict or None: (dtype, row shape) of every column and array, by name.
+    '''
+
+    schema = {}
+    for col in df.columns:
+        if not isinstance(df[col].dtype, np.dtype) or df[col].dtype.kind == 'O':
+            return None
+        schema[col] = (df[col].dtype, ())
+    for name, values in (arrays or {}).items():
+        if name in schema or values.dtype.kind == 'O':
+            return None
+        schema[name] = (values.dtype, values.shape[1:])
+
+    return schema
+
+
+class SharedArrays:
+
+    '''
+    Arrays with the same number of rows in a single block of shared memory
+    allocated by this process, so that worker processes can write their
+    results straight into them (see `write_shared`) instead of sending them
+    back pickled. `arrays` holds zero-copy views of the block, which stays
+    mapped while any of them (or of their views) exists, even after `unlink`.
+
+    The block must be unlinked once the workers are done with it. On Python
+    versions before 3.13 the processes of an existing executor should be
+    started after the first block is created (as those created for `workers`
+    are), otherwise they warn about the blocks when they exit.
+
+    Args:
+        - schema (dict): (dtype, row shape) of every array, by name (see
+          `frame_schema`).
+        - rows (int): Number of rows of every array.
+    '''
+
+    def __init__(self, schema, rows):
+        layout = {}
+        size = 0
+        for name, (dtype, shape) in schema.items():
+            dtype = np.dtype(dtype)
+            offset = -(-size//ALIGN)*ALIGN
+            layout[name] = (dtype, tuple(shape), offset)
+            size = offset + rows*int(np.prod(shape, dtype=np.int64))*dtype.itemsize
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.spec = {'name': self.shm.name, 'rows': rows, 'layout': layout}
+        self._unlinked = False
+
+        base = np.frombuffer(self.shm.buf, dtype=np.uint8)
+        address = base.ctypes.data
+        # Release the export of shm.buf, so the block can be closed later
+        del base
+
+        self.arrays = {name: np.asarray(_Block(self.shm, address + offset, (rows,) + shape, dtype))
+                       for name, (dtype, shape, offset) in layout.items()}
+
+    def frame(self, columns, start, stop):
+
+        '''
+        Return rows [start, stop) of `columns` as a DataFrame of views, without
+        copying them.
+        '''
+
+        return pd.DataFrame({col: self.arrays[col][start:stop] for col in columns}, copy=False)
+
+    def unlink(self):
+
+        '''
+        Remove the name of the block, once no process needs to attach to it.
+        It is freed when the last array using it is.
+        '''
+
+        if not self._unlinked:
+            self._unlinked = True
+            self.shm.unlink()
+
+
+############ Writing from worker processes #####################################
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13, the resource tracker shared with the parent
+        # keeps a single registration of the block, removed by its unlink
+        return shared_memory.SharedMemory(name=name)
+
+
+def write_shared(spec, start, capacity, arrays):
+
+    '''
+    Copy `arrays` into rows [start, start + capacity) of the SharedArrays
+    described by `spec` (its `spec` attribute), from any process.
+
+    Args:
+        - spec (dict): The `spec` of the SharedArrays.
+        - start (int): First row to write.
+        - capacity (int): Rows reserved for this call.
+        - arrays (dict): Arrays with the same number of rows, by name. Their
+          names, dtypes and row shapes must match the schema of the block.
+
+    Returns:
+        - bool: True if they were written, False if they do not fit (more
+          rows than `capacity`, or another schema), so they must be sent
+          another way.
+    '''
+
+    layout = spec['layout']
+    n = len(next(iter(arrays.values()))) if arrays else 0
+    if n > capacity or start + capacity > spec['rows'] or set(arrays) != set(layout):
+        return False
+    for name, values in arrays.items():
+        dtype, shape, _ = layout[name]
+        if values.dtype != dtype or values.shape != (n,) + shape:
+            return False
+
+    shm = _attach(spec['name'])
+    try:
+        for name, values in arrays.items():
+            dtype, shape, offset = layout[name]
+            row_size = int(np.prod(shape, dtype=np.int64))*dtype.itemsize
+            target = np.ndarray((n,) + shape, dtype=dtype, buffer=shm.buf, offset=offset + start*row_size)
+            target[...] = values
+            del target
+    finally:
+        shm.close()
+
+    return True
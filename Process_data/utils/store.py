@@ -0,0 +1,347 @@
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from Process_data.utils.cache import encode_metadata, decode_metadata
+from Process_data.utils.metadata import dataset_version
+from Process_data.utils.window import resolve_time_range
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+# Bump when the layout of the store changes
+STORE_VERSION = 1
+
+MANIFEST = 'manifest.json'
+
+
+def _json_options(options):
+    # As written to (and read back from) the manifest, so they can be compared
+    return json.loads(json.dumps(options, default=str))
+
+
+def source_info(cdf_path):
+
+    '''
+    Identify the version of a source file held by a partition: its name, data
+    version (from the name) and modification time and size, so a new version
+    or a re-downloaded file is processed again.
+    '''
+
+    stat = os.stat(cdf_path)
+
+    return {'source': os.path.basename(cdf_path), 'version': dataset_version(cdf_path)[1],
+            'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+############ Incremental store of cleaned files ################################
+
+class PartitionedStore:
+
+    '''
+    On-disk store of the cleaned data of a load, with one partition per source
+    file (a day for RBSP, a month for OMNI), so a daily run only processes the
+    files that are new or changed since the previous one. The layout is:
+
+        <store_dir>/manifest.json               sources and rows of every partition
+        <store_dir>/scalars/date=<label>/part-0.parquet   scalar DataFrame
+        <store_dir>/<array>/<label>.npy         extra arrays (e.g. FEDU), by row
+        <store_dir>/metadata/<label>.json       metadata of the partition
+
+    The scalar partitions form a Hive-partitioned Parquet dataset that other
+    tools can read directly (pickles are written instead if no Parquet engine
+    is installed, as in `Process_data.utils.cache.DayCache`).
+
+    Args:
+        - store_dir (str): Directory of the store. It is created if it does
+          not exist.
+        - options (dict, optional): The load options the data depends on
+          (variables, valid_range, ...). They are recorded when the store is
+          created and must match when it is updated. Default is None.
+
+    Raises:
+        - ValueError: If the store was created with other options or layout.
+    '''
+
+    def __init__(self, store_dir, options=None):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+
+        manifest_path = os.path.join(store_dir, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as fp:
+                self.manifest = json.load(fp)
+            if self.manifest.get('store_version') != STORE_VERSION:
+                raise ValueError(f'The store in {store_dir} has an old layout, remove it or use another directory')
+            if options is not None and self.manifest['options'] != _json_options(options):
+                raise ValueError(f"The store in {store_dir} was created with other options "
+                                 f"({self.manifest['options']}), use another directory")
+        else:
+            self.manifest = {'store_version': STORE_VERSION, 'options': _json_options(options or {}),
+                             'partitions': {}}
+
+    @property
+    def partitions(self):
+        return self.manifest['partitions']
+
+    def is_current(self, label, cdf_path):
+
+        '''
+        Return True if partition `label` holds the current version of
+        `cdf_path` (same name, modification time and size).
+        '''
+
+        partition = self.partitions.get(label)
+        if partition is None:
+            return False
+
+        return all(partition[key] == value for key, value in source_info(cdf_path).items())
+
+    def _path(self, *parts):
+        return os.path.join(self.store_dir, *parts)
+
+    def write(self, label, cdf_path, df, metadata, arrays=None, time_column='epoch'):
+
+        '''
+        Write (or replace) partition `label` with the cleaned data of
+        `cdf_path`. Every file is first written to a temporary directory and
+        then moved into place with `os.replace`, so a failed write leaves
+        neither partial files nor temporary ones, and a partition being
+        replaced is never missing. The files are written before the partition
+        is added to the manifest, which is saved by `save`.
+
+        Args:
+            - label (str): The partition, e.g. the date of the file ('2014-01-01').
+            - cdf_path (str): The source file.
+            - df (pandas.DataFrame): The cleaned scalar data, with its epochs
+              in `time_column`.
+            - metadata: The metadata of the partition (see
+              `Process_data.utils.cache.encode_metadata`).
+            - arrays (dict, optional): Arrays whose rows match `df` (e.g.
+              {'fedu': fedu}). Default is None.
+            - time_column (str, optional): The epoch column. Default is 'epoch'.
+        '''
+
+        arrays = arrays or {}
+
+        frame_dir = self._path('scalars', f'date={label}')
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=self.store_dir)
+        try:
+            try:
+                frame = 'part-0.parquet'
+                df.to_parquet(os.path.join(tmp_dir, frame), index=False)
+            except ImportError:
+                frame = 'part-0.pkl'
+                df.to_pickle(os.path.join(tmp_dir, frame))
+
+            for name, values in arrays.items():
+                np.save(os.path.join(tmp_dir, name + '.npy'), np.asarray(values))
+
+            with open(os.path.join(tmp_dir, 'metadata.json'), 'w') as fp:
+                json.dump(encode_metadata(metadata), fp)
+
+            # Everything was written, move it into place file by file
+            os.makedirs(frame_dir, exist_ok=True)
+            os.replace(os.path.join(tmp_dir, frame), os.path.join(frame_dir, frame))
+            for old in os.listdir(frame_dir):
+                # A frame written in the other format by a previous run
+                if old != frame:
+                    os.remove(os.path.join(frame_dir, old))
+
+            for name in arrays:
+                os.makedirs(self._path(name), exist_ok=True)
+                os.replace(os.path.join(tmp_dir, name + '.npy'), self._path(name, label + '.npy'))
+
+            os.makedirs(self._path('metadata'), exist_ok=True)
+            os.replace(os.path.join(tmp_dir, 'metadata.json'), self._path('metadata', label + '.json'))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        epochs = df[time_column].to_numpy('datetime64[ns]')
+        self.partitions[label] = dict(source_info(cdf_path), rows=len(df), frame=frame, arrays=list(arrays),
+                                      start=str(epochs[0]) if len(epochs) else None,
+                                      stop=str(epochs[-1]) if len(epochs) else None)
+
+    def save(self):
+
+        '''
+        Write the manifest, atomically.
+        '''
+
+        self.manifest['partitions'] = dict(sorted(self.partitions.items()))
+        fd, tmp_path = tempfile.mkstemp(prefix='.manifest-', dir=self.store_dir)
+        with os.fdopen(fd, 'w') as fp:
+            json.dump(self.manifest, fp, indent=1)
+        os.replace(tmp_path, self._path(MANIFEST))
+
+
+############ Lazy reading of a store ###########################################
+
+class StoreDataset:
+
+    '''
+    Read-only view of a PartitionedStore, restricted to a time window.
+    Opening it or slicing it (`dataset[start:end]`, with the same meaning as
+    `start_date` and `end_date` of the loaders) only reads the manifest; the
+    data of the partitions overlapping the window is read by `to_frame`,
+    `array` and `iter_partitions`, the arrays from memory maps.
+
+    Args:
+        - store_dir (str): Directory of the store.
+        - time_range (tuple, optional): (start, end) window, end exclusive.
+          Default is None (everything).
+        - time_column (str, optional): The epoch column. Default is 'epoch'.
+    '''
+
+    def __init__(self, store_dir, time_range=None, time_column='epoch'):
+        self.store_dir = store_dir
+        self.time_range = time_range
+        self.time_column = time_column
+        with open(os.path.join(store_dir, MANIFEST)) as fp:
+            self.manifest = json.load(fp)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step is not None:
+            raise TypeError('Slice a StoreDataset by time, e.g. dataset["2014-01-01":"2014-01-31"]')
+
+        start, end = self.time_range or (pd.Timestamp.min, pd.Timestamp.max)
+        if key.start is not None:
+            start = max(start, pd.Timestamp(key.start))
+        if key.stop is not None:
+            end = min(end, resolve_time_range(key.stop, key.stop)[1])
+
+        return StoreDataset(self.store_dir, (start, end), self.time_column)
+
+    @property
+    def options(self):
+        return self.manifest['options']
+
+    @property
+    def labels(self):
+
+        '''
+        The partitions with data inside the window.
+        '''
+
+        labels = [label for label, partition in self.manifest['partitions'].items() if partition['rows']]
+        if self.time_range is None:
+            return labels
+
+        start, end = self.time_range
+        return [label for label in labels
+                if pd.Timestamp(self.manifest['partitions'][label]['start']) < end
+                and pd.Timestamp(self.manifest['partitions'][label]['stop']) >= start]
+
+    def __len__(self):
+        return sum(self.manifest['partitions'][label]['rows'] for label in self.labels)
+
+    def _rows(self, epochs):
+        # Rows of a partition inside the window (the epochs are sorted)
+        if self.time_range is None:
+            return slice(None)
+        start, end = (np.datetime64(t.to_datetime64(), 'ns') for t in self.time_range)
+        return slice(np.searchsorted(epochs, start), np.searchsorted(epochs, end))
+
+    def _read_frame(self, label, columns=None):
+        partition = self.manifest['partitions'][label]
+        path = os.path.join(self.store_dir, 'scalars', f'date={label}', partition['frame'])
+        if columns is not None and self.time_column not in columns:
+            columns = [self.time_column] + list(columns)
+        if partition['frame'].endswith('.parquet'):
+            return pd.read_parquet(path, columns=columns)
+        df = pd.read_pickle(path)
+        return df if columns is None else df[columns]
+
+    def iter_partitions(self, columns=None, arrays=None):
+
+        '''
+        Iterate over the partitions inside the window, one at a time.
+
+        Args:
+            - columns (list, optional): Scalar columns to read (the epochs are
+              always read). Default is None (all).
+            - arrays (list, optional): Arrays to read. Default is None (all).
+
+        Returns:
+            - generator: For each partition, a tuple (label, df, arrays), with
+              only the rows inside the window.
+        '''
+
+        for label in self.labels:
+            partition = self.manifest['partitions'][label]
+            df = self._read_frame(label, columns)
+            rows = self._rows(df[self.time_column].to_numpy('datetime64[ns]'))
+            values = {name: np.load(os.path.join(self.store_dir, name, label + '.npy'), mmap_mode='r')[rows]
+                      for name in partition['arrays'] if arrays is None or name in arrays}
+            yield label, df.iloc[rows].reset_index(drop=True), values
+
+    def to_frame(self, columns=None):
+
+        '''
+        Return the scalar data inside the window as a single DataFrame.
+        '''
+
+        frames = [df for _, df, _ in self.iter_partitions(columns, arrays=[])]
+        if not frames:
+            return pd.DataFrame()
+
+        return pd.concat(frames, ignore_index=True)
+
+    def array(self, name):
+
+        '''
+        Return the rows of array `name` (e.g. 'fedu') inside the window, which
+        match those of `to_frame`.
+        '''
+
+        chunks = []
+        for label in self.labels:
+            values = np.load(os.path.join(self.store_dir, name, label + '.npy'), mmap_mode='r')
+            if self.time_range is not None:
+                df = self._read_frame(label, [self.time_column])
+                values = values[self._rows(df[self.time_column].to_numpy('datetime64[ns]'))]
+            chunks.append(values)
+
+        return np.concatenate(chunks) if chunks else np.empty(0)
+
+    def metadata(self, label=None):
+
+        '''
+        Return the metadata of a partition. Default is the last one inside
+        the window.
+        '''
+
+        if label is None:
+            labels = self.labels
+            if not labels:
+                return None
+            label = labels[-1]
+
+        with open(os.path.join(self.store_dir, 'metadata', label + '.json')) as fp:
+            return decode_metadata(json.load(fp))
+
+
+def open_store(store_dir, start_date=None, end_date=None):
+
+    '''
+    Open a store written by `update_store_ECT` or `update_store_OMNI` as a
+    StoreDataset, restricted to [start_date, end_date] if given (see
+    `Process_data.utils.window.resolve_time_range`). Nothing is read besides
+    the manifest.
+
+    Raises:
+        - FileNotFoundError: If there is no store in `store_dir`.
+    '''
+
+    dataset = StoreDataset(store_dir)
+    if start_date is not None or end_date is not None:
+        dataset = dataset[start_date:end_date]
+
+    return dataset
@@ -0,0 +1,142 @@
+import cdflib
+import numpy as np
+import pandas as pd
+from Process_data.utils.epoch import decode_epoch
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+############ Functions to restrict the loaders to a time window ################
+
+def resolve_time_range(start_date, end_date):
+
+    '''
+    Convert the `start_date`/`end_date` arguments of the loaders into a
+    half-open time window [start, end). Both can be dates or full datetimes.
+    An `end_date` without a time of day (midnight) includes that whole day, as
+    the loaders always did with dates.
+
+    Args:
+        - start_date (datetime.date, datetime.datetime, str or pandas.Timestamp):
+          The start of the range (inclusive).
+        - end_date (datetime.date, datetime.datetime, str or pandas.Timestamp):
+          The end of the range (inclusive, see above).
+
+    Returns:
+        - tuple: (start, end) as pandas.Timestamp, with `end` exclusive.
+    '''
+
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    if end == end.normalize():
+        end = end + pd.Timedelta(days=1)
+
+    return start, end
+
+
+def clip_time_range(time_range, file_start, file_end):
+
+    '''
+    Restrict `time_range` to the period covered by a file.
+
+    Args:
+        - time_range (tuple): The (start, end) window of the load.
+        - file_start (pandas.Timestamp): Start of the period covered by the file.
+        - file_end (pandas.Timestamp): End (exclusive) of the period covered by
+          the file.
+
+    Returns:
+        - tuple or None: The (start, end) window to read from the file, or None
+          if the window covers the whole file.
+    '''
+
+    start, end = time_range
+    if start <= file_start and end >= file_end:
+        return None
+
+    return max(start, file_start), min(end, file_end)
+
+
+def find_record_range(cdf, time_range, epoch_var='Epoch'):
+
+    '''
+    Find the records of a CDF file inside a time window by binary search on its
+    (sorted) time variable. Only the time variable is decoded.
+
+    Args:
+        - cdf (cdflib.CDF): The open CDF file.
+        - time_range (tuple or None): The (start, end) window, end exclusive.
+        - epoch_var (str, optional): The time variable. Default is 'Epoch'.
+
+    Returns:
+        - tuple or None: (first, stop) record indices (stop exclusive), or None
+          if `time_range` is None (all the records).
+    '''
+
+    if time_range is None:
+        return None
+
+    times = decode_epoch(cdf[epoch_var])
+    start, end = np.datetime64(time_range[0], 'ns'), np.datetime64(time_range[1], 'ns')
+
+    first = int(np.searchsorted(times, start, side='left'))
+    stop = int(np.searchsorted(times, end, side='left'))
+
+    return first, max(first, stop)
+
+
+def read_records(cdf, var, rec_range=None):
+
+    '''
+    Read a variable from a CDF file, decoding only the records in `rec_range`
+    (with cdflib's startrec/endrec) when the variable is record varying.
+
+    Args:
+        - cdf (cdflib.CDF): The open CDF file.
+        - var (str): The variable to read.
+        - rec_range (tuple, optional): (first, stop) record indices, stop
+          exclusive, as returned by `find_record_range`. Default is None (all
+          the records).
+
+    Returns:
+        - numpy.ndarray: The values of the variable.
+    '''
+
+    if rec_range is None or not cdf.varinq(var).Rec_Vary:
+        return cdf[var]
+
+    first, stop = rec_range
+    if stop <= first:
+        # Keep dtype and dimensions for an empty selection
+        return cdf.varget(var, startrec=0, endrec=0)[:0]
+
+    return cdf.varget(var, startrec=first, endrec=stop - 1)
+
+
+def count_records_in_range(cdf_path, time_range, var='Epoch'):
+
+    '''
+    Return the number of records of `var` inside a time window of a CDF file.
+    Without a window only the variable descriptor is read.
+
+    Args:
+        - cdf_path (str): The path to the CDF file.
+        - time_range (tuple or None): The (start, end) window, end exclusive.
+        - var (str, optional): A record varying variable depending on 'Epoch'.
+          Default is 'Epoch'.
+
+    Returns:
+        - n (int): The number of records.
+    '''
+
+    cdf = cdflib.CDF(cdf_path)
+    if time_range is None:
+        return cdf.varinq(var).Last_Rec + 1
+
+    first, stop = find_record_range(cdf, time_range)
+    return stop - first
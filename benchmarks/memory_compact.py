@@ -0,0 +1,111 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+
+Memory used by the loaders with and without compact=True.
+
+Every configuration is loaded in a fresh Python process, so the peak resident
+memory of one does not hide the other. Usage:
+
+    python benchmarks/memory_compact.py <local_root_dir> 2014-01-01 2014-01-31 --loader emfisis
+"""
+
+
+# Arguments of every loader besides the dates, the root directory and compact
+LOADERS = {
+    'ect': ('Process_data.rbsp', 'load_CDFfiles_ECT',
+            [['Epoch', 'Position', 'L'], {'Epoch': 'epoch', 'Position': 'pos', 'L': 'L'}, 'a', 'rept']),
+    'emfisis': ('Process_data.rbsp', 'load_CDFfiles_EMFISIS',
+                [['Epoch', 'Mag', 'coordinates'], {'Epoch': 'epoch', 'Mag': 'Mag', 'coordinates': 'coord'}, 'a']),
+    'omni': ('Process_data.omni', 'load_CDFfiles_OMNI',
+             [['Epoch', 'flow_speed', 'BZ_GSM', 'SYM_H'], {'Epoch': 'epoch', 'flow_speed': 'V', 'BZ_GSM': 'Bz', 'SYM_H': 'SYM_H'},
+              '1min', 'hro2'])}
+
+
+def result_nbytes(result):
+
+    '''
+    Total size in bytes of the DataFrames and arrays returned by a loader.
+    '''
+
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(deep=True, index=True).sum())
+    if isinstance(result, np.ndarray):
+        return int(result.nbytes)
+    if isinstance(result, dict):
+        return sum(result_nbytes(value) for value in result.values())
+    if isinstance(result, (list, tuple)):
+        return sum(result_nbytes(value) for value in result)
+    return 0
+
+
+def measure(loader, local_root_dir, start_date, end_date, compact):
+
+    '''
+    Load the data once, in this process, and return the elapsed time, the
+    peak of the memory allocated while loading (tracemalloc, which includes
+    the NumPy buffers), the peak resident memory of the process and the size
+    of the result.
+    '''
+
+    module, name, args = LOADERS[loader]
+    load = getattr(__import__(module, fromlist=[name]), name)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load(pd.Timestamp(start_date), pd.Timestamp(end_date), local_root_dir, *args, compact=compact)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # ru_maxrss is in kB on Linux
+    return {'loader': loader, 'compact': compact, 'seconds': elapsed, 'peak_traced_mb': peak/2**20,
+            'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/2**10,
+            'result_mb': result_nbytes(result)/2**20}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory used by the loaders with and without compact=True')
+    parser.add_argument('local_root_dir')
+    parser.add_argument('start_date')
+    parser.add_argument('end_date')
+    parser.add_argument('--loader', choices=sorted(LOADERS), default='emfisis')
+    parser.add_argument('--output', help='JSON file where the results are written')
+    parser.add_argument('--child', choices=['0', '1'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        # One measurement, run by the parent in a fresh process
+        print(json.dumps(measure(args.loader, args.local_root_dir, args.start_date, args.end_date, args.child == '1')))
+        return
+
+    results = []
+    for compact in (False, True):
+        command = [sys.executable, __file__, args.local_root_dir, args.start_date, args.end_date,
+                   '--loader', args.loader, '--child', str(int(compact))]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'compact':>8} {'seconds':>8} {'peak traced MB':>15} {'max RSS MB':>11} {'result MB':>10}")
+    for r in results:
+        print(f"{str(r['compact']):>8} {r['seconds']:8.2f} {r['peak_traced_mb']:15.1f} {r['max_rss_mb']:11.1f} {r['result_mb']:10.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=2)
+
+
+if __name__ == '__main__':
+    main()
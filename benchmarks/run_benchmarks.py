@@ -0,0 +1,330 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import cdflib
+from synthetic import generate_archive
+from Process_data.omni import process_omni as omni
+from Process_data.rbsp import process_ect as ect
+from Process_data.rbsp import process_emfisis as emf
+from Process_data.utils.metadata import MetadataCache
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+
+Benchmarks of the OMNI, ECT and EMFISIS readers, cleaning and loaders on a
+synthetic archive (see synthetic.py), so the speed and memory of a change can
+be measured without the real archives. Usage:
+
+    python benchmarks/run_benchmarks.py --days 7 --output results.json
+    python benchmarks/run_benchmarks.py --days 7 --compare results.json
+
+For every loader three stages are measured: 'read' (read_CDFfile_* of every
+file), 'clean' (clean_CDFfile_* of what was read) and 'load' (the whole
+load_CDFfiles_* call). For ECT, the transfer of the days from `--workers`
+worker processes is also measured with iter_CDFfiles_ECT, pickled ('pickle')
+and through shared memory ('shared'). Every stage is timed `--repeat` times,
+keeping the best time, and run once more under tracemalloc for its peak memory
+(of the calling process, the shared memory is not traced).
+"""
+
+
+# Variables read by the benchmarks
+VARIABLES = {
+    'ect': (['Epoch', 'Position', 'L', 'MLT'], {'Epoch': 'epoch', 'Position': 'pos', 'L': 'L', 'MLT': 'MLT'}),
+    'emfisis': (['Epoch', 'Mag', 'coordinates'], {'Epoch': 'epoch', 'Mag': 'Mag', 'coordinates': 'coord'}),
+    'omni': (['Epoch', 'flow_speed', 'proton_density', 'Pressure', 'BZ_GSM', 'AE_INDEX', 'SYM_H'],
+             {'Epoch': 'epoch', 'flow_speed': 'V', 'proton_density': 'n', 'Pressure': 'P', 'BZ_GSM': 'Bz',
+              'AE_INDEX': 'AE', 'SYM_H': 'SYM_H'})}
+
+
+############ Stages of every loader #############################################
+
+def read_stage(loader, paths):
+
+    '''
+    Return a function reading every file with the reader of `loader`, with
+    an empty metadata cache, and returning the outputs and number of records.
+    '''
+
+    relevant_var, rename_mapping = VARIABLES[loader]
+
+    def run():
+        metadata_cache = MetadataCache()
+        outputs = []
+        for path in paths:
+            if loader == 'ect':
+                outputs.append(ect.read_CDFfile_ECT(path, 'fedu', relevant_var, rename_mapping,
+                                                    metadata_cache=metadata_cache))
+            elif loader == 'emfisis':
+                outputs.append(emf.read_CDFfile_EMFISIS(path, relevant_var, rename_mapping,
+                                                        metadata_cache=metadata_cache))
+            else:
+                outputs.append(omni.read_CDFfile_OMNI(path, relevant_var, rename_mapping,
+                                                      metadata_cache=metadata_cache))
+        return outputs, sum(len(output[0][0] if loader == 'ect' else output[0]) for output in outputs)
+
+    return run
+
+
+def clean_stage(loader, outputs):
+
+    '''
+    Return a function cleaning copies of the outputs of `read_stage`.
+    '''
+
+    def run():
+        n_records = 0
+        for output in outputs:
+            if loader == 'ect':
+                (df, metadata), (fedu, fedu_metadata) = output
+                df_clean, _ = ect.clean_CDFfile_ECT(df, metadata, fedu, fedu_metadata)
+            elif loader == 'emfisis':
+                df_clean = emf.clean_CDFfile_EMFISIS(output[0].copy())
+            else:
+                df_clean = omni.clean_CDFfile_OMNI(output[0], output[1])
+            n_records += len(df_clean)
+        return None, n_records
+
+    return run
+
+
+def load_stage(loader, local_root_dir, start_date, end_date, probe, options):
+
+    '''
+    Return a function running the loader of `loader` on the whole range.
+    '''
+
+    relevant_var, rename_mapping = VARIABLES[loader]
+
+    def run():
+        if loader == 'ect':
+            output = ect.load_CDFfiles_ECT(start_date, end_date, local_root_dir, relevant_var, rename_mapping, probe,
+                                           'rept', **options)
+            n_records = sum(len(probe_output[0]) for probe_output in output)
+        elif loader == 'emfisis':
+            output = emf.load_CDFfiles_EMFISIS(start_date, end_date, local_root_dir, relevant_var, rename_mapping,
+                                               probe, **options)
+            n_records = sum(len(probe_output[0]) for probe_output in output)
+        else:
+            output = omni.load_CDFfiles_OMNI(start_date, end_date, local_root_dir, relevant_var, rename_mapping,
+                                             '1min', 'hro2', **options)
+            n_records = len(output[0])
+        return None, n_records
+
+    return run
+
+
+def transport_stage(local_root_dir, start_date, end_date, probe, workers, shared_memory):
+
+    '''
+    Return a function iterating over the ECT days processed by `workers`
+    worker processes, with or without `shared_memory`. The days are only
+    counted, not accumulated.
+    '''
+
+    relevant_var, rename_mapping = VARIABLES['ect']
+    probes = ('a', 'b') if probe == 'both' else (probe,)
+
+    def run():
+        n_records = 0
+        for p in probes:
+            for _, ect_df_clean, _, fedu_data_clean, _ in ect.iter_CDFfiles_ECT(start_date, end_date, local_root_dir,
+                                                                               relevant_var, rename_mapping, p, 'rept',
+                                                                               workers=workers,
+                                                                               shared_memory=shared_memory):
+                n_records += len(ect_df_clean)
+        return None, n_records
+
+    return run
+
+
+def measure(stage, repeat):
+
+    '''
+    Run `stage` `repeat` times and once more under tracemalloc. The output
+    of the loaders is silenced.
+
+    Returns:
+        - tuple: (best time in seconds, number of records, peak memory in bytes).
+    '''
+
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            _, n_records = stage()
+            times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        stage()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return min(times), n_records, peak
+
+
+############ Results ############################################################
+
+def environment():
+
+    '''
+    Versions and machine of a run, stored with the results.
+    '''
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+
+    return {'date': datetime.datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+            'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'cdflib': cdflib.__version__, 'machine': platform.machine(), 'processor': platform.processor(),
+            'cpus': os.cpu_count()}
+
+
+def run_benchmarks(local_root_dir, start_date, days, loaders, probe='a', repeat=3, options=None, workers=2):
+
+    '''
+    Generate the synthetic archive (files already present are reused) and
+    measure every stage of every loader.
+
+    Args:
+        - local_root_dir (str): The root directory of the synthetic archive.
+        - start_date (datetime.date): The first day of the range.
+        - days (int): The number of days of the range.
+        - loaders (list): Among 'ect', 'emfisis' and 'omni'.
+        - probe (str, optional): The probe of the RBSP loaders. Default is 'a'.
+        - repeat (int, optional): Number of timed runs. Default is 3.
+        - options (dict, optional): Extra keyword arguments of the loaders, per
+          loader (e.g. {'ect': {'workers': 4}}). Default is None.
+        - workers (int, optional): Worker processes of the ECT 'pickle' and
+          'shared' stages. Default is 2.
+
+    Returns:
+        - list: One dictionary per loader and stage.
+    '''
+
+    options = options or {}
+    end_date = start_date + datetime.timedelta(days=days - 1)
+    probes = ('a', 'b') if probe == 'both' else (probe,)
+    paths = generate_archive(local_root_dir, start_date, end_date, probes)
+
+    results = []
+    for loader in loaders:
+        files = paths[loader]
+        file_bytes = sum(os.path.getsize(path) for path in files)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            outputs, _ = read_stage(loader, files)()
+        stages = {'read': read_stage(loader, files),
+                  'clean': clean_stage(loader, outputs),
+                  'load': load_stage(loader, local_root_dir, start_date, end_date, probe, options.get(loader, {}))}
+        if loader == 'ect':
+            for stage, shared_memory in (('pickle', False), ('shared', True)):
+                stages[stage] = transport_stage(local_root_dir, start_date, end_date, probe, workers, shared_memory)
+        del outputs
+
+        for stage, function in stages.items():
+            seconds, n_records, peak = measure(function, repeat)
+            results.append({'loader': loader, 'stage': stage, 'files': len(files), 'records': n_records,
+                            'file_mb': file_bytes/2**20, 'seconds': seconds,
+                            'records_per_s': n_records/seconds, 'mb_per_s': file_bytes/2**20/seconds,
+                            'peak_mb': peak/2**20})
+            print(f"{loader:>8} {stage:>6} {seconds:8.3f} s {n_records/seconds:12.0f} rec/s "
+                  f"{file_bytes/2**20/seconds:8.1f} MB/s {peak/2**20:8.1f} MB peak")
+
+    return results
+
+
+def compare(results, baseline, threshold):
+
+    '''
+    Print the time and peak memory of `results` relative to a baseline run,
+    marking the stages more than `threshold` (e.g. 0.1 for 10%) slower or
+    larger.
+
+    Returns:
+        - list: The (loader, stage, metric) of the regressions.
+    '''
+
+    reference = {(r['loader'], r['stage']): r for r in baseline['results']}
+    regressions = []
+
+    print(f"\n{'loader':>8} {'stage':>6} {'time':>8} {'peak':>8}   (relative to {baseline['environment']['commit'] or 'baseline'})")
+    for r in results:
+        ref = reference.get((r['loader'], r['stage']))
+        if ref is None:
+            continue
+        # Per record, in case the baseline was run on another date span
+        time_ratio = (r['seconds']/r['records'])/(ref['seconds']/ref['records'])
+        peak_ratio = r['peak_mb']/ref['peak_mb']
+        marks = []
+        if time_ratio > 1 + threshold:
+            marks.append('SLOWER')
+            regressions.append((r['loader'], r['stage'], 'seconds'))
+        if peak_ratio > 1 + threshold:
+            marks.append('MORE MEMORY')
+            regressions.append((r['loader'], r['stage'], 'peak_mb'))
+        print(f"{r['loader']:>8} {r['stage']:>6} {time_ratio:8.2f} {peak_ratio:8.2f}   {' '.join(marks)}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the Process_data loaders on synthetic CDF files')
+    parser.add_argument('--root', help='Directory of the synthetic archive (reused between runs). '
+                                       'Default is a temporary directory.')
+    parser.add_argument('--start', default='2014-01-01', help='First day. Default is 2014-01-01.')
+    parser.add_argument('--days', type=int, default=3, help='Number of days. Default is 3.')
+    parser.add_argument('--loaders', nargs='+', choices=sorted(VARIABLES), default=sorted(VARIABLES))
+    parser.add_argument('--probe', choices=['a', 'b', 'both'], default='a')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs of every stage. Default is 3.')
+    parser.add_argument('--options', type=json.loads, default=None,
+                        help='JSON with extra arguments of the loaders, e.g. \'{"ect": {"prefetch": 2}}\'')
+    parser.add_argument('--workers', type=int, default=2,
+                        help='Worker processes of the ECT pickle and shared stages. Default is 2.')
+    parser.add_argument('--output', help='JSON file where the results are written')
+    parser.add_argument('--compare', help='JSON file of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Relative slowdown reported as a regression. Default is 0.1.')
+    args = parser.parse_args()
+
+    start_date = datetime.date.fromisoformat(args.start)
+    with contextlib.ExitStack() as stack:
+        local_root_dir = args.root or stack.enter_context(tempfile.TemporaryDirectory(prefix='process_data_bench_'))
+        results = run_benchmarks(local_root_dir, start_date, args.days, args.loaders, args.probe, args.repeat,
+                                 args.options, args.workers)
+
+    run = {'environment': environment(),
+           'config': {'start': args.start, 'days': args.days, 'probe': args.probe, 'repeat': args.repeat,
+                      'options': args.options, 'workers': args.workers},
+           'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(run, fp, indent=2)
+
+    if args.compare:
+        with open(args.compare) as fp:
+            regressions = compare(results, json.load(fp), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
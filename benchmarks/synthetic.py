@@ -0,0 +1,278 @@
+import os
+import numpy as np
+import pandas as pd
+import cdflib
+from cdflib.cdfwrite import CDF as CDFWriter
+from Download_data.rbsp import download_ect as dd_ect
+from Download_data.rbsp import download_emfisis as dd_emf
+from Download_data.omni import download_omni as dd_omni
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+
+Synthetic RBSP ECT, RBSP EMFISIS and OMNI CDF files for the benchmarks.
+
+The files have the variable names, shapes, data types, fill values, valid
+ranges and epoch types read by Process_data, and are written in the local
+directories given by the Download_data path helpers, so the loaders find them
+as if they had been downloaded. The values are random but plausible (an orbit
+of about 9 hours, pitch angle distributions peaked at 90 degrees, solar wind
+around 400 km/s), with a small fraction of fill and flagged values so the
+cleaning does real work.
+"""
+
+
+# CDF data types
+CDF_INT1 = 1
+CDF_INT4 = 4
+CDF_REAL4 = 21
+CDF_REAL8 = 22
+CDF_EPOCH = 31
+CDF_TT2000 = 33
+CDF_FLOAT = 44
+CDF_DOUBLE = 45
+CDF_CHAR = 51
+
+FILL_REAL = -1e31
+
+ECT_ENERGIES = np.array([1.8, 2.1, 2.6, 3.4, 4.2, 5.2, 6.3, 7.7, 9.9, 12.3, 15.2, 20.0], dtype=np.float32)
+ECT_ALPHAS = np.linspace(5, 175, 17).astype(np.float32)
+
+# Records per day (ECT every 10 s, EMFISIS every 4 s)
+ECT_RECORDS = 8640
+EMFISIS_RECORDS = 21600
+
+
+def _spec(name, data_type, dims=(), rec_vary=True, num_elements=1):
+    return {'Variable': name, 'Data_Type': data_type, 'Num_Elements': num_elements, 'Rec_Vary': rec_vary,
+            'Dim_Sizes': list(dims), 'Var_Type': 'zVariable'}
+
+
+def _attrs(name, desc, fill, low, high, units, var_type='data'):
+    return {'FIELDNAM': name, 'CATDESC': desc, 'LABLAXIS': name, 'FILLVAL': fill, 'VALIDMIN': low, 'VALIDMAX': high,
+            'UNITS': units, 'VAR_TYPE': var_type, 'SCALETYP': 'linear'}
+
+
+def _write_cdf(path, variables):
+
+    '''
+    Write a CDF file with (spec, attributes, data) variables, replacing any
+    existing file.
+    '''
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+
+    cdf = CDFWriter(path, {'Majority': 'row_major'})
+    for spec, attrs, data in variables:
+        cdf.write_var(spec, attrs, data)
+    cdf.close()
+
+    return path
+
+
+def _epoch(date, n_records, cadence_ms):
+    t0 = cdflib.cdfepoch.compute_epoch([date.year, date.month, date.day, 0, 0, 0, 0])
+    return t0 + np.arange(n_records)*float(cadence_ms)
+
+
+def ECT_path(local_root_dir, date, probe='a', instrument='rept', version='5.1.0'):
+    name = f"rbsp{probe}_rel03_ect-{instrument}-sci-L3_{date.strftime('%Y%m%d')}_v{version}.cdf"
+    return os.path.join(dd_ect.get_local_dir_ECT(date, local_root_dir, probe, instrument, '3'), name)
+
+
+def EMFISIS_path(local_root_dir, date, probe='a', version='1.3.2'):
+    name = f"rbsp-{probe}_magnetometer_4sec-geo_emfisis-l3_{date.strftime('%Y%m%d')}_v{version}.cdf"
+    return os.path.join(dd_emf.get_local_dir_EMFISIS(date, local_root_dir, probe, '3'), name)
+
+
+def OMNI_path(local_root_dir, date, res='1min', type='hro2'):
+    first = date.replace(day=1)
+    return dd_omni.get_local_dir_OMNI(first, local_root_dir, res, type) + dd_omni.get_filename_OMNI(first, res, type)
+
+
+def _orbit(n_records, rng):
+    # L shell of an elliptic orbit of ~9 h, sampled over one day
+    phase = np.linspace(0, 2*np.pi*24/9, n_records, endpoint=False) + rng.uniform(0, 2*np.pi)
+    return 1.1 + 2.7*(1 - np.cos(phase))
+
+
+############ RBSP ECT ###########################################################
+
+def write_ECT_day(local_root_dir, date, probe='a', instrument='rept', n_records=ECT_RECORDS, version='5.1.0', seed=0):
+
+    '''
+    Write the synthetic level 3 ECT file of one day, with Epoch (CDF_EPOCH),
+    Position, L, MLT, FEDU (time, 17 pitch angles, 12 energies) and its
+    support data.
+
+    Returns:
+        - path (str): The path of the file.
+    '''
+
+    rng = np.random.default_rng(seed + date.toordinal() + (probe == 'b'))
+    L = _orbit(n_records, rng)
+    mlt = (np.linspace(0, 24*24/9, n_records) + rng.uniform(0, 24)) % 24
+    phi = mlt/24*2*np.pi
+    position = np.stack([L*np.cos(phi), L*np.sin(phi), 0.1*rng.normal(size=n_records)], axis=1)*6371.2
+
+    # j(alpha, E) = A(t) * E**-3 * sin(alpha)**n(t)
+    amplitude = rng.lognormal(8, 1, n_records)
+    n = rng.uniform(0.5, 3, n_records)
+    sin_alpha = np.sin(np.radians(ECT_ALPHAS))
+    fedu = (amplitude[:, None, None]*sin_alpha[None, :, None]**n[:, None, None]
+            *ECT_ENERGIES[None, None, :]**-3.0).astype(np.float32)
+
+    # Fill values and values below VALIDMIN
+    fedu[rng.random(n_records) < 0.02] = np.float32(FILL_REAL)
+    fedu[rng.random(fedu.shape) < 0.001] = np.float32(-1)
+    L[rng.random(n_records) < 0.01] = FILL_REAL
+
+    return _write_cdf(ECT_path(local_root_dir, date, probe, instrument, version), [
+        (_spec('Epoch', CDF_EPOCH), {'FIELDNAM': 'Epoch', 'CATDESC': 'Time', 'FILLVAL': FILL_REAL,
+                                     'VALIDMIN': 0.0, 'VALIDMAX': 1e15, 'VAR_TYPE': 'support_data'},
+         _epoch(date, n_records, 86400000/n_records)),
+        (_spec('Position', CDF_DOUBLE, [3]), _attrs('Position', 'Position GEO', FILL_REAL, -1e5, 1e5, 'km'), position),
+        (_spec('L', CDF_DOUBLE), _attrs('L', 'L shell', FILL_REAL, 0.0, 20.0, ''), L),
+        (_spec('MLT', CDF_DOUBLE), _attrs('MLT', 'Magnetic local time', FILL_REAL, 0.0, 24.0, 'hours'), mlt),
+        (_spec('FEDU', CDF_FLOAT, [17, 12]), {'FIELDNAM': 'FEDU', 'CATDESC': 'Differential electron flux',
+                                             'FILLVAL': np.float32(FILL_REAL), 'VALIDMIN': np.float32(0),
+                                             'VALIDMAX': np.float32(1e10), 'UNITS': 'counts/(cm^2 s sr MeV)',
+                                             'VAR_TYPE': 'data', 'SCALETYP': 'log'}, fedu),
+        (_spec('FEDU_Energy', CDF_FLOAT, [12], rec_vary=False), {'FIELDNAM': 'FEDU_Energy', 'UNITS': 'MeV',
+                                                                 'VAR_TYPE': 'support_data'}, ECT_ENERGIES),
+        (_spec('FEDU_Alpha', CDF_FLOAT, [17], rec_vary=False), {'FIELDNAM': 'FEDU_Alpha', 'UNITS': 'degrees',
+                                                               'VAR_TYPE': 'support_data'}, ECT_ALPHAS),
+        (_spec('FEDU_ENERGY_LABL', CDF_CHAR, [12], rec_vary=False, num_elements=10), {'VAR_TYPE': 'metadata'},
+         [f'{e:>6.2f} MeV' for e in ECT_ENERGIES]),
+        (_spec('FEDU_PA_LABL', CDF_CHAR, [17], rec_vary=False, num_elements=10), {'VAR_TYPE': 'metadata'},
+         [f'{a:>6.1f} deg' for a in ECT_ALPHAS]),
+    ])
+
+
+############ RBSP EMFISIS #######################################################
+
+def write_EMFISIS_day(local_root_dir, date, probe='a', n_records=EMFISIS_RECORDS, version='1.3.2', seed=0):
+
+    '''
+    Write the synthetic level 3 EMFISIS 4 s GEO magnetometer file of one day,
+    with Epoch (CDF_TT2000), Mag, Magnitude, coordinates and the quality flags
+    magFill, magInvalid and calState.
+
+    Returns:
+        - path (str): The path of the file.
+    '''
+
+    rng = np.random.default_rng(seed + date.toordinal() + (probe == 'b'))
+    t0 = cdflib.cdfepoch.compute_tt2000([date.year, date.month, date.day, 0, 0, 0, 0, 0, 0])
+    epoch = t0 + np.arange(n_records, dtype=np.int64)*(86400_000_000_000//n_records)
+
+    # Dipole field magnitude along the orbit, plus noise
+    L = _orbit(n_records, rng)
+    magnitude = 31000/L**3
+    direction = rng.normal(size=(n_records, 3))
+    direction /= np.linalg.norm(direction, axis=1)[:, None]
+    mag = (magnitude[:, None]*direction + rng.normal(scale=2, size=(n_records, 3))).astype(np.float32)
+    coordinates = (6371.2*L[:, None]*direction).astype(np.float32)
+
+    flag = lambda p: (rng.random(n_records) < p).astype(np.int8)
+    mag_attrs = _attrs('Mag', 'Magnetic field GEO', np.float32(FILL_REAL), np.float32(-65536), np.float32(65536), 'nT')
+    flag_attrs = lambda name: _attrs(name, name, np.int8(-127), np.int8(0), np.int8(1), '', 'support_data')
+
+    return _write_cdf(EMFISIS_path(local_root_dir, date, probe, version), [
+        (_spec('Epoch', CDF_TT2000), {'FIELDNAM': 'Epoch', 'CATDESC': 'Time', 'VAR_TYPE': 'support_data'}, epoch),
+        (_spec('Mag', CDF_REAL4, [3]), mag_attrs, mag),
+        (_spec('Magnitude', CDF_REAL4), mag_attrs, np.linalg.norm(mag, axis=1).astype(np.float32)),
+        (_spec('coordinates', CDF_REAL4, [3]),
+         _attrs('coordinates', 'Position GEO', np.float32(FILL_REAL), np.float32(-1e5), np.float32(1e5), 'km',
+                'support_data'), coordinates),
+        (_spec('magFill', CDF_INT1), flag_attrs('magFill'), flag(0.005)),
+        (_spec('magInvalid', CDF_INT1), flag_attrs('magInvalid'), flag(0.005)),
+        (_spec('calState', CDF_INT1), flag_attrs('calState'), flag(0.002)),
+    ])
+
+
+############ OMNI ###############################################################
+
+def write_OMNI_file(local_root_dir, date, res='1min', type='hro2', seed=0):
+
+    '''
+    Write the synthetic OMNI high resolution file ('1min' or '5min') of the
+    month of `date`, with Epoch (CDF_EPOCH), flow_speed, proton_density,
+    Pressure, BZ_GSM, AE_INDEX and SYM_H, with the OMNI fill values.
+
+    Returns:
+        - path (str): The path of the file.
+    '''
+
+    first = date.replace(day=1)
+    month = pd.Timestamp(first)
+    n_records = int((month + pd.DateOffset(months=1) - month)/pd.Timedelta(res))
+    rng = np.random.default_rng(seed + first.toordinal())
+
+    speed = 400 + np.cumsum(rng.normal(scale=2, size=n_records)).clip(-150, 400)
+    density = rng.lognormal(1.5, 0.5, n_records)
+    pressure = (1.67e-6*density*speed**2).astype(np.float32)
+    bz = rng.normal(scale=4, size=n_records).astype(np.float32)
+    ae = rng.integers(10, 1500, n_records).astype(np.int32)
+    sym_h = rng.integers(-150, 30, n_records).astype(np.int32)
+
+    # Data gaps with the OMNI fill values
+    gaps = rng.random(n_records) < 0.05
+    speed[gaps] = 99999.9
+    density[gaps] = 999.99
+    pressure[gaps] = np.float32(99.99)
+    bz[rng.random(n_records) < 0.05] = np.float32(9999.99)
+    ae[rng.random(n_records) < 0.01] = 99999
+
+    return _write_cdf(OMNI_path(local_root_dir, first, res, type), [
+        (_spec('Epoch', CDF_EPOCH), {'FIELDNAM': 'Epoch', 'CATDESC': 'Time', 'FILLVAL': FILL_REAL, 'VALIDMIN': 0.0,
+                                     'VALIDMAX': 1e15, 'VAR_TYPE': 'support_data'},
+         _epoch(first, n_records, pd.Timedelta(res)/pd.Timedelta('1ms'))),
+        (_spec('flow_speed', CDF_REAL8), _attrs('Flow speed', 'Flow speed', 99999.9, 0.0, 3000.0, 'km/s'), speed),
+        (_spec('proton_density', CDF_REAL8), _attrs('Density', 'Proton density', 999.99, 0.0, 900.0, 'n/cc'), density),
+        (_spec('Pressure', CDF_REAL4), _attrs('Pressure', 'Flow pressure', np.float32(99.99), np.float32(0),
+                                              np.float32(90), 'nPa'), pressure),
+        (_spec('BZ_GSM', CDF_REAL4), _attrs('Bz', 'Bz GSM', np.float32(9999.99), np.float32(-65), np.float32(65),
+                                            'nT'), bz),
+        (_spec('AE_INDEX', CDF_INT4), _attrs('AE', 'AE index', np.int32(99999), np.int32(0), np.int32(9999), 'nT'), ae),
+        (_spec('SYM_H', CDF_INT4), _attrs('SYM/H', 'SYM/H index', np.int32(99999), np.int32(-9999),
+                                          np.int32(9999), 'nT'), sym_h),
+    ])
+
+
+def generate_archive(local_root_dir, start_date, end_date, probes=('a', 'b'), instrument='rept', omni_res='1min',
+                     omni_type='hro2', seed=0):
+
+    '''
+    Write the synthetic ECT and EMFISIS files of every day between
+    `start_date` and `end_date` (inclusive) for every probe, and the OMNI
+    files of every month of the range. Files that already exist are kept, so
+    an archive can be reused between runs.
+
+    Returns:
+        - paths (dict): The paths written, per dataset ('ect', 'emfisis',
+          'omni').
+    '''
+
+    dates = pd.date_range(start_date, end_date, freq='D').date
+    paths = {'ect': [], 'emfisis': [], 'omni': []}
+
+    def write(kind, path, function, *args):
+        if not os.path.exists(path):
+            function(local_root_dir, *args, seed=seed)
+        paths[kind].append(path)
+
+    for date in dates:
+        for probe in probes:
+            write('ect', ECT_path(local_root_dir, date, probe, instrument), write_ECT_day, date, probe, instrument)
+            write('emfisis', EMFISIS_path(local_root_dir, date, probe), write_EMFISIS_day, date, probe)
+
+    for month in sorted({date.replace(day=1) for date in dates}):
+        write('omni', OMNI_path(local_root_dir, month, omni_res, omni_type), write_OMNI_file, month, omni_res, omni_type)
+
+    return paths
@@ -18,4 +18,5 @@ setup(
         packages=find_packages(),
         install_requires=[], # add any additional packages that
         # needs to be installed along with your package. Eg: 'caer'
+        entry_points={'console_scripts': ['process-data = Process_data.cli:main']},
 )
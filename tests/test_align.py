@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from Process_data.utils.align import align_epochs, align_frames, lag_label
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+def _times(minutes):
+    return np.datetime64('2014-01-01', 'ns') + np.asarray(minutes, dtype='timedelta64[m]')
+
+
+SOURCE_EPOCHS = _times([0, 10, 20, 30])
+SOURCE_VALUES = np.array([0.0, 1.0, 2.0, 3.0])
+
+
+def test_align_nearest():
+    # Ties go to the earlier sample, NaT targets are NaN
+    epochs = _times([4, 5, 6, 29, 0]).astype('datetime64[ns]')
+    epochs[-1] = np.datetime64('NaT')
+    aligned = align_epochs(epochs, SOURCE_EPOCHS, SOURCE_VALUES)
+    np.testing.assert_array_equal(aligned[:, 0], [0.0, 0.0, 1.0, 3.0, np.nan])
+
+
+def test_align_previous_tolerance_and_lags():
+    epochs = _times([35, 9, 45])
+    aligned = align_epochs(epochs, SOURCE_EPOCHS, SOURCE_VALUES, 'previous', lags=(0, '10min'), tolerance='10min')
+    np.testing.assert_array_equal(aligned, [[3.0, 2.0], [0.0, np.nan], [np.nan, 3.0]])
+
+
+def test_align_mean():
+    values = np.array([0.0, np.nan, 2.0, 3.0])
+    aligned = align_epochs(_times([20, 30, 5]), SOURCE_EPOCHS, values, 'mean', window='25min')
+    np.testing.assert_allclose(aligned[:, 0], [1.0, 2.5, 0.0])
+    with pytest.raises(ValueError):
+        align_epochs(_times([20]), SOURCE_EPOCHS, values, 'mean')
+
+
+def test_align_chunks_and_unsorted():
+    # The same result whatever the chunks, with unsorted source and targets
+    epochs = _times(np.random.default_rng(0).integers(-10, 2000, 200))
+    source_epochs = _times(np.arange(0, 2000, 7))
+    source_values = np.sin(np.arange(len(source_epochs)))
+    expected = align_epochs(epochs, source_epochs, source_values, lags=(0, '1h'))
+    np.testing.assert_array_equal(align_epochs(epochs, source_epochs[::-1], source_values[::-1], lags=(0, '1h'),
+                                               chunk='30min'), expected)
+
+
+def test_align_frames():
+    source = pd.DataFrame({'epoch': SOURCE_EPOCHS, 'V': SOURCE_VALUES, 'name': list('abcd')})
+    targets = {'a': pd.DataFrame({'epoch': _times([11, 29])}, index=[5, 6])}
+    aligned = align_frames(source, targets, lags=(0, '30min'), tolerance='5min')['a']
+    assert list(aligned.columns) == ['V', 'V_lag30min']
+    assert list(aligned.index) == [5, 6]
+    np.testing.assert_array_equal(aligned.to_numpy(), [[1.0, np.nan], [3.0, 0.0]])
+
+
+def test_lag_label():
+    assert lag_label(0) == ''
+    assert lag_label('30min') == '_lag30min'
+    assert lag_label('-2h') == '_lag-2h'
@@ -0,0 +1,40 @@
+import os
+import numpy as np
+import pandas as pd
+from Process_data.utils.cache import DayCache
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+def _frame():
+    epochs = pd.date_range('2014-01-01', periods=3, freq='h').to_numpy()
+    return pd.DataFrame({'epoch': epochs, 'L': [4.0, 4.5, 5.0]})
+
+
+def test_store_and_load(tmp_path):
+    cache = DayCache(str(tmp_path))
+    cache.store('key', _frame(), {'L': {'units': 'Re'}}, {'fedu': np.ones((3, 2))})
+
+    df, metadata, arrays = cache.load('key')
+    pd.testing.assert_frame_equal(df, _frame())
+    assert metadata == {'L': {'units': 'Re'}}
+    np.testing.assert_array_equal(arrays['fedu'], np.ones((3, 2)))
+
+
+def test_failed_store_is_not_an_error(tmp_path, monkeypatch, caplog):
+    # e.g. a Parquet engine that cannot write one of the columns
+    def fail(*args, **kwargs):
+        raise ValueError('unsupported column')
+    monkeypatch.setattr(pd.DataFrame, 'to_parquet', fail)
+
+    cache = DayCache(str(tmp_path))
+    cache.store('key', _frame(), {})
+
+    assert cache.load('key') is None
+    assert os.listdir(tmp_path) == []
+    assert 'Could not write the cache entry key' in caplog.text
@@ -0,0 +1,151 @@
+import os
+import json
+import socket
+import subprocess
+import sys
+import pandas as pd
+import pytest
+from Process_data.cli import ShardQueue, make_shards, main
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+def make_job(**changes):
+    job = {'instrument': 'rept', 'start': '2014-01-01', 'end': '2014-02-15', 'shard': 'MS', 'root': '/data',
+           'probe': 'a', 'level': '3', 'variables': ['Epoch'], 'rename': {'Epoch': 'epoch'}, 'res': '1min',
+           'type': 'hro2', 'valid_range': True, 'interp': False, 'max_gap': None, 'compact': False,
+           'resample': None, 'energies': None, 'alphas': None}
+    job.update(changes)
+    return job
+
+
+def dead_pid():
+    # The pid of a process that already exited
+    process = subprocess.Popen([sys.executable, '-c', ''])
+    process.wait()
+    return process.pid
+
+
+def write_lock(queue, label, pid, host=None, when=None):
+    with open(queue._path(label, 'lock'), 'w') as fp:
+        json.dump({'host': host or socket.gethostname(), 'pid': pid, 'time': when or 0}, fp)
+
+
+############ make_shards #######################################################
+
+def test_make_shards_months():
+    shards = make_shards('2014-01-15', '2014-03-10')
+
+    assert shards == [(pd.Timestamp('2014-01-15'), pd.Timestamp('2014-01-31')),
+                      (pd.Timestamp('2014-02-01'), pd.Timestamp('2014-02-28')),
+                      (pd.Timestamp('2014-03-01'), pd.Timestamp('2014-03-10'))]
+
+
+def test_make_shards_cover_every_day_once():
+    shards = make_shards('2014-01-01', '2014-01-20', '7D')
+
+    days = [day for start, end in shards for day in pd.date_range(start, end)]
+    assert days == list(pd.date_range('2014-01-01', '2014-01-20'))
+
+
+def test_make_shards_single_day():
+    assert make_shards('2014-01-01', '2014-01-01') == [(pd.Timestamp('2014-01-01'), pd.Timestamp('2014-01-01'))]
+
+
+def test_make_shards_reversed_range():
+    with pytest.raises(ValueError):
+        make_shards('2014-02-01', '2014-01-01')
+
+
+############ ShardQueue ########################################################
+
+def test_queue_claims_every_shard_once(tmp_path):
+    queue = ShardQueue(str(tmp_path), make_job())
+    other = ShardQueue(str(tmp_path), make_job())
+
+    first = queue.claim()
+    second = other.claim()
+    assert first[0] != second[0]
+    assert queue.claim() is None
+
+    queue.finish(first[0], {'rows': 0})
+    assert queue.status() == {'done': 1, 'lock': 1, 'failed': 0, 'pending': 0}
+
+
+def test_queue_other_job(tmp_path):
+    ShardQueue(str(tmp_path), make_job())
+
+    with pytest.raises(ValueError, match='end'):
+        ShardQueue(str(tmp_path), make_job(end='2014-03-01'))
+
+
+def test_queue_failed_shards(tmp_path):
+    queue = ShardQueue(str(tmp_path), make_job())
+    label, _, _ = queue.claim()
+    queue.fail(label, 'Traceback')
+
+    assert queue.state(label) == 'failed'
+    assert queue.claim(retry_failed=False)[0] != label
+    assert queue.claim(retry_failed=True)[0] == label
+
+
+def test_queue_takes_over_lock_of_dead_process(tmp_path):
+    queue = ShardQueue(str(tmp_path), make_job())
+    label = next(iter(queue.shards))
+    write_lock(queue, label, dead_pid())
+
+    assert queue.claim()[0] == label
+    assert queue._owner(queue._path(label, 'lock'))['pid'] == os.getpid()
+    assert sorted(os.listdir(queue.shards_dir)) == [f'{label}.lock']
+
+
+def test_queue_keeps_lock_of_running_process(tmp_path):
+    queue = ShardQueue(str(tmp_path), make_job(end='2014-01-31'))
+    label = next(iter(queue.shards))
+    write_lock(queue, label, os.getpid())
+
+    assert queue.claim() is None
+
+
+def test_queue_lock_timeout(tmp_path):
+    queue = ShardQueue(str(tmp_path), make_job(end='2014-01-31'), lock_timeout=60)
+    label = next(iter(queue.shards))
+    write_lock(queue, label, 1, host='another-node')
+
+    assert queue.claim()[0] == label
+
+
+def test_queue_stale_lock_taken_over_by_another_process(tmp_path, monkeypatch):
+    # This process judged the lock of a dead process stale, but another one
+    # took it over first: the lock now in place must be kept
+    queue = ShardQueue(str(tmp_path), make_job(end='2014-01-31'))
+    label = next(iter(queue.shards))
+    dead = {'host': socket.gethostname(), 'pid': dead_pid(), 'time': 0}
+    write_lock(queue, label, os.getppid())
+    monkeypatch.setattr(queue, '_stale_owner', lambda lock_path: dead)
+
+    assert queue.claim() is None
+    assert queue._owner(queue._path(label, 'lock'))['pid'] == os.getppid()
+    assert sorted(os.listdir(queue.shards_dir)) == [f'{label}.lock']
+
+
+############ Command line ######################################################
+
+def test_main_shards_without_files(tmp_path):
+    pytest.importorskip('Download_data')
+    output = str(tmp_path / 'out')
+
+    code = main(['rept', '2013-01-01', '2013-01-20', '--root', str(tmp_path), '--output', output, '--shard', '7D',
+                 '--variables', 'Epoch', 'L'])
+
+    assert code == 0
+    states = sorted(os.listdir(os.path.join(output, 'shards')))
+    assert len(states) == 3 and all(state.endswith('.done') for state in states)
+    for state in states:
+        with open(os.path.join(output, 'shards', state)) as fp:
+            assert json.load(fp)['rows'] == 0
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from Process_data.utils.compact import compact_dtype, compact_frame, compact_array, pack_flags
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+def test_compact_dtype_float():
+    assert compact_dtype(np.dtype(np.float64), {'fill_value': -1e31, 'min_valid': 0, 'max_valid': 1e10}) == np.float32
+    # A fill value out of the float32 range
+    assert compact_dtype(np.dtype(np.float64), {'fill_value': -1e300}) == np.float64
+
+
+def test_compact_dtype_integer():
+    assert compact_dtype(np.dtype(np.int64), {'fill_value': 255, 'min_valid': 0, 'max_valid': 1}) == np.uint8
+    assert compact_dtype(np.dtype(np.int64), {'fill_value': -1, 'min_valid': 0, 'max_valid': 1000}) == np.int16
+    # Unknown range
+    assert compact_dtype(np.dtype(np.int64)) == np.int64
+
+
+def test_compact_frame():
+    epochs = pd.date_range('2014-01-01', periods=3, freq='s').to_numpy()
+    df = pd.DataFrame({'epoch': epochs, 'L': [4.5, np.nan, 5.0], 'n': np.array([0, 1, 300], dtype=np.int64)})
+
+    compact = compact_frame(df, {'n': {'min_valid': 0, 'max_valid': 1}})
+
+    assert compact['epoch'].dtype == df['epoch'].dtype
+    assert compact['L'].dtype == np.float32
+    # Out of the valid range of its metadata, so not narrowed
+    assert compact['n'].dtype == np.int64
+    np.testing.assert_allclose(compact['L'], df['L'])
+
+
+def test_compact_array():
+    assert compact_array(np.zeros(3)).dtype == np.float32
+    assert compact_array(np.zeros(3, dtype=np.int64)).dtype == np.int64
+
+
+def test_pack_flags():
+    df = pd.DataFrame({'x': [1.0, 2.0, 3.0], 'fill': [0.0, 1.0, 0.0], 'valid': [1.0, 1.0, 0.0]})
+
+    packed = pack_flags(df, {'fill': 1, 'valid': 2})
+
+    assert list(packed.columns) == ['x', 'quality']
+    assert packed['quality'].dtype == np.uint8
+    assert packed['quality'].tolist() == [2, 3, 0]
+
+
+def test_pack_flags_unknown():
+    # Flags masked to NaN by the cleaning must not read as good (0)
+    df = pd.DataFrame({'fill': [np.nan, 1.0, 0.0], 'valid': pd.array([0, None, 1], dtype='Int8')})
+
+    packed = pack_flags(df, {'fill': 1, 'valid': 2})
+
+    assert packed['quality'].tolist() == [16, 1 | 32, 2]
+
+
+def test_pack_flags_bits_too_large():
+    with pytest.raises(ValueError):
+        pack_flags(pd.DataFrame({'flag': [0, 1]}), {'flag': 16})
@@ -0,0 +1,66 @@
+import os
+import sys
+import datetime
+import numpy as np
+import pytest
+
+pytest.importorskip('Download_data')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from synthetic import write_ECT_day
+from Process_data.rbsp import dataset as dataset_module
+from Process_data.rbsp.dataset import open_dataset_ECT
+from Process_data.rbsp.process_ect import load_CDFfiles_ECT
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+ECT_VARIABLES = (['Epoch', 'L'], {'Epoch': 'epoch', 'L': 'L'})
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    # The files whose channels were read
+    paths = []
+    read_coords = dataset_module._read_coords_ECT
+
+    def record(cdf_path):
+        paths.append(cdf_path)
+        return read_coords(cdf_path)
+    monkeypatch.setattr(dataset_module, '_read_coords_ECT', record)
+
+    return paths
+
+
+def test_channel_selection_is_lazy(tmp_path, reads):
+    for day in (1, 2):
+        write_ECT_day(str(tmp_path), datetime.date(2014, 1, day), n_records=50)
+
+    dataset = open_dataset_ECT('2014-01-01', '2014-01-02', str(tmp_path), *ECT_VARIABLES, 'a', 'rept',
+                               energies=(2, 6), alphas=[90, 45])
+    dataset = dataset.sel(energy=[2.6, 5.2])['2014-01-02':'2014-01-02']
+    assert reads == []
+
+    np.testing.assert_allclose(dataset.coords['energy'], [2.6, 5.2], rtol=1e-6)
+    np.testing.assert_allclose(dataset.coords['alpha'], [90, 47.5], rtol=1e-6)
+    assert len(reads) == 1
+
+    ect_info, fedu, _, _ = dataset.compute()
+    expected = load_CDFfiles_ECT(datetime.date(2014, 1, 2), datetime.date(2014, 1, 2), str(tmp_path), *ECT_VARIABLES,
+                                 'a', 'rept', energies=[2.6, 5.2], alphas=[90, 47.5])[0]
+    assert fedu.shape == (50, 2, 2)
+    np.testing.assert_array_equal(fedu, expected[1])
+
+
+def test_channel_selection_without_files(tmp_path, reads):
+    dataset = open_dataset_ECT('2013-01-01', '2013-01-03', str(tmp_path), *ECT_VARIABLES, 'a', 'rept', energies=2)
+
+    ect_info, fedu, _, _ = dataset.compute()
+    assert ect_info.empty and len(fedu) == 0
+    assert reads == []
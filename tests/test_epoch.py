@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from cdflib import cdfepoch
+from Process_data.utils.epoch import decode_epoch, TT2000_FILL
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+def test_decode_epoch():
+    values = np.array([cdfepoch.compute_epoch([2014, 1, 1, 12, 30, 15, 250]), -1e31, np.nan])
+    np.testing.assert_array_equal(decode_epoch(values), np.array(['2014-01-01T12:30:15.250', 'NaT', 'NaT'],
+                                                                  dtype='datetime64[ns]'))
+
+
+def test_decode_epoch16():
+    values = np.array([cdfepoch.compute_epoch16([2014, 1, 1, 0, 0, 1, 2, 3, 4, 5]), complex(-1e31, -1e31)])
+    np.testing.assert_array_equal(decode_epoch(values), np.array(['2014-01-01T00:00:01.002003004', 'NaT'],
+                                                                  dtype='datetime64[ns]'))
+
+
+def test_decode_tt2000_leap_seconds():
+    dates = [[2012, 6, 30, 23, 59, 59, 0, 0, 0], [2012, 7, 1, 0, 0, 0, 0, 0, 0],
+             [2016, 12, 31, 23, 59, 59, 500, 0, 0], [2017, 1, 1, 0, 0, 0, 0, 0, 1]]
+    values = np.array([cdfepoch.compute_tt2000(date) for date in dates] + [TT2000_FILL], dtype=np.int64)
+    expected = np.array(['2012-06-30T23:59:59', '2012-07-01', '2016-12-31T23:59:59.5', '2017-01-01T00:00:00.000000001',
+                         'NaT'], dtype='datetime64[ns]')
+    np.testing.assert_array_equal(decode_epoch(values), expected)
+    np.testing.assert_array_equal(decode_epoch(values[:-1]), cdfepoch.to_datetime(values[:-1]))
+
+
+def test_decode_epoch_unknown_type():
+    with pytest.raises(TypeError):
+        decode_epoch(np.array(['2014-01-01']))
@@ -0,0 +1,128 @@
+import warnings
+import numpy as np
+import pytest
+
+pytest.importorskip('Download_data')
+
+from Process_data.rbsp.fedu import (resolve_channels, select_FEDU, alpha_bounds, solid_angles, omnidirectional_flux,
+                                    anisotropy, fit_sin_n, compute_products_FEDU)
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+ALPHAS = np.linspace(5, 175, 17)
+ENERGIES = np.array([1.8, 2.1, 2.6, 3.4, 4.2])
+
+
+def make_fedu(values):
+    # FEDU of shape (time, pitch angle, energy) from j(alpha) of every time
+    values = np.asarray(values, dtype=np.float64)
+    return np.repeat(values[:, :, np.newaxis], len(ENERGIES), axis=2)
+
+
+def make_metadata():
+    return {'alpha_values': ALPHAS, 'alpha_labels': [f'{a:g} deg' for a in ALPHAS],
+            'energy_values': ENERGIES, 'energy_labels': [f'{e:g} MeV' for e in ENERGIES]}
+
+
+############ Selection of channels #############################################
+
+def test_resolve_channels():
+    assert resolve_channels(ENERGIES, None) is None
+    assert resolve_channels(ENERGIES, 2.0).tolist() == [1]
+    assert resolve_channels(ENERGIES, [4.0, 1.9, 1.7]).tolist() == [4, 0]
+    assert resolve_channels(ENERGIES, (2, 3.5)).tolist() == [1, 2, 3]
+    assert resolve_channels(ENERGIES, (None, 2)).tolist() == [0]
+
+    with pytest.raises(ValueError):
+        resolve_channels(ENERGIES, (10, 20))
+
+
+def test_select_FEDU():
+    fedu = np.arange(3*len(ALPHAS)*len(ENERGIES), dtype=np.float32).reshape(3, len(ALPHAS), len(ENERGIES))
+
+    selected, metadata = select_FEDU(fedu, make_metadata(), np.array([8, 0]), np.array([1, 2]))
+
+    np.testing.assert_array_equal(selected, fedu[:, [8, 0]][:, :, [1, 2]])
+    assert selected.flags['C_CONTIGUOUS']
+    np.testing.assert_array_equal(metadata['alpha_values'], ALPHAS[[8, 0]])
+    assert list(metadata['energy_labels']) == ['2.1 MeV', '2.6 MeV']
+    np.testing.assert_array_equal(metadata['alpha_bounds'], alpha_bounds(ALPHAS)[[8, 0]])
+
+
+############ Products ##########################################################
+
+def test_solid_angles_full_grid():
+    weights = solid_angles(ALPHAS)
+
+    assert weights.sum() == pytest.approx(4*np.pi)
+    # Symmetric around 90 degrees
+    np.testing.assert_allclose(weights, weights[::-1])
+
+
+def test_omnidirectional_flux_isotropic():
+    omni = omnidirectional_flux(make_fedu(np.full((2, len(ALPHAS)), 3.0)), ALPHAS)
+
+    np.testing.assert_allclose(omni, 4*np.pi*3.0)
+
+
+def test_omnidirectional_flux_missing_pitch_angles():
+    values = np.full((2, len(ALPHAS)), 3.0)
+    values[0, :4] = np.nan
+    values[1] = np.nan
+
+    omni = omnidirectional_flux(make_fedu(values), ALPHAS)
+
+    np.testing.assert_allclose(omni[0], 4*np.pi*3.0)
+    assert np.isnan(omni[1]).all()
+
+
+def test_omnidirectional_flux_selected_pitch_angles():
+    # Near 90 degrees only: the bins keep their edges of the full grid, so the
+    # integral is over their solid angle, not stretched to 4*pi
+    fedu, metadata = select_FEDU(make_fedu(np.full((2, len(ALPHAS)), 3.0)), make_metadata(),
+                                 resolve_channels(ALPHAS, (60, 120)))
+
+    omni = compute_products_FEDU(fedu, metadata, ['omni'])['omni']
+
+    selected_angle = solid_angles(ALPHAS)[(ALPHAS >= 60) & (ALPHAS <= 120)].sum()
+    np.testing.assert_allclose(omni, selected_angle*3.0)
+    assert selected_angle < 2*np.pi
+
+
+def test_anisotropy():
+    values = np.where(np.abs(ALPHAS - 90) < 1e-9, 6.0, 2.0)[np.newaxis, :]
+
+    np.testing.assert_allclose(anisotropy(make_fedu(values), ALPHAS), 3.0)
+
+
+def test_fit_sin_n():
+    values = 5.0*np.sin(np.radians(ALPHAS))**2.5
+
+    amplitude, n = fit_sin_n(make_fedu(values[np.newaxis, :]), ALPHAS)
+
+    np.testing.assert_allclose(amplitude, 5.0)
+    np.testing.assert_allclose(n, 2.5)
+
+
+def test_fit_sin_n_field_aligned_bins():
+    # The 0 and 180 degree bins, with some flux, are left out of the fit
+    alphas = np.linspace(0, 180, 19)
+    values = np.where((alphas > 0) & (alphas < 180), 5.0*np.sin(np.radians(alphas))**2, 0.1)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        amplitude, n = fit_sin_n(make_fedu(values[np.newaxis, :]), alphas)
+
+    np.testing.assert_allclose(amplitude, 5.0)
+    np.testing.assert_allclose(n, 2.0)
+
+
+def test_compute_products_unknown():
+    with pytest.raises(ValueError):
+        compute_products_FEDU(make_fedu(np.ones((1, len(ALPHAS)))), make_metadata(), ['flux'])
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+from Process_data.utils.interpolate import interpolate_gaps, interpolate_frame, science_columns
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+def _times(seconds):
+    return np.datetime64('2014-01-01', 'ns') + np.asarray(seconds, dtype='timedelta64[s]')
+
+
+def test_interpolate_gaps_linear_in_time():
+    values = interpolate_gaps(_times([0, 1, 4]), np.array([0.0, np.nan, 8.0]))
+    np.testing.assert_allclose(values, [0.0, 2.0, 8.0])
+
+
+def test_interpolate_gaps_leaves_edges():
+    values = interpolate_gaps(_times([0, 1, 2, 3]), np.array([np.nan, 1.0, 3.0, np.nan]))
+    np.testing.assert_allclose(values, [np.nan, 1.0, 3.0, np.nan])
+
+
+def test_interpolate_gaps_max_gap():
+    times = _times([0, 1, 2, 10, 11, 12])
+    values = interpolate_gaps(times, np.array([0.0, np.nan, 2.0, np.nan, 11.0, np.nan]), max_gap='5s')
+    # The gap from 2 s to 11 s is too long, the last sample has no neighbour after it
+    np.testing.assert_allclose(values, [0.0, 1.0, 2.0, np.nan, 11.0, np.nan])
+    values = interpolate_gaps(times, np.array([0.0, np.nan, 2.0, np.nan, 11.0, np.nan]), max_gap='9s')
+    np.testing.assert_allclose(values, [0.0, 1.0, 2.0, 10.0, 11.0, np.nan])
+
+
+def test_interpolate_gaps_columns_and_copy():
+    values = np.array([[0.0, 10.0], [np.nan, np.nan], [2.0, np.nan], [3.0, 13.0]])
+    filled = interpolate_gaps(_times([0, 1, 2, 3]), values)
+    np.testing.assert_allclose(filled, [[0.0, 10.0], [1.0, 11.0], [2.0, 12.0], [3.0, 13.0]])
+    # The input is not modified unless inplace
+    assert np.isnan(values[1, 0])
+    interpolate_gaps(_times([0, 1, 2, 3]), values, inplace=True)
+    np.testing.assert_allclose(values, filled)
+
+
+def test_interpolate_gaps_nat_epochs():
+    times = _times([0, 0, 2, 4]).astype('datetime64[ns]')
+    times[1] = np.datetime64('NaT')
+    # A fill epoch with a valid value is not used as a neighbour
+    values = interpolate_gaps(times, np.array([0.0, 100.0, np.nan, 4.0]))
+    np.testing.assert_allclose(values, [0.0, 100.0, 2.0, 4.0])
+    # nor is a missing value at a fill epoch filled, even within max_gap
+    values = interpolate_gaps(times, np.array([0.0, np.nan, 2.0, 4.0]), max_gap='10s')
+    np.testing.assert_allclose(values, [0.0, np.nan, 2.0, 4.0])
+    # A leading fill epoch does not shift the time axis
+    times = _times([0, 0, 1, 4]).astype('datetime64[ns]')
+    times[0] = np.datetime64('NaT')
+    values = interpolate_gaps(times, np.array([np.nan, 0.0, np.nan, 8.0]), max_gap='5s')
+    np.testing.assert_allclose(values, [np.nan, 0.0, 2.0, 8.0])
+
+
+def test_interpolate_frame_science_columns():
+    df = pd.DataFrame({'epoch': _times([0, 1, 2]), 'L': [4.0, np.nan, 5.0],
+                       'quality': [0.0, np.nan, 0.0], 'n': np.array([1, 2, 3])})
+    metadata = {'quality': {'var_type': 'support_data'}}
+    assert science_columns(df.dtypes, metadata) == ['L']
+
+    out = interpolate_frame(df, metadata)
+    np.testing.assert_allclose(out['L'], [4.0, 4.5, 5.0])
+    assert np.isnan(out['quality'][1])
+    assert np.isnan(df['L'][1])
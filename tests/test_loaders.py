@@ -0,0 +1,90 @@
+import os
+import sys
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('Download_data')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from synthetic import write_ECT_day
+from Process_data.omni.process_omni import load_CDFfiles_OMNI
+from Process_data.rbsp.process_ect import load_CDFfiles_ECT
+from Process_data.rbsp.process_emfisis import load_CDFfiles_EMFISIS
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+ECT_VARIABLES = (['Epoch', 'Position', 'L'], {'Epoch': 'epoch', 'Position': 'pos', 'L': 'L'})
+
+# A range without any local file, e.g. a gap of the mission
+EMPTY_RANGE = (datetime.date(2013, 1, 1), datetime.date(2013, 1, 3))
+
+
+@pytest.mark.parametrize('options', [{}, {'workers': 2}, {'workers': 2, 'shared_memory': True},
+                                     {'products': ['omni'], 'interp': True, 'compact': True}])
+def test_ECT_range_without_files(tmp_path, options):
+    output = load_CDFfiles_ECT(*EMPTY_RANGE, str(tmp_path), *ECT_VARIABLES, 'both', 'rept', **options)
+
+    assert len(output) == 2
+    for ect_info, fedu, ect_metadata, fedu_metadata, *_ in output:
+        assert ect_info.empty
+        assert len(fedu) == 0
+        assert ect_metadata == {} and fedu_metadata == {}
+
+
+def test_ECT_range_without_files_combined(tmp_path):
+    ect_info, fedu, ect_metadata, fedu_metadata = load_CDFfiles_ECT(*EMPTY_RANGE, str(tmp_path), *ECT_VARIABLES,
+                                                                    'both', 'rept', combine=True)
+
+    assert ect_info.empty and ect_info.index.names == ['probe', 'epoch']
+    assert set(fedu) == {'a', 'b'}
+
+
+def test_ECT_range_with_missing_days(tmp_path):
+    write_ECT_day(str(tmp_path), datetime.date(2014, 1, 2), n_records=100)
+
+    ect_info, fedu, ect_metadata, fedu_metadata = load_CDFfiles_ECT(datetime.date(2014, 1, 1), datetime.date(2014, 1, 3),
+                                                                    str(tmp_path), *ECT_VARIABLES, 'a', 'rept')[0]
+
+    assert len(ect_info) == len(fedu) == 100
+    assert ect_info['epoch'].dt.normalize().unique().tolist() == [pd.Timestamp('2014-01-02')]
+    assert 'L' in ect_metadata
+
+
+def test_ECT_both_probes_shared_memory(tmp_path):
+    for day in (1, 2, 3):
+        for p in ('a', 'b'):
+            write_ECT_day(str(tmp_path), datetime.date(2014, 1, day), probe=p, n_records=50)
+    days = (datetime.date(2014, 1, 1), datetime.date(2014, 1, 3), str(tmp_path))
+
+    expected = load_CDFfiles_ECT(*days, *ECT_VARIABLES, 'both', 'rept')
+    output = load_CDFfiles_ECT(*days, *ECT_VARIABLES, 'both', 'rept', workers=2, shared_memory=True)
+
+    for (ect_info, fedu, *_), (expected_info, expected_fedu, *_) in zip(output, expected):
+        assert len(ect_info) == 150
+        pd.testing.assert_frame_equal(ect_info, expected_info)
+        np.testing.assert_array_equal(fedu, expected_fedu)
+
+
+@pytest.mark.parametrize('options', [{}, {'Interpol': True}, {'combine': True}])
+def test_EMFISIS_range_without_files(tmp_path, options):
+    output = load_CDFfiles_EMFISIS(*EMPTY_RANGE, str(tmp_path), ['Epoch', 'Mag'], {'Epoch': 'epoch', 'Mag': 'Mag'},
+                                   'both', **options)
+
+    frames = [output[0]] if options.get('combine') else [emfisis_info for emfisis_info, _ in output]
+    assert all(frame.empty for frame in frames)
+
+
+def test_OMNI_range_without_files(tmp_path):
+    df_omni, omni_metadata = load_CDFfiles_OMNI(*EMPTY_RANGE, str(tmp_path), ['Epoch', 'flow_speed'],
+                                                {'Epoch': 'epoch', 'flow_speed': 'V'}, '1min', 'hro2')
+
+    assert df_omni.empty and omni_metadata == {}
@@ -0,0 +1,61 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from Process_data.utils import store as store_module
+from Process_data.utils.store import PartitionedStore, open_store
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+def _day(date, value, n=4):
+    epochs = pd.date_range(date, periods=n, freq='h').to_numpy()
+    return pd.DataFrame({'epoch': epochs, 'L': np.full(n, value)}), np.full((n, 2), value)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'rbspa_rel03_ect-rept-sci-l2_20140101_v5.1.0.cdf'
+    path.write_bytes(b'cdf')
+    return str(path)
+
+
+def test_write_and_replace(tmp_path, source):
+    store_dir = str(tmp_path / 'store')
+    store = PartitionedStore(store_dir, {'variables': ['L']})
+    df, fedu = _day('2014-01-01', 1.0)
+    store.write('2014-01-01', source, df, {'L': {'units': 'Re'}}, {'fedu': fedu})
+    df, fedu = _day('2014-01-01', 2.0, n=3)
+    store.write('2014-01-01', source, df, {'L': {'units': 'Re'}}, {'fedu': fedu})
+    store.save()
+
+    dataset = open_store(store_dir)
+    assert len(dataset) == 3
+    np.testing.assert_array_equal(dataset.to_frame()['L'], [2.0, 2.0, 2.0])
+    np.testing.assert_array_equal(dataset.array('fedu'), np.full((3, 2), 2.0))
+    assert not [name for name in os.listdir(store_dir) if name.startswith('.tmp-')]
+
+
+def test_failed_write_keeps_partition(tmp_path, source, monkeypatch):
+    store_dir = str(tmp_path / 'store')
+    store = PartitionedStore(store_dir)
+    df, fedu = _day('2014-01-01', 1.0)
+    store.write('2014-01-01', source, df, {}, {'fedu': fedu})
+    store.save()
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('disk full')
+    monkeypatch.setattr(store_module.np, 'save', fail)
+
+    df, fedu = _day('2014-01-01', 2.0)
+    with pytest.raises(RuntimeError):
+        store.write('2014-01-01', source, df, {}, {'fedu': fedu})
+
+    # Neither temporary files nor a half-replaced partition are left
+    assert not [name for name in os.listdir(store_dir) if name.startswith('.tmp-')]
+    np.testing.assert_array_equal(open_store(store_dir).to_frame()['L'], np.full(4, 1.0))
@@ -0,0 +1,32 @@
+import datetime
+import pandas as pd
+from Process_data.utils.window import resolve_time_range, clip_time_range
+
+
+"""
+Author: BZQ
+Email: beatriz.zenteno@usach.cl
+Date: Oct 2026
+"""
+
+
+def test_resolve_time_range_dates():
+    # An end date includes that whole day
+    assert resolve_time_range(datetime.date(2014, 1, 1), datetime.date(2014, 1, 3)) == \
+        (pd.Timestamp('2014-01-01'), pd.Timestamp('2014-01-04'))
+    assert resolve_time_range('2014-01-01', '2014-01-01') == (pd.Timestamp('2014-01-01'), pd.Timestamp('2014-01-02'))
+
+
+def test_resolve_time_range_datetimes():
+    assert resolve_time_range('2014-01-01T06:00', datetime.datetime(2014, 1, 1, 18, 30)) == \
+        (pd.Timestamp('2014-01-01T06:00'), pd.Timestamp('2014-01-01T18:30'))
+
+
+def test_clip_time_range():
+    day = (pd.Timestamp('2014-01-02'), pd.Timestamp('2014-01-03'))
+    # The window covers the whole file
+    assert clip_time_range((pd.Timestamp('2014-01-01'), pd.Timestamp('2014-01-05')), *day) is None
+    assert clip_time_range((pd.Timestamp('2014-01-02T06:00'), pd.Timestamp('2014-01-05')), *day) == \
+        (pd.Timestamp('2014-01-02T06:00'), pd.Timestamp('2014-01-03'))
+    assert clip_time_range((pd.Timestamp('2014-01-01'), pd.Timestamp('2014-01-02T12:00')), *day) == \
+        (pd.Timestamp('2014-01-02'), pd.Timestamp('2014-01-02T12:00'))